@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the DAMIE Tracker Monitor scrape -> extract -> diff pipeline.
+
+Usage: python benchmarks.py [benchmark ...] [--repeat N] [--posts N] [--pages N] [--records N ...]
+                            [--db FILE] [--json FILE] [--compare FILE]
+Without arguments every benchmark is run. --json writes the results, with the commit they were
+measured on, so that a later run can be compared against them with --compare.
+"""
+
+import argparse
+import contextlib
+import gc
+import glob
+import inspect
+import io
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from tracker_monitor import Tracker, TrackerMonitor, check_for_new_trackers, find_new_trackers, load_previous_trackers, save_trackers_to_file
+from tracker_state import SQLiteStateStore
+from tracker_parsers import DEFAULT_COMMON_TAGS, PARSER_BACKENDS, PatternEngine, get_parser_backend, lxml
+from tracker_scheduler import AdaptiveInterval, FixedInterval, learning_times, simulate_polling
+from testing_support import CATEGORIES, MONTHS, FakeSession, SMTPStandIn, TRACKERS, generate_listing_page, make_monitor
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+def load_fixture_pages():
+    """Raw bytes of every recorded HTML fixture"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+    return pages
+
+
+def best_time(func, repeat):
+    """Best wall time of several runs of func, in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def serve_listing(pages):
+    """Listing page URLs of a monitor mapped to the given page contents, page 1 first"""
+    base = "https://opentrackers.org"
+    site = {base: pages[0]}
+    for page, content in enumerate(pages[1:], 2):
+        site[f"{base}/page/{page}"] = content
+    return site
+
+
+def bench_listings(repeat, posts=200, pages=20):
+    """get_tracker_listings throughput (fetch from memory, parse, extract) on fixtures and synthetic pages"""
+    corpora = {
+        'fixtures': load_fixture_pages(),
+        f'synthetic-{posts}x{pages}': [generate_listing_page(posts, page=n, max_page=pages) for n in range(1, pages + 1)],
+    }
+    results = {}
+    for corpus, contents in corpora.items():
+        site = serve_listing(contents)
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1e9, 'burst': 1000})
+        found = []
+
+        def run():
+            monitor.session = FakeSession(site)
+            found[:] = [len(monitor.get_tracker_listings(page)) for page in range(1, len(contents) + 1)]
+
+        seconds = best_time(run, repeat)
+        results[corpus] = {'pages': len(contents), 'trackers': sum(found), 'pages_per_second': len(contents) / seconds,
+                           'ms_per_page': seconds / len(contents) * 1000, 'peak_bytes': peak_memory(run)}
+    return results
+
+
+def generate_tracker_records(count, seed=0):
+    """Tracker records with identity fields only, cheap enough to build a million of"""
+    rng = random.Random(seed)
+    dates = [f"{month} {day} 2026" for month in MONTHS for day in range(1, 29)]
+    return [Tracker(f"Tracker {number:07d}", f"T{number:07d}", rng.choice(dates)) for number in range(count)]
+
+
+def bench_diff(repeat, records=(10000, 100000, 1000000), posts=200):
+    """find_new_trackers of one page of scanned trackers against 10k-1M known ones"""
+    results = {}
+    for count in records:
+        previous = generate_tracker_records(count)
+        # Half of the scanned page is already known
+        current = previous[:posts // 2] + generate_tracker_records(count + posts // 2)[count:]
+        new = []
+
+        def run():
+            new[:] = find_new_trackers(current, previous)
+
+        seconds = best_time(run, repeat)
+        assert len(new) == posts - posts // 2
+        results[f"{count}-known"] = {'records': count, 'ms': seconds * 1000,
+                                     'records_per_second': count / seconds, 'peak_bytes': peak_memory(run)}
+        del previous, current
+    return results
+
+
+def bench_state(repeat, records=(10000, 100000)):
+    """Save and load time and peak memory of the SQLite state store vs the old JSON file"""
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for count in records:
+            trackers = generate_tracker_dicts(count)
+            database = os.path.join(temp_dir, f"trackers-{count}.db")
+            json_file = os.path.join(temp_dir, f"trackers-{count}.json")
+
+            def save_sqlite():
+                if os.path.exists(database):
+                    os.remove(database)
+                with SQLiteStateStore(database) as state:
+                    state.update(trackers)
+
+            def load_sqlite():
+                with SQLiteStateStore(database) as state:
+                    return state.known_trackers()
+
+            def save_json():
+                save_trackers_to_file(trackers, json_file)
+
+            def load_json():
+                return load_previous_trackers(json_file)
+
+            for name, save, load in (('sqlite', save_sqlite, load_sqlite), ('json', save_json, load_json)):
+                results[f"{count}/{name}"] = {
+                    'records': count,
+                    'save_seconds': best_time(save, repeat),
+                    'load_seconds': best_time(load, repeat),
+                    'load_peak_bytes': peak_memory(load),
+                }
+            del trackers
+    return results
+
+
+def bench_parsers(repeat):
+    """Parse + extract throughput of each parser backend"""
+    corpora = {
+        'fixtures': load_fixture_pages(),
+        'synthetic-200': [generate_listing_page(200, page=n, max_page=10) for n in range(1, 6)],
+    }
+    backends = [name for name in PARSER_BACKENDS if name != 'lxml' or lxml is not None]
+    results = {}
+    for corpus, pages in corpora.items():
+        for backend in backends:
+            monitor = TrackerMonitor(crawl_config={'parser': backend})
+
+            def run():
+                for content in pages:
+                    monitor.extract_trackers(monitor.parser.parse(content))
+
+            seconds = best_time(run, repeat)
+            results[f"{corpus}/{backend}"] = {'pages_per_second': len(pages) / seconds, 'seconds': seconds}
+        baseline = results[f"{corpus}/bs4"]['seconds']
+        for backend in backends:
+            results[f"{corpus}/{backend}"]['speedup_vs_bs4'] = baseline / results[f"{corpus}/{backend}"]['seconds']
+    return results
+
+
+def peak_memory(func):
+    """Peak memory allocated by Python while func runs, in bytes"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def bench_restricted_parse(repeat):
+    """Tree size, parse time and peak memory of the restricted vs full BeautifulSoup parse"""
+    corpora = {
+        'fixtures': load_fixture_pages(),
+        'synthetic-200': [generate_listing_page(200, page=n, max_page=10) for n in range(1, 6)],
+    }
+    results = {}
+    for corpus, pages in corpora.items():
+        for mode, restricted in (('full', False), ('restricted', True)):
+            backend = get_parser_backend('bs4', restricted_parse=restricted)
+
+            def run():
+                return [backend.parse(content) for content in pages]
+
+            results[f"{corpus}/{mode}"] = {
+                'tree_nodes': sum(len(list(tree.descendants)) for tree in run()),
+                'parse_seconds': best_time(run, repeat),
+                'peak_bytes': peak_memory(run),
+            }
+    return results
+
+
+def bench_post_containers(repeat, posts=200):
+    """Post containers read per page and extract time, every selector match vs outermost posts only"""
+    corpora = {
+        'fixtures': load_fixture_pages(),
+        f'synthetic-{posts}': [generate_listing_page(posts, page=n, max_page=10) for n in range(1, 6)],
+    }
+    backends = [name for name in PARSER_BACKENDS if name != 'lxml' or lxml is not None]
+    results = {}
+    for corpus, pages in corpora.items():
+        for backend in backends:
+            monitor = TrackerMonitor(crawl_config={'parser': backend})
+            trees = [monitor.parser.parse(content) for content in pages]
+            matched = sum(len(monitor.parser.find_posts(tree)) for tree in trees)
+            read = sum(1 for tree in trees for _ in monitor.source.iter_posts(tree))
+
+            def run():
+                for tree in trees:
+                    monitor.extract_trackers(tree)
+
+            seconds = best_time(run, repeat)
+            results[f"{corpus}/{backend}"] = {
+                'matched_per_page': matched / len(pages),
+                'read_per_page': read / len(pages),
+                'extract_ms_per_page': seconds / len(pages) * 1000,
+            }
+    return results
+
+
+def lookup_post_fields(parser, post, source):
+    """A post's text, date parts and tag texts through separate find/find_all lookups, as before scan()"""
+    dates = []
+    for classes in source.DATE_CLASSES:
+        found = parser.find_by_class(post, classes)
+        dates.append(None if found is None else parser.text(found))
+    tags = [parser.text(node) for node in parser.find_all_by_class(post, source.TAG_ELEMENTS, source.TAG_CLASSES)]
+    return parser.text(post), dates, tags
+
+
+def bench_post_scan(repeat, posts=200):
+    """Per-post extraction time, separate find/find_all lookups vs one scan of each post"""
+    corpora = {
+        'fixtures': load_fixture_pages(),
+        f'synthetic-{posts}': [generate_listing_page(posts, page=n, max_page=10) for n in range(1, 6)],
+    }
+    backends = [name for name in PARSER_BACKENDS if name != 'lxml' or lxml is not None]
+    results = {}
+    for corpus, pages in corpora.items():
+        for backend in backends:
+            monitor = TrackerMonitor(crawl_config={'parser': backend})
+            parser, source = monitor.parser, monitor.source
+            post_nodes = [element for content in pages for element, *_ in source.iter_posts(parser.parse(content))]
+            scan_args = (source.DATE_CLASSES, source.TAG_ELEMENTS, source.TAG_CLASSES)
+            assert ([lookup_post_fields(parser, post, source) for post in post_nodes]
+                    == [parser.scan(post, *scan_args) for post in post_nodes])
+
+            def run_lookups():
+                for post in post_nodes:
+                    lookup_post_fields(parser, post, source)
+
+            def run_scan():
+                for post in post_nodes:
+                    parser.scan(post, *scan_args)
+
+            lookups = best_time(run_lookups, repeat)
+            scan = best_time(run_scan, repeat)
+            results[f"{corpus}/{backend}"] = {
+                'posts': len(post_nodes),
+                'lookups_us_per_post': lookups / len(post_nodes) * 1e6,
+                'scan_us_per_post': scan / len(post_nodes) * 1e6,
+                'speedup': lookups / scan,
+            }
+    return results
+
+
+def legacy_text_fields(text_content):
+    """Title, date, description and tag matching as done before the pattern engine"""
+    signup_pattern = r'([^(]+)\s*\(([^)]+)\)\s+IS OPEN FOR LIMITED SIGNUP!'
+    title_match = re.search(signup_pattern, text_content, re.IGNORECASE)
+    if not title_match:
+        return None
+    name = title_match.group(1).strip()
+    abbreviation = title_match.group(2).strip()
+    date = None
+    for pattern in [r'(\w{3}\s+\d{1,2}\s+\d{4})', r'(\d{1,2}\s+\w{3}\s+\d{4})', r'(\w{3}\.\s+\d{1,2},?\s+\d{4})']:
+        date_match = re.search(pattern, text_content, re.IGNORECASE)
+        if date_match:
+            date = date_match.group(1)
+            break
+    desc_pattern = rf'{re.escape(name)}\s+\({re.escape(abbreviation)}\)\s+is a\s+([^.]*?)(?:\n|$)'
+    desc_match = re.search(desc_pattern, text_content, re.IGNORECASE | re.DOTALL)
+    description = desc_match.group(1) if desc_match else None
+    tags = []
+    text_lower = text_content.lower()
+    for tag in DEFAULT_COMMON_TAGS:
+        if tag in text_lower and tag not in [t.lower() for t in tags]:
+            tags.append(tag)
+    return name, abbreviation, date, description, tags
+
+
+def engine_text_fields(engine, text_content):
+    """The same fields through the precompiled pattern engine"""
+    title_match = engine.match_title(text_content)
+    if not title_match:
+        return None
+    name, abbreviation = title_match
+    return (name, abbreviation, engine.find_date(text_content),
+            engine.find_description(text_content, name, abbreviation), engine.find_tags(text_content.lower()))
+
+
+def bench_patterns(repeat):
+    """Text field extraction throughput before and after the precompiled pattern engine"""
+    backend = get_parser_backend('lxml' if lxml is not None else 'bs4')
+    texts = []
+    for page in range(1, 11):
+        tree = backend.parse(generate_listing_page(200, page=page, max_page=10))
+        texts.extend(backend.text(post) for post in backend.find_posts(tree))
+    engine = PatternEngine()
+    assert [legacy_text_fields(text) for text in texts] == [engine_text_fields(engine, text) for text in texts]
+
+    def run_legacy():
+        # Distinct trackers overflow re's pattern cache, as on a long backfill
+        re.purge()
+        for text in texts:
+            legacy_text_fields(text)
+
+    def run_engine():
+        for text in texts:
+            engine_text_fields(engine, text)
+
+    results = {}
+    for name, func in (('legacy', run_legacy), ('engine', run_engine)):
+        seconds = best_time(func, repeat)
+        results[name] = {'posts_per_second': len(texts) / seconds, 'seconds': seconds}
+    results['engine']['speedup_vs_legacy'] = results['legacy']['seconds'] / results['engine']['seconds']
+    return results
+
+
+def generate_tracker_dicts(count, seed=0):
+    """Tracker dicts shaped like extractor output, with a 300 character full_text each"""
+    rng = random.Random(seed)
+    trackers = []
+    for number in range(count):
+        name = f"Tracker {number:07d}"
+        abbreviation = f"T{number:07d}"
+        categories = rng.sample(CATEGORIES, 2)
+        trackers.append({
+            'name': name,
+            'abbreviation': abbreviation,
+            'date': f"{rng.choice(MONTHS)} {rng.randint(1, 28)} 2026",
+            'description': f"Private Torrent Tracker for {' / '.join(categories)}",
+            'tags': [category.lower() for category in categories] + ['limited signup'],
+            'full_text': f"{name} ({abbreviation}) IS OPEN FOR LIMITED SIGNUP! ".ljust(300, '.')
+        })
+    return trackers
+
+
+def retained_memory(func):
+    """Memory still allocated by Python after func returns, with its result kept alive"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0], result
+    finally:
+        tracemalloc.stop()
+
+
+def bench_records(repeat, count=100000):
+    """Memory of 100k trackers loaded from JSON as dicts vs Tracker records"""
+    blob = json.dumps(generate_tracker_dicts(count))
+    loaders = {
+        'dicts': lambda: json.loads(blob),
+        'records': lambda: [Tracker.from_dict(tracker) for tracker in json.loads(blob)],
+    }
+    results = {}
+    for name, load in loaders.items():
+        size, trackers = retained_memory(load)
+        del trackers
+        results[name] = {'records': count, 'bytes': size, 'bytes_per_record': size / count,
+                         'load_seconds': best_time(load, repeat)}
+    results['records']['memory_vs_dicts'] = results['records']['bytes'] / results['dicts']['bytes']
+    return results
+
+
+def bench_smtp(repeat, messages=50):
+    """Email send latency per message against a local SMTP server, fresh vs pooled sessions"""
+    server = SMTPStandIn()
+    results = {}
+    try:
+        cases = {
+            'fresh-session': {'smtp_keepalive': 0},
+            'pooled-session': {},
+            'pooled-10-recipients': {'recipient_email': [f"member{n}@example.com" for n in range(10)]},
+        }
+        for name, settings in cases.items():
+            monitor = make_monitor(server.port, **settings)
+
+            def run():
+                for _ in range(messages):
+                    monitor.deliver_email(TRACKERS)
+
+            seconds = best_time(run, repeat)
+            monitor.close()
+            results[name] = {'messages': messages, 'ms_per_message': seconds / messages * 1000}
+    finally:
+        server.close()
+    results['pooled-session']['speedup_vs_fresh'] = (results['fresh-session']['ms_per_message'] /
+                                                    results['pooled-session']['ms_per_message'])
+    return results
+
+
+def generate_post_times(weeks, seed=0):
+    """Signup post times over some weeks from Monday 00:00 local time: busy evenings, quiet nights, bursts"""
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 5).timestamp()
+    times = []
+    for hour in range(weeks * 7 * 24):
+        weekday, hour_of_day = divmod(hour % 168, 24)
+        if hour_of_day < 7:
+            rate = 0.01
+        elif weekday >= 5:
+            rate = 0.08
+        else:
+            rate = 0.3 if hour_of_day >= 17 else 0.12
+        if rng.random() < rate:
+            posted = start + (hour + rng.random()) * 3600
+            times.append(posted)
+            # Trackers often open in groups
+            for _ in range(rng.choice([0, 0, 0, 1, 2])):
+                posted += rng.uniform(300, 5400)
+                times.append(posted)
+    return sorted(times)
+
+
+def load_post_times(db, weeks):
+    """first_seen times of the last weeks of a trackers.db, as the scheduler learns from them"""
+    if not os.path.exists(db):
+        raise FileNotFoundError(f"No tracker database at {db}")
+    with SQLiteStateStore(db) as state:
+        times = state.first_seen_times()
+        return learning_times(state, times[-1], history_days=weeks * 7) if times else []
+
+
+def bench_polling(repeat, weeks=8, db=None):
+    """Checks vs detection latency of fixed and adaptive polling
+    
+    Replays the first_seen history of a trackers.db when one is given, else synthetic post times
+    (a different set for each repeat). Policies learn from the first half and are measured on
+    the second.
+    """
+    history_times = load_post_times(db, weeks) if db else None
+    if history_times is not None and len(history_times) < 2:
+        raise ValueError(f"{db} has too little history to replay")
+    results = {}
+    days = 0.0
+    for seed in range(repeat):
+        times = generate_post_times(weeks, seed) if history_times is None else history_times
+        split = times[0] + (times[-1] - times[0]) / 2
+        days += (times[-1] + 7200 - split) / 86400
+        history = [timestamp for timestamp in times if timestamp < split]
+        policies = {
+            'fixed-60min': FixedInterval(3600),
+            'fixed-30min': FixedInterval(1800),
+            'fixed-15min': FixedInterval(900),
+            'adaptive-60min': AdaptiveInterval(3600, rng=random.Random(seed)),
+            'adaptive-30min': AdaptiveInterval(1800, rng=random.Random(seed)),
+            'adaptive-60min-boost': AdaptiveInterval(3600, boost=3600, rng=random.Random(seed)),
+        }
+        for name, policy in policies.items():
+            policy.learn(history)
+            run = simulate_polling(times, policy, split, times[-1] + 7200)
+            totals = results.setdefault(name, {'checks': 0, 'posts': 0, 'latency_sum': 0.0, 'latency_p95': 0.0})
+            totals['checks'] += run['checks']
+            totals['posts'] += run['detected']
+            totals['latency_sum'] += run['latency_avg'] * run['detected']
+            totals['latency_p95'] = max(totals['latency_p95'], run['latency_p95'])
+    for totals in results.values():
+        totals['checks_per_day'] = totals['checks'] / days
+        totals['latency_avg_minutes'] = totals.pop('latency_sum') / totals['posts'] / 60
+        totals['latency_p95_minutes'] = totals.pop('latency_p95') / 60
+    return results
+
+
+def bench_metrics(repeat, pages=5, posts=200):
+    """Crawl time of synthetic pages with metrics disabled and enabled"""
+    base = "https://opentrackers.org"
+    site = {base: generate_listing_page(posts, page=1, max_page=pages)}
+    for page in range(2, pages + 1):
+        site[f"{base}/page/{page}"] = generate_listing_page(posts, page=page, max_page=pages)
+    results = {}
+    for name, enabled in (('disabled', False), ('enabled', True)):
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1e9, 'burst': 1000})
+        if enabled:
+            monitor.enable_metrics()
+
+        def run():
+            monitor.session = FakeSession(site)
+            monitor.get_all_trackers()
+
+        seconds = best_time(run, repeat)
+        results[name] = {'pages': pages, 'ms_per_page': seconds / pages * 1000}
+    results['enabled']['overhead'] = results['enabled']['ms_per_page'] / results['disabled']['ms_per_page'] - 1
+    return results
+
+
+def bench_replay(repeat, posts=200, pages=5):
+    """Full monitoring cycles (fetch, parse, extract, diff, state) replayed from a page archive"""
+    site = serve_listing([generate_listing_page(posts, page=n, max_page=pages) for n in range(1, pages + 1)])
+    results = {}
+    with tempfile.TemporaryDirectory() as archive_dir:
+        recorder = TrackerMonitor(crawl_config={'requests_per_second': 1e9, 'burst': 1000, 'archive_dir': archive_dir})
+        recorder.session = FakeSession(site)
+        recorder.get_all_trackers()
+        stored = sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, files in os.walk(os.path.join(archive_dir, 'objects')) for name in files)
+        monitor = TrackerMonitor(crawl_config={'replay_dir': archive_dir})
+        found = []
+
+        def run():
+            # The cycle reports every tracker it finds; keep that out of the results
+            with SQLiteStateStore(':memory:') as state, contextlib.redirect_stdout(io.StringIO()):
+                found[:] = check_for_new_trackers(monitor, full_rescan=True, state=state)
+
+        seconds = best_time(run, repeat)
+        results['replay'] = {'pages': pages, 'trackers': len(found), 'cycle_seconds': seconds,
+                             'pages_per_second': pages / seconds}
+        raw = sum(len(content) for content in site.values())
+        results['archive'] = {'raw_bytes': raw, 'stored_bytes': stored, 'compression_ratio': raw / stored}
+    return results
+
+
+BENCHMARKS = {
+    'parsers': bench_parsers,
+    'restricted-parse': bench_restricted_parse,
+    'post-containers': bench_post_containers,
+    'post-scan': bench_post_scan,
+    'patterns': bench_patterns,
+    'records': bench_records,
+    'smtp': bench_smtp,
+    'polling': bench_polling,
+    'metrics': bench_metrics,
+    'listings': bench_listings,
+    'diff': bench_diff,
+    'state': bench_state,
+    'replay': bench_replay,
+}
+
+
+def current_commit():
+    """The git commit the benchmarks run on, or None outside a checkout"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, results):
+    """Lines comparing every numeric timing of a run with the same measurement in a baseline run"""
+    lines = []
+    for name, entries in results.items():
+        for key, values in entries.items():
+            before = baseline.get('benchmarks', {}).get(name, {}).get(key, {})
+            for metric, value in values.items():
+                old = before.get(metric)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                    continue
+                if 'seconds' in metric or metric in ('ms', 'ms_per_page', 'ms_per_message') or 'bytes' in metric:
+                    lines.append(f"{name} {key} {metric}: {old:.4g} -> {value:.4g} ({value / old - 1:+.1%})")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run DAMIE Tracker Monitor benchmarks")
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement, the best one is reported")
+    parser.add_argument('--posts', type=int, help="posts per synthetic listing page (listings, diff)")
+    parser.add_argument('--pages', type=int, help="synthetic listing pages (listings)")
+    parser.add_argument('--records', type=int, nargs='+', help="known tracker counts (diff, state)")
+    parser.add_argument('--db', metavar='FILE', help="replay the post history of a trackers.db (polling)")
+    parser.add_argument('--json', metavar='FILE', help="also write the results to a JSON file")
+    parser.add_argument('--compare', metavar='FILE', help="compare with results written earlier by --json")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark: {', '.join(unknown)}")
+    options = {name: value for name, value in (('posts', args.posts), ('pages', args.pages), ('records', args.records),
+                                               ('db', args.db))
+               if value is not None}
+
+    results = {}
+    for name in args.benchmarks or list(BENCHMARKS):
+        print(f"== {name} ==")
+        benchmark = BENCHMARKS[name]
+        accepted = inspect.signature(benchmark).parameters
+        results[name] = benchmark(args.repeat, **{key: value for key, value in options.items() if key in accepted})
+        for key, values in results[name].items():
+            formatted = ', '.join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in values.items())
+            print(f"{key}: {formatted}")
+
+    report = {
+        'commit': current_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'repeat': args.repeat,
+        'options': options,
+        'benchmarks': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"== compared with {baseline.get('commit') or args.compare} ==")
+        for line in compare_results(baseline, results):
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
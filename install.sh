@@ -21,7 +21,12 @@ echo "Detected platform: $PLATFORM"
 
 # Check if Python 3 is installed
 if ! command -v python3 &> /dev/null; then
-    echo "Python 3 is not installed. Please install Python 3.6+ first."
+    echo "Python 3 is not installed. Please install Python 3.9+ first."
+    exit 1
+fi
+
+if ! python3 -c 'import sys; sys.exit(sys.version_info < (3, 9))'; then
+    echo "Python 3.9+ is required, found $(python3 --version 2>&1)."
     exit 1
 fi
 
@@ -11,7 +11,7 @@ source test_env/bin/activate
 pip install -r requirements.txt
 
 # Run unit tests
-python -m unittest test_tracker_monitor.py -v
+python -m unittest discover -p 'test_*.py' -v
 
 # Run basic functionality test
 echo "Running basic functionality test..."
@@ -0,0 +1,88 @@
+import unittest
+import contextlib
+import io
+from unittest.mock import patch
+import json
+import os
+import tempfile
+from testing_support import FakeSession, make_listing_page
+from tracker_archive import PageArchive, ReplaySession
+from tracker_monitor import TokenBucket, TrackerMonitor, main
+
+
+class TestPageArchive(unittest.TestCase):
+    def setUp(self):
+        """Record a two page listing into a temporary archive."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.archive_dir = os.path.join(self.temp_dir.name, 'archive')
+        base = "https://opentrackers.org"
+        self.pages = {
+            base: make_listing_page([('Alpha', 'ALP', 1)], max_page=2),
+            f"{base}/page/2": make_listing_page([('Beta', 'BET', 2)], max_page=2),
+        }
+        self.recorder = TrackerMonitor(crawl_config={'requests_per_second': 1000, 'archive_dir': self.archive_dir})
+        self.recorder.session = FakeSession(self.pages)
+        self.recorded = self.recorder.get_all_trackers()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_pages_stored_once_by_content(self):
+        """Fetching unchanged pages again adds index entries but no new objects."""
+        self.recorder.session = FakeSession(self.pages)
+        self.recorder.get_all_trackers()
+        archive = PageArchive(self.archive_dir)
+        entries = archive.entries()
+        self.assertEqual(len(entries), 4)
+        self.assertEqual(len({entry['sha256'] for entry in entries}), 2)
+        objects = [name for _, _, files in os.walk(os.path.join(self.archive_dir, 'objects')) for name in files]
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(entries[0]['url'], "https://opentrackers.org/")
+        self.assertEqual(entries[0]['status'], 200)
+        self.assertEqual(archive.body(entries[0]['sha256']), self.pages["https://opentrackers.org"])
+
+    def test_replay_matches_live_crawl(self):
+        """A replaying monitor extracts the same trackers without network or rate limiting."""
+        monitor = TrackerMonitor(crawl_config={'replay_dir': self.archive_dir, 'requests_per_second': 0.001})
+        self.assertIsInstance(monitor.session, ReplaySession)
+        self.assertEqual(monitor.get_all_trackers(), self.recorded)
+        self.assertEqual(monitor.session.requested, ["https://opentrackers.org/", "https://opentrackers.org/page/2"])
+
+    def test_missing_page_is_not_found(self):
+        session = ReplaySession(self.archive_dir)
+        self.assertEqual(session.get("https://opentrackers.org/page/9").status_code, 404)
+
+    def test_replay_needs_an_archive(self):
+        """Replaying a directory without an archive is an error and leaves no archive behind."""
+        missing = os.path.join(self.temp_dir.name, 'typo')
+        with self.assertRaises(FileNotFoundError):
+            ReplaySession(missing)
+        with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()) as errors:
+            main(['--replay', missing])
+        self.assertIn("No page archive", errors.getvalue())
+        self.assertFalse(os.path.exists(missing))
+
+    def test_replay_flag(self):
+        """--replay runs a full check from the archive with no notifications, metrics or state written."""
+        original_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            with open('config.json', 'w') as f:
+                json.dump({'email': {'enabled': True},
+                           'metrics': {'enabled': True, 'textfile': 'metrics.prom'}}, f)
+            with patch.object(TrackerMonitor, 'deliver_email') as mock_deliver, \
+                    patch.object(TokenBucket, 'acquire') as mock_acquire, \
+                    contextlib.redirect_stdout(io.StringIO()) as output:
+                main(['--replay', self.archive_dir])
+            self.assertIn("Found 2 tracker listings", output.getvalue())
+            mock_deliver.assert_not_called()
+            mock_acquire.assert_not_called()
+            self.assertFalse(os.path.exists('trackers.db'))
+            self.assertFalse(os.path.exists('http_cache.json'))
+            self.assertFalse(os.path.exists('metrics.prom'))
+        finally:
+            os.chdir(original_cwd)
+
+
+if __name__ == '__main__':
+    unittest.main()
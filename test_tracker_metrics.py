@@ -0,0 +1,123 @@
+import unittest
+import os
+import tempfile
+import requests
+from testing_support import FakeSession, make_listing_page
+from tracker_monitor import TrackerMonitor, check_for_new_trackers
+from tracker_metrics import MetricsRegistry, MetricsServer, MonitorMetrics
+from tracker_notifications import NotificationDispatcher
+from tracker_state import SQLiteStateStore
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_text_exposition(self):
+        """Counters and histograms render in the Prometheus text format."""
+        registry = MetricsRegistry()
+        requests_total = registry.counter('requests_total', "Requests", ('status',))
+        latency = registry.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+        requests_total.inc(status=200)
+        requests_total.inc(2, status=200)
+        latency.observe(0.05)
+        latency.observe(0.5)
+        latency.observe(5)
+        
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{status="200"} 3',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 3',
+            'latency_seconds_count 3',
+            'latency_seconds_sum 5.55',
+        ])
+
+    def test_labels_must_match(self):
+        """Observing with the wrong labels is refused."""
+        counter = MetricsRegistry().counter('events_total', "Events", ('event',))
+        with self.assertRaises(ValueError):
+            counter.inc()
+        with self.assertRaises(ValueError):
+            counter.inc(-1, event='new')
+
+    def test_textfile_and_endpoint(self):
+        """The same text is written to the textfile and served on /metrics."""
+        metrics = MonitorMetrics()
+        metrics.cycles.inc()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'tracker_monitor.prom')
+            metrics.registry.write_textfile(filename)
+            with open(filename, encoding='utf-8') as f:
+                self.assertEqual(f.read(), metrics.render())
+        
+        server = MetricsServer(metrics.registry, port=0)
+        try:
+            response = requests.get(server.url, timeout=5)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('tracker_cycles_total 1', response.text)
+            self.assertEqual(requests.get(server.url.replace('/metrics', '/'), timeout=5).status_code, 404)
+        finally:
+            server.close()
+
+
+class TestMonitorMetrics(unittest.TestCase):
+    def setUp(self):
+        base = "https://opentrackers.org"
+        self.pages = {
+            base: make_listing_page([('Alpha', 'ALP', 1), ('Beta', 'BET', 2)], max_page=2),
+            f"{base}/page/2": make_listing_page([('Gamma', 'GAM', 3)], max_page=2),
+        }
+
+    def test_cycle_is_recorded(self):
+        """A cycle records fetches, parses, trackers per page and new trackers."""
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        monitor.session = FakeSession(self.pages)
+        metrics = monitor.enable_metrics()
+        with SQLiteStateStore(':memory:') as state:
+            self.assertEqual(len(check_for_new_trackers(monitor, state=state)), 3)
+        
+        host = 'opentrackers.org'
+        self.assertEqual(metrics.http_request_seconds.count(host=host), 2)
+        self.assertEqual(metrics.http_response_bytes.count(host=host), 2)
+        self.assertEqual(metrics.http_requests.value(host=host, status=200), 2)
+        self.assertEqual(metrics.parse_seconds.count(), 2)
+        self.assertEqual(metrics.extract_seconds.count(), 2)
+        self.assertEqual(metrics.page_trackers.count(), 2)
+        self.assertEqual(metrics.trackers_found.value(event='new'), 3)
+        self.assertEqual(metrics.cycles.value(), 1)
+        self.assertEqual(metrics.cycle_seconds.count(), 1)
+        self.assertIn('tracker_cycle_new_trackers_sum 3', metrics.render())
+
+    def test_disabled_by_default(self):
+        """Without enable_metrics nothing is recorded."""
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        monitor.session = FakeSession(self.pages)
+        self.assertEqual(len(monitor.get_all_trackers()), 3)
+        self.assertIsNone(monitor.metrics)
+
+    def test_notification_outcomes(self):
+        """Delivery latency, retries and failures reach the metrics through the dispatcher hook."""
+        metrics = MonitorMetrics()
+        attempts = []
+        
+        def flaky(trackers, event):
+            attempts.append(event)
+            if len(attempts) != 2:
+                raise ConnectionError("server unavailable")
+        
+        dispatcher = NotificationDispatcher(retries=1, backoff=0, sleep=lambda seconds: None,
+                                            on_result=metrics.record_notification)
+        dispatcher.add_channel('email', flaky)
+        dispatcher.submit([{'name': 'Alpha'}])
+        dispatcher.submit([{'name': 'Beta'}])
+        dispatcher.close()
+        
+        self.assertEqual(metrics.notification_seconds.count(channel='email'), 1)
+        self.assertEqual(metrics.notification_retries.value(channel='email'), 2)
+        self.assertEqual(metrics.notification_failures.value(channel='email'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,9 +1,14 @@
 import unittest
 from unittest.mock import patch, MagicMock
 import json
+import subprocess
+import sys
 import tempfile
+import time
 import os
-from tracker_monitor import TrackerMonitor, find_new_trackers, load_previous_trackers, save_trackers_to_file
+from tracker_monitor import Tracker, TrackerMonitor, TokenBucket, tracker_id, HTTPValidatorCache, find_new_trackers, iter_new_trackers, diff_trackers, main, check_for_new_trackers, flush_digest, load_previous_trackers, save_trackers_to_file
+from tracker_state import SQLiteStateStore
+from testing_support import FakeSession, ListingSiteStandIn, make_listing_page, three_page_listing
 
 
 class TestTrackerMonitor(unittest.TestCase):
@@ -102,6 +107,396 @@ class TestTrackerMonitor(unittest.TestCase):
         mock_json_dump.assert_called_once_with(trackers, mock_open().__enter__(), indent=2, ensure_ascii=False)
 
 
+class TestConcurrentCrawl(unittest.TestCase):
+    def setUp(self):
+        self.pages = three_page_listing()
+        self.crawl_config = {'requests_per_second': 1000, 'burst': 10}
+
+    def test_concurrent_crawl_keeps_page_order(self):
+        """Concurrent crawling returns the same list as the sequential crawl."""
+        sequential = TrackerMonitor(crawl_config=self.crawl_config)
+        sequential.session = FakeSession(self.pages)
+        concurrent = TrackerMonitor(crawl_config=dict(self.crawl_config, max_workers=3))
+        concurrent.session = FakeSession(self.pages)
+        
+        expected = sequential.get_all_trackers()
+        self.assertEqual([t['abbreviation'] for t in expected], ['ALP', 'BET', 'GAM', 'DEL'])
+        self.assertEqual(concurrent.get_all_trackers(), expected)
+
+    def test_pages_are_fetched_concurrently(self):
+        """With max_workers the pages after the first are downloaded at the same time."""
+        site = ListingSiteStandIn(three_page_listing(''), delay=0.3)
+        try:
+            monitor = TrackerMonitor(crawl_config=dict(self.crawl_config, base_url=site.url, max_workers=3))
+            self.assertEqual(len(monitor.get_all_trackers()), 4)
+        finally:
+            site.close()
+        first, *rest = sorted(site.intervals)
+        self.assertEqual(len(rest), 2)
+        # Page 1 is read alone for the pagination, then pages 2 and 3 overlap
+        self.assertLessEqual(first[1], min(start for start, _ in rest))
+        self.assertLess(max(start for start, _ in rest), min(end for _, end in rest))
+
+    def test_rate_limiter_is_per_host(self):
+        """Each host gets its own limiter and per-host overrides are applied."""
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 2, 'hosts': {'example.com': {'burst': 5}}})
+        limiter = monitor.get_rate_limiter("https://opentrackers.org/page/2")
+        self.assertIs(limiter, monitor.get_rate_limiter("https://opentrackers.org/"))
+        self.assertEqual(monitor.get_rate_limiter("https://example.com/").capacity, 5)
+        self.assertEqual(limiter.capacity, 1)
+        self.assertEqual(limiter.rate, 2)
+
+
+class TestCrawlRequests(unittest.TestCase):
+    def test_each_page_fetched_once_per_cycle(self):
+        """Pagination discovery and extraction share the page 1 download."""
+        base = "https://opentrackers.org"
+        pages = {
+            base: make_listing_page([('Alpha', 'ALP', 1)], max_page=3),
+            f"{base}/page/2": make_listing_page([('Beta', 'BET', 2)], max_page=3),
+            f"{base}/page/3": make_listing_page([('Gamma', 'GAM', 3)], max_page=3),
+        }
+        for max_workers in (1, 3):
+            monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000, 'max_workers': max_workers})
+            monitor.session = FakeSession(pages)
+            with patch.object(monitor.parser, 'parse', wraps=monitor.parser.parse) as mock_parse:
+                self.assertEqual(len(monitor.get_all_trackers()), 3)
+            self.assertEqual(sorted(monitor.session.requested), [f"{base}/", f"{base}/page/2", f"{base}/page/3"])
+            self.assertEqual(mock_parse.call_count, 3)
+
+
+class TestStreaming(unittest.TestCase):
+    def setUp(self):
+        self.pages = three_page_listing()
+
+    def test_iter_trackers_yields_before_later_pages_load(self):
+        """The first tracker is available before page 2 has been requested."""
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        monitor.session = FakeSession(self.pages)
+        stream = monitor.iter_trackers()
+        self.assertEqual(next(stream)['abbreviation'], 'ALP')
+        self.assertEqual(monitor.session.requested, ["https://opentrackers.org/"])
+        self.assertEqual([t['abbreviation'] for t in stream], ['BET', 'GAM', 'DEL'])
+
+    def test_streaming_diff_matches_find_new_trackers(self):
+        """iter_new_trackers yields exactly what find_new_trackers returns."""
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        monitor.session = FakeSession(self.pages)
+        current = monitor.get_all_trackers()
+        previous = current[1:3]
+        monitor.session = FakeSession(self.pages)
+        self.assertEqual(list(iter_new_trackers(monitor.iter_trackers(), previous)),
+                         find_new_trackers(current, previous))
+
+    def test_diff_trackers(self):
+        """diff_trackers splits a scan into new, changed and unchanged trackers."""
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        monitor.session = FakeSession(self.pages)
+        current = monitor.get_all_trackers()
+        previous = [dict(current[0], tags=['hd']), current[1]]
+        diff = diff_trackers(current, previous)
+        self.assertEqual(diff, {'new': current[2:], 'changed': [current[0]], 'unchanged': [current[1]]})
+        self.assertEqual(diff['new'], find_new_trackers(current, previous))
+
+    def test_main_notifies_per_page(self):
+        """main sends the alert for page 1 before page 2 is fetched."""
+        session = FakeSession(self.pages)
+        notified = []
+        
+        def record_notification(monitor, new_trackers):
+            notified.append(([t['abbreviation'] for t in new_trackers], len(session.requested)))
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            original_cwd = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                with patch('tracker_monitor.requests.Session', return_value=session), \
+                        patch.object(TokenBucket, 'acquire'), \
+                        patch.object(TrackerMonitor, 'send_notifications', record_notification):
+                    main([])
+                with SQLiteStateStore('trackers.db') as state:
+                    saved = state.known_trackers()
+            finally:
+                os.chdir(original_cwd)
+        
+        self.assertEqual(notified, [(['ALP', 'BET'], 1), (['GAM'], 2), (['DEL'], 3)])
+        self.assertEqual(len(saved), 4)
+
+
+class TestDigest(unittest.TestCase):
+    def setUp(self):
+        """Serve one listing page and collect notifications in a temporary state store."""
+        self.base = "https://opentrackers.org"
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.temp_dir.name, 'trackers.db')
+        self.monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        self.sent = []
+        self.monitor.send_notifications = lambda trackers, event='new': self.sent.append(
+            (event, [t['abbreviation'] for t in trackers]))
+        self.digest_config = {'enabled': True, 'window': 3600, 'max_events': 3}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def check(self, trackers):
+        self.monitor.session = FakeSession({self.base: make_listing_page(trackers)})
+        return check_for_new_trackers(self.monitor, state_file=self.state_file, digest_config=self.digest_config)
+
+    def test_buffers_until_max_events(self):
+        """New trackers from several cycles go out together once max_events are pending."""
+        self.check([('Alpha', 'ALP', 1)])
+        self.check([('Alpha', 'ALP', 1), ('Beta', 'BET', 2)])
+        self.assertEqual(self.sent, [])
+        self.check([('Alpha', 'ALP', 1), ('Beta', 'BET', 2), ('Gamma', 'GAM', 3)])
+        self.assertEqual(self.sent, [('new', ['ALP', 'BET', 'GAM'])])
+        with SQLiteStateStore(self.state_file) as state:
+            self.assertEqual(state.pending_events(), [])
+
+    def test_flushes_after_window(self):
+        """A single buffered tracker is sent once the window has passed."""
+        self.check([('Alpha', 'ALP', 1)])
+        with SQLiteStateStore(self.state_file) as state:
+            queued_at = state.pending_events()[0][3]
+            self.assertEqual(flush_digest(self.monitor, state, self.digest_config, now=queued_at + 60), 0)
+            self.assertEqual(flush_digest(self.monitor, state, self.digest_config, now=queued_at + 3600), 1)
+        self.assertEqual(self.sent, [('new', ['ALP'])])
+
+    def test_digest_disabled_sends_immediately(self):
+        """Without digest mode every cycle notifies right away."""
+        self.digest_config['enabled'] = False
+        self.check([('Alpha', 'ALP', 1)])
+        self.assertEqual(self.sent, [('new', ['ALP'])])
+
+
+class TestIncrementalCrawl(unittest.TestCase):
+    def setUp(self):
+        """Remember what a full scan of the listing finds."""
+        self.pages = three_page_listing()
+        self.monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        self.monitor.session = FakeSession(self.pages)
+        self.known = self.monitor.get_all_trackers()
+        self.monitor.session = FakeSession(self.pages)
+
+    def test_stops_at_first_fully_known_page(self):
+        """Nothing new on page 1 costs a single request."""
+        trackers = self.monitor.get_all_trackers(known_trackers=self.known)
+        self.assertEqual([t['abbreviation'] for t in trackers], ['ALP', 'BET'])
+        self.assertEqual(self.monitor.session.requested, ["https://opentrackers.org/"])
+
+    def test_continues_past_pages_with_new_trackers(self):
+        """Paging continues until a page has only known trackers."""
+        trackers = self.monitor.get_all_trackers(known_trackers=self.known[2:])
+        self.assertEqual([t['abbreviation'] for t in trackers], ['ALP', 'BET', 'GAM'])
+
+    def test_full_rescan(self):
+        """A full rescan ignores the watermark."""
+        trackers = self.monitor.get_all_trackers(known_trackers=self.known, full_rescan=True)
+        self.assertEqual(trackers, self.known)
+
+    def test_failed_page_is_read_next_cycle(self):
+        """A page that fails to load is not taken as known, and the next cycle reads it before stopping."""
+        base = "https://opentrackers.org"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            state_file = os.path.join(temp_dir, 'trackers.db')
+            self.monitor.send_notifications = lambda trackers, event='new': None
+            
+            def check(page1, page2, failing=()):
+                self.monitor.session = FakeSession({base: make_listing_page(page1, max_page=2),
+                                                    f"{base}/page/2": make_listing_page(page2, max_page=2)},
+                                                   failing=failing)
+                return [t['abbreviation'] for t in check_for_new_trackers(self.monitor, state_file=state_file)]
+            
+            self.assertEqual(check([('Alpha', 'ALP', 1)], [('Beta', 'BET', 2)]), ['ALP', 'BET'])
+            newer = [('New A', 'NA', 5), ('Alpha', 'ALP', 1)], [('New B', 'NB', 4), ('Beta', 'BET', 2)]
+            self.assertEqual(check(*newer, failing=[f"{base}/page/2"]), ['NA'])
+            with SQLiteStateStore(state_file) as state:
+                self.assertEqual(state.resume_pages(), {'opentrackers': 2})
+            with patch.object(SQLiteStateStore, 'known_trackers') as mock_known:
+                self.assertEqual(check(*newer), ['NB'])
+            mock_known.assert_not_called()
+            self.assertEqual(self.monitor.session.requested, [f"{base}/", f"{base}/page/2"])
+            with SQLiteStateStore(state_file) as state:
+                self.assertEqual(state.resume_pages(), {})
+
+    def test_empty_page_does_not_stop_scan(self):
+        """A page without listings says nothing about what comes after it."""
+        self.pages["https://opentrackers.org/page/2"] = make_listing_page([], max_page=3)
+        self.monitor.session = FakeSession(self.pages)
+        trackers = self.monitor.get_all_trackers(known_trackers=self.known[2:3])
+        self.assertEqual([t['abbreviation'] for t in trackers], ['ALP', 'BET', 'DEL'])
+
+
+class TestCycleOverlap(unittest.TestCase):
+    def setUp(self):
+        """Serve a slow three page listing from a local stand-in site, run from a temporary directory."""
+        self.site = ListingSiteStandIn({
+            '/': make_listing_page([('Alpha', 'ALP', 1)], max_page=3),
+            '/page/2': make_listing_page([('Beta', 'BET', 2)], max_page=3),
+            '/page/3': make_listing_page([('Gamma', 'GAM', 3)], max_page=3),
+        }, delay=0.5)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        with open(os.path.join(self.temp_dir.name, 'config.json'), 'w') as f:
+            json.dump({'email': {'enabled': False},
+                       'crawl': {'base_url': self.site.url, 'requests_per_second': 1000,
+                                 'http_cache_file': None}}, f)
+
+    def tearDown(self):
+        self.site.close()
+        self.temp_dir.cleanup()
+
+    def run_monitor(self):
+        script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tracker_monitor.py')
+        return subprocess.Popen([sys.executable, script], cwd=self.temp_dir.name, text=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+
+    def test_second_instance_skips_running_cycle(self):
+        """Two processes checking against the same state crawl the site only once."""
+        first = self.run_monitor()
+        deadline = time.monotonic() + 30
+        while not self.site.requested and time.monotonic() < deadline:
+            time.sleep(0.05)
+        second = self.run_monitor()
+        second_output, _ = second.communicate(timeout=60)
+        first_output, _ = first.communicate(timeout=60)
+        
+        self.assertIn("Another instance is already checking", second_output)
+        self.assertIn("Found 3 tracker listings", first_output)
+        self.assertEqual(sorted(self.site.requested), ['/', '/page/2', '/page/3'])
+        with SQLiteStateStore(os.path.join(self.temp_dir.name, 'trackers.db')) as state:
+            self.assertEqual(len(state), 3)
+
+    def test_cycle_deadline_skips_remaining_pages(self):
+        """Once cycle_timeout has passed no further page is requested."""
+        monitor = TrackerMonitor(crawl_config={'base_url': self.site.url, 'requests_per_second': 1000,
+                                               'cycle_timeout': 0.8})
+        trackers = monitor.get_all_trackers()
+        self.assertEqual([t['abbreviation'] for t in trackers], ['ALP'])
+        self.assertEqual(self.site.requested, ['/', '/page/2'])
+        self.assertIsNone(monitor.remaining_time())
+        # Page 2 timed out and page 3 was never requested: the next check reads through page 3
+        self.assertEqual(monitor.unfinished, {'opentrackers': 3})
+
+    def test_deadline_bounds_trickled_body(self):
+        """A page sent a little at a time is cut off at the deadline, though every read is quick."""
+        self.site.delay = 0.0
+        self.site.trickle = 0.2
+        monitor = TrackerMonitor(crawl_config={'base_url': self.site.url, 'requests_per_second': 1000,
+                                               'cycle_timeout': 0.5})
+        start = time.monotonic()
+        self.assertEqual(monitor.get_all_trackers(), [])
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(monitor.unfinished, {'opentrackers': 1})
+
+    def test_pages_cut_off_by_deadline_are_read_next_cycle(self):
+        """The incremental scan after a cut-short check does not stop before the skipped pages."""
+        state_file = os.path.join(self.temp_dir.name, 'trackers.db')
+        monitor = TrackerMonitor(crawl_config={'base_url': self.site.url, 'requests_per_second': 1000,
+                                               'cycle_timeout': 0.8})
+        monitor.send_notifications = lambda trackers, event='new': None
+        first = check_for_new_trackers(monitor, state_file=state_file)
+        self.assertEqual([t['abbreviation'] for t in first], ['ALP'])
+        monitor.crawl_config['cycle_timeout'] = None
+        second = check_for_new_trackers(monitor, state_file=state_file)
+        self.assertEqual([t['abbreviation'] for t in second], ['BET', 'GAM'])
+
+
+class TestHTTPValidatorCache(unittest.TestCase):
+    def setUp(self):
+        """Use a temporary cache file."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.temp_dir.name, 'http_cache.json')
+        self.pages = {"https://opentrackers.org": make_listing_page([('Alpha', 'ALP', 1)])}
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def make_monitor(self):
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000, 'http_cache_file': self.cache_file})
+        monitor.session = FakeSession(self.pages, etags=True)
+        return monitor
+
+    def test_not_modified_reuses_cached_trackers(self):
+        """A 304 on the next cycle returns the cached trackers without parsing."""
+        first = self.make_monitor()
+        expected = first.get_all_trackers()
+        self.assertEqual(first.http_cache.stats()['misses'], 1)
+        
+        # A fresh monitor picks the validators up from disk
+        second = self.make_monitor()
+        with patch.object(second, 'extract_trackers') as mock_extract:
+            self.assertEqual(second.get_all_trackers(), expected)
+            mock_extract.assert_not_called()
+        stats = second.http_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 0))
+        self.assertGreater(stats['bytes_saved'], 0)
+
+    def test_request_headers(self):
+        """Both validators are sent back when the server provided them."""
+        cache = HTTPValidatorCache(self.cache_file)
+        self.assertIsNone(cache.request_headers("https://opentrackers.org/"))
+        response = MagicMock(headers={'ETag': '"abc"', 'Last-Modified': 'Wed, 01 Jan 2026 00:00:00 GMT'}, content=b'x')
+        cache.store("https://opentrackers.org/", response, [])
+        self.assertEqual(cache.request_headers("https://opentrackers.org/"), {
+            'If-None-Match': '"abc"',
+            'If-Modified-Since': 'Wed, 01 Jan 2026 00:00:00 GMT'
+        })
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_acquire_waits_for_refill(self):
+        """Once the burst is spent, acquire sleeps until the next token is due."""
+        now = [0.0]
+        sleeps = []
+        
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+        
+        bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0], sleep=fake_sleep)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(sleeps, [])
+        bucket.acquire()
+        self.assertEqual(sleeps, [0.5])
+
+
+class TestTrackerRecord(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'name': 'Test Tracker',
+            'abbreviation': 'TT',
+            'date': 'Jan 1 2025',
+            'description': 'A test tracker',
+            'tags': ['hd', 'movies'],
+            'full_text': 'Test Tracker (TT) IS OPEN FOR LIMITED SIGNUP!'
+        }
+
+    def test_dict_round_trip(self):
+        """Converting to a record and back is lossless, including for partial dicts."""
+        self.assertEqual(Tracker.from_dict(self.data).to_dict(), self.data)
+        partial = {'name': 'Old Tracker', 'abbreviation': 'OT', 'date': 'Dec 1 2024', 'tags': []}
+        self.assertEqual(Tracker.from_dict(partial).to_dict(), partial)
+
+    def test_record_is_frozen_and_interned(self):
+        """Records are immutable, share tag strings and reuse the find_new_trackers identity."""
+        record = Tracker.from_dict(self.data)
+        with self.assertRaises(AttributeError):
+            record.name = 'Other'
+        other = Tracker.from_dict(json.loads(json.dumps(self.data)))
+        self.assertIs(record.tags[0], other.tags[0])
+        self.assertEqual(record.key, tracker_id(self.data))
+        self.assertEqual(record['tags'], ['hd', 'movies'])
+        self.assertEqual(find_new_trackers([record], [self.data]), [])
+
+    def test_save_and_load_records(self):
+        """Records are saved as plain dicts and can be loaded back as records."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            filename = os.path.join(temp_dir, 'trackers.json')
+            save_trackers_to_file([Tracker.from_dict(self.data)], filename)
+            self.assertEqual(load_previous_trackers(filename), [self.data])
+            self.assertEqual(load_previous_trackers(filename, as_records=True), [Tracker.from_dict(self.data)])
+
+
 class TestEmailNotification(unittest.TestCase):
     def setUp(self):
         """Set up test fixtures before each test method."""
@@ -135,7 +530,23 @@ class TestEmailNotification(unittest.TestCase):
         mock_smtp_instance.starttls.assert_called_once()
         mock_smtp_instance.login.assert_called_once_with('test@example.com', 'password')
         mock_smtp_instance.sendmail.assert_called_once()
+        # The session stays open for the next email until the monitor is closed
+        mock_smtp_instance.quit.assert_not_called()
+        self.monitor.close()
         mock_smtp_instance.quit.assert_called_once()
+    
+    @patch('smtplib.SMTP')
+    def test_changed_event_subscription(self, mock_smtp):
+        """Changed listings are only emailed to channels subscribed to 'changed'."""
+        changed = [{'name': 'Test Tracker', 'abbreviation': 'TT', 'date': 'Jan 1 2025',
+                    'description': 'Signup extended', 'tags': ['hd']}]
+        self.monitor.send_notifications(changed, event='changed')
+        mock_smtp.assert_not_called()
+        
+        self.email_config['events'] = ['new', 'changed']
+        self.monitor.send_notifications(changed, event='changed')
+        message = mock_smtp.return_value.sendmail.call_args[0][2]
+        self.assertIn("Tracker Signup Listings Updated (1 changed)", message)
 
 
 class TestWhatsAppNotification(unittest.TestCase):
@@ -150,7 +561,7 @@ class TestWhatsAppNotification(unittest.TestCase):
         self.monitor = TrackerMonitor(whatsapp_config=self.whatsapp_config)
     
     def test_send_whatsapp_notification(self):
-        """Test sending WhatsApp notification (placeholder)."""
+        """Test sending WhatsApp notification through the Cloud API."""
         new_trackers = [
             {
                 'name': 'Test Tracker',
@@ -161,8 +572,16 @@ class TestWhatsAppNotification(unittest.TestCase):
             }
         ]
         
-        # This should not raise an exception
-        self.monitor.send_whatsapp_notification(new_trackers)
+        with patch.object(self.monitor.http_notifier('whatsapp').session, 'post') as mock_post:
+            mock_post.return_value.status_code = 200
+            self.monitor.send_whatsapp_notification(new_trackers)
+        
+        url = mock_post.call_args[0][0]
+        self.assertEqual(url, 'https://graph.facebook.com/v13.0/YOUR_PHONE_NUMBER_ID/messages')
+        payload = mock_post.call_args[1]['json']
+        self.assertEqual(payload['to'], 'RECIPIENT_PHONE_NUMBER')
+        self.assertIn("Test Tracker (TT)", payload['text']['body'])
+        self.assertEqual(mock_post.call_args[1]['headers'], {'Authorization': 'Bearer YOUR_ACCESS_TOKEN'})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,479 @@
+import unittest
+import email
+import json
+import smtplib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from tracker_monitor import Tracker, TrackerMonitor
+from tracker_notifications import HTTPNotifier, NotificationDispatcher, SMTPConnectionPool, recipient_list, retry_after_seconds
+from testing_support import SMTPStandIn, TRACKERS, make_monitor
+
+
+class HTTPStandIn(ThreadingHTTPServer):
+    """Local HTTP server recording JSON POSTs
+
+    responses holds (status, headers) answers used up one per request before falling back to
+    200, and delay makes every response that many seconds late.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, responses=(), delay=0.0):
+        super().__init__(('127.0.0.1', 0), HTTPHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.responses = list(responses)
+        self.delay = delay
+        self.posts = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class HTTPHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.posts.append((self.path, dict(self.headers), json.loads(body)))
+            status, headers = server.responses.pop(0) if server.responses else (200, {})
+        time.sleep(server.delay)
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def message_text(message):
+    """Decoded plain text body of a received message"""
+    parsed = email.message_from_string(message)
+    return ''.join(part.get_payload(decode=True).decode('utf-8')
+                   for part in parsed.walk() if part.get_content_type() == 'text/plain')
+
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+
+    def make_dispatcher(self, **kwargs):
+        return NotificationDispatcher(sleep=self.sleeps.append, **kwargs)
+
+    def test_retries_with_exponential_backoff(self):
+        """A failing channel is retried with doubling delays capped at max_backoff."""
+        attempts = []
+
+        def deliver(trackers, event):
+            attempts.append(event)
+            if len(attempts) < 4:
+                raise ConnectionError("down")
+
+        with self.make_dispatcher(retries=3, backoff=1.0, max_backoff=3.0) as dispatcher:
+            dispatcher.add_channel('flaky', deliver)
+            dispatcher.submit(TRACKERS)
+        self.assertEqual(len(attempts), 4)
+        self.assertEqual(self.sleeps, [1.0, 2.0, 3.0])
+        stats = dispatcher.stats()['flaky']
+        self.assertEqual((stats['delivered'], stats['failed'], stats['retries']), (1, 0, 3))
+
+    def test_gives_up_after_retries(self):
+        """Delivery is abandoned after the configured retries without affecting other channels."""
+        delivered = []
+
+        def broken(trackers, event):
+            raise ConnectionError("down")
+
+        with self.make_dispatcher(retries=2) as dispatcher:
+            dispatcher.add_channel('broken', broken)
+            dispatcher.add_channel('working', lambda trackers, event: delivered.append(trackers))
+            dispatcher.submit(TRACKERS)
+        self.assertEqual(delivered, [TRACKERS])
+        self.assertEqual(dispatcher.stats()['broken']['failed'], 1)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_permanent_errors_are_not_retried(self):
+        """A 4xx other than 429 or an unexpected error fails at once; 429 and 5xx are retried."""
+        def http_error(status):
+            response = requests.Response()
+            response.status_code = status
+            return requests.HTTPError(f"{status} error", response=response)
+
+        cases = [(http_error(404), 1), (http_error(401), 1), (requests.exceptions.MissingSchema("no scheme"), 1),
+                 (ValueError("bad payload"), 1), (http_error(429), 3), (http_error(503), 3),
+                 (requests.Timeout("slow"), 3), (smtplib.SMTPAuthenticationError(535, b"bad login"), 1),
+                 (smtplib.SMTPDataError(451, b"try later"), 3)]
+        for error, attempts in cases:
+            with self.subTest(error=repr(error)):
+                calls = []
+
+                def deliver(trackers, event):
+                    calls.append(event)
+                    raise error
+
+                with self.make_dispatcher(retries=2) as dispatcher:
+                    dispatcher.add_channel('failing', deliver)
+                    dispatcher.submit(TRACKERS)
+                self.assertEqual(len(calls), attempts)
+                self.assertEqual(dispatcher.stats()['failing']['failed'], 1)
+
+    def test_waits_for_retry_after(self):
+        """A throttled request is retried after the server's Retry-After, and given up when it asks too much."""
+        def throttled(seconds):
+            response = requests.Response()
+            response.status_code = 429
+            response.headers['Retry-After'] = seconds
+            return requests.HTTPError("429 error", response=response)
+
+        for seconds, attempts, sleeps in (('7', 2, [7.0]), ('3600', 1, [])):
+            with self.subTest(retry_after=seconds):
+                self.sleeps.clear()
+                calls = []
+
+                def deliver(trackers, event):
+                    calls.append(event)
+                    if len(calls) == 1:
+                        raise throttled(seconds)
+
+                with self.make_dispatcher(retries=2, max_backoff=60.0) as dispatcher:
+                    dispatcher.add_channel('throttled', deliver)
+                    dispatcher.submit(TRACKERS)
+                self.assertEqual((len(calls), self.sleeps), (attempts, sleeps))
+
+    def test_close_drains_queue(self):
+        """close() returns only after every queued notification was delivered, in order."""
+        delivered = []
+
+        def slow(trackers, event):
+            time.sleep(0.01)
+            delivered.append(trackers[0]['abbreviation'])
+
+        dispatcher = self.make_dispatcher(max_queue=2)
+        dispatcher.add_channel('slow', slow)
+        for number in range(10):
+            dispatcher.submit([dict(TRACKERS[0], abbreviation=f"T{number}")])
+        dispatcher.close()
+        self.assertEqual(delivered, [f"T{number}" for number in range(10)])
+        self.assertEqual(dispatcher.stats()['slow']['queue_depth'], 0)
+        self.assertGreater(dispatcher.stats()['slow']['latency_max'], 0)
+        with self.assertRaises(RuntimeError):
+            dispatcher.submit(TRACKERS)
+
+    def test_submit_does_not_wait_for_delivery(self):
+        """Submitting returns while the channel is still busy delivering."""
+        release = threading.Event()
+        with self.make_dispatcher() as dispatcher:
+            dispatcher.add_channel('blocked', lambda trackers, event: release.wait())
+            start = time.monotonic()
+            dispatcher.submit(TRACKERS)
+            dispatcher.submit(TRACKERS)
+            self.assertLess(time.monotonic() - start, 0.5)
+            self.assertGreaterEqual(dispatcher.stats()['blocked']['queue_depth'], 1)
+            release.set()
+
+    def test_event_subscriptions(self):
+        """Channels only receive the events they subscribed to."""
+        received = []
+        with self.make_dispatcher() as dispatcher:
+            dispatcher.add_channel('new-only', lambda trackers, event: received.append(('new-only', event)))
+            dispatcher.add_channel('all', lambda trackers, event: received.append(('all', event)), ['new', 'changed'])
+            dispatcher.submit(TRACKERS, 'changed')
+        self.assertEqual(received, [('all', 'changed')])
+
+
+class TestEmailDelivery(unittest.TestCase):
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+
+    def tearDown(self):
+        self.smtp.close()
+
+    def test_delivers_through_dispatcher(self):
+        """Queued alerts reach the SMTP server once the dispatcher is stopped."""
+        monitor = make_monitor(self.smtp.port)
+        monitor.start_dispatcher()
+        monitor.send_notifications(TRACKERS)
+        stats = monitor.stop_dispatcher()
+        self.assertEqual(stats['email']['delivered'], 1)
+        self.assertEqual(len(self.smtp.messages), 1)
+        recipients, message = self.smtp.messages[0]
+        self.assertEqual(recipients, ['recipient@example.com'])
+        self.assertIn("New Tracker Signup Opportunities Found! (1 new)", message)
+        self.assertIn("Test Tracker (TT) - Closing: Jan 1 2026", message_text(message))
+
+    def test_retries_temporary_smtp_failure(self):
+        """A 451 from the server is retried until the message is accepted."""
+        self.smtp.fail_next = 2
+        monitor = make_monitor(self.smtp.port)
+        monitor.start_dispatcher({'backoff': 0.01})
+        monitor.send_notifications(TRACKERS)
+        stats = monitor.stop_dispatcher()
+        self.assertEqual((stats['email']['delivered'], stats['email']['retries']), (1, 2))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_dispatcher_owns_smtp_retries(self):
+        """A pooled session dropped under the dispatcher is retried by the dispatcher alone, and counted."""
+        self.smtp.hang_up_after_message = True
+        monitor = make_monitor(self.smtp.port)
+        monitor.start_dispatcher({'backoff': 0.01})
+        monitor.send_notifications(TRACKERS)
+        monitor.send_notifications(TRACKERS)
+        stats = monitor.stop_dispatcher()
+        self.assertEqual((stats['email']['delivered'], stats['email']['retries']), (2, 1))
+        pool_stats = monitor.smtp_pool().stats()
+        monitor.close()
+        self.assertEqual((pool_stats['sends'], pool_stats['retries']), (3, 0))
+        self.assertEqual(len(self.smtp.messages), 2)
+
+    def test_synchronous_send_without_dispatcher(self):
+        """Without a dispatcher the email is sent before send_notifications returns."""
+        make_monitor(self.smtp.port).send_notifications(TRACKERS)
+        self.assertEqual(len(self.smtp.messages), 1)
+        self.assertEqual(self.smtp.logins, 1)
+
+    def test_session_reused_across_emails(self):
+        """Several emails share one connection and one login."""
+        monitor = make_monitor(self.smtp.port)
+        for _ in range(3):
+            monitor.deliver_email(TRACKERS)
+        monitor.close()
+        self.assertEqual(len(self.smtp.messages), 3)
+        self.assertEqual((self.smtp.connections, self.smtp.logins), (1, 1))
+
+    def test_keepalive_disabled(self):
+        """With smtp_keepalive 0 every email gets its own session."""
+        monitor = make_monitor(self.smtp.port, smtp_keepalive=0)
+        monitor.deliver_email(TRACKERS)
+        monitor.deliver_email(TRACKERS)
+        self.assertEqual(self.smtp.connections, 2)
+
+    def test_multiple_recipients(self):
+        """A recipient list or comma-separated string is delivered in one transaction."""
+        for recipients in (['a@example.com', 'b@example.com'], 'a@example.com, b@example.com'):
+            make_monitor(self.smtp.port, recipient_email=recipients).deliver_email(TRACKERS)
+        self.assertEqual([message[0] for message in self.smtp.messages], [['a@example.com', 'b@example.com']] * 2)
+        self.assertIn("To: a@example.com, b@example.com", self.smtp.messages[0][1])
+
+
+class TestSMTPConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+        self.now = 0.0
+        self.pool = SMTPConnectionPool('127.0.0.1', self.smtp.port, 'user', 'password', use_tls=False,
+                                       idle_timeout=300, health_check_interval=10, clock=lambda: self.now)
+
+    def tearDown(self):
+        self.pool.close()
+        self.smtp.close()
+
+    def send(self):
+        self.pool.sendmail('monitor@example.com', ['recipient@example.com'], 'Subject: test\r\n\r\nbody')
+
+    def test_failed_health_check_reconnects(self):
+        """A session failing NOOP after sitting idle is replaced."""
+        self.send()
+        self.smtp.fail_noop = True
+        self.now = 60.0
+        self.send()
+        self.assertEqual(len(self.smtp.messages), 2)
+        self.assertEqual(self.pool.connections_opened, 2)
+
+    def test_stalled_session_is_discarded(self):
+        """A pooled session that stops answering times out and is replaced instead of hanging the sender."""
+        self.pool.timeout = 0.5
+        self.send()
+        self.smtp.stall_noop = True
+        self.now = 60.0
+        start = time.monotonic()
+        self.send()
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertEqual(len(self.smtp.messages), 2)
+        self.assertEqual(self.pool.connections_opened, 2)
+
+    def test_recently_used_session_skips_health_check(self):
+        """A session used moments ago is reused without a NOOP round trip."""
+        self.send()
+        self.smtp.fail_noop = True
+        self.send()
+        self.assertEqual((self.pool.connections_opened, self.pool.reused), (1, 1))
+
+    def test_dropped_session_is_retried_on_new_connection(self):
+        """A send on a session the server already closed is retried once on a fresh one."""
+        self.smtp.hang_up_after_message = True
+        self.send()
+        self.send()
+        self.assertEqual(len(self.smtp.messages), 2)
+        self.assertEqual(self.pool.connections_opened, 2)
+        self.assertEqual(self.pool.stats()['sends'], 3)
+        self.assertEqual(self.pool.stats()['retries'], 1)
+
+    def test_idle_timeout(self):
+        """Sessions idle for longer than idle_timeout are logged out, not reused."""
+        self.send()
+        self.now = 301.0
+        self.send()
+        self.assertEqual((self.pool.connections_opened, self.pool.reused), (2, 0))
+
+    def test_recipient_list(self):
+        """Recipients can be given as a list or a comma-separated string."""
+        self.assertEqual(recipient_list(' a@example.com,b@example.com, '), ['a@example.com', 'b@example.com'])
+        self.assertEqual(recipient_list(['a@example.com']), ['a@example.com'])
+
+
+
+class RecordingLimiter:
+    def __init__(self):
+        self.acquired = 0
+
+    def acquire(self):
+        self.acquired += 1
+
+
+class TestHTTPNotifier(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPStandIn()
+        self.sleeps = []
+        self.limiters = {}
+
+        def limiter_factory(host):
+            limiter = self.limiters[host] = RecordingLimiter()
+            return limiter
+
+        self.notifier = HTTPNotifier(limiter_factory=limiter_factory, retries=3, backoff=1.0, max_backoff=30.0,
+                                     sleep=self.sleeps.append)
+
+    def tearDown(self):
+        self.notifier.close()
+        self.server.close()
+
+    def test_post_json(self):
+        """Payload and headers arrive as sent, through the host's rate limiter."""
+        self.notifier.post(f"{self.server.url}/hook", {'text': 'hi'}, headers={'Authorization': 'Bearer token'})
+        path, headers, payload = self.server.posts[0]
+        self.assertEqual((path, payload, headers['Authorization']), ('/hook', {'text': 'hi'}, 'Bearer token'))
+        self.assertEqual(list(self.limiters.values())[0].acquired, 1)
+        self.assertEqual(self.notifier.stats()['requests'], 1)
+
+    def test_retries_throttled_and_server_errors(self):
+        """429 waits for Retry-After, 5xx backs off exponentially, both until success."""
+        self.server.responses = [(429, {'Retry-After': '7'}), (503, {}), (502, {})]
+        response = self.notifier.post(f"{self.server.url}/hook", {})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.sleeps, [7.0, 2.0, 4.0])
+        self.assertEqual(len(self.server.posts), 4)
+        self.assertEqual(list(self.limiters.values())[0].acquired, 4)
+        self.assertEqual(self.notifier.stats()['retries'], 3)
+
+    def test_gives_up(self):
+        """Client errors are not retried; retries stop when exhausted or asked to wait too long."""
+        for responses, attempts in (([(400, {})], 1),
+                                    ([(500, {})] * 4, 4),
+                                    ([(429, {'Retry-After': '3600'})], 1)):
+            self.server.posts = []
+            self.server.responses = list(responses)
+            with self.assertRaises(Exception):
+                self.notifier.post(f"{self.server.url}/hook", {})
+            self.assertEqual(len(self.server.posts), attempts)
+
+    def test_retry_after_http_date(self):
+        """Retry-After may be an HTTP date."""
+        response = MagicResponse({'Retry-After': 'Thu, 01 Jan 2026 00:00:30 GMT'})
+        self.assertEqual(retry_after_seconds(response, now=1767225600.0), 30.0)
+        self.assertIsNone(retry_after_seconds(MagicResponse({})))
+
+    def test_post_many_is_concurrent(self):
+        """Slow endpoints are posted to in parallel and failures are returned, not raised."""
+        self.server.delay = 0.2
+        self.server.responses = [(400, {})]
+        start = time.monotonic()
+        results = self.notifier.post_many((f"{self.server.url}/hook/{n}", {'n': n}, None) for n in range(5))
+        self.assertLess(time.monotonic() - start, 0.6)
+        self.assertEqual(sum(isinstance(result, Exception) for result in results), 1)
+        self.assertEqual(sorted(post[2]['n'] for post in self.server.posts), list(range(5)))
+
+
+class MagicResponse:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class TestHTTPChannels(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPStandIn()
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_whatsapp_cloud_api(self):
+        """The WhatsApp message is posted to the Cloud API messages endpoint."""
+        monitor = TrackerMonitor(whatsapp_config={
+            'enabled': True, 'api_url': f"{self.server.url}/v13.0/12345",
+            'access_token': 'token', 'phone_number': '15550001111'})
+        monitor.start_dispatcher()
+        monitor.send_notifications(TRACKERS)
+        self.assertEqual(monitor.stop_dispatcher()['whatsapp']['delivered'], 1)
+        monitor.close()
+        path, headers, payload = self.server.posts[0]
+        self.assertEqual(path, '/v13.0/12345/messages')
+        self.assertEqual(headers['Authorization'], 'Bearer token')
+        self.assertEqual((payload['messaging_product'], payload['to']), ('whatsapp', '15550001111'))
+        self.assertIn("Test Tracker (TT)", payload['text']['body'])
+
+    def test_webhook_formats_and_subscriptions(self):
+        """Each endpoint gets its own payload format and only the events it subscribed to."""
+        monitor = TrackerMonitor(webhook_config={'enabled': True, 'endpoints': [
+            {'url': f"{self.server.url}/slack", 'format': 'slack'},
+            {'url': f"{self.server.url}/discord", 'format': 'discord', 'events': ['new', 'changed']},
+            {'url': f"{self.server.url}/json"},
+        ]})
+        records = [Tracker.from_dict(tracker) for tracker in TRACKERS]
+        monitor.send_notifications(records)
+        monitor.send_notifications(records, event='changed')
+        monitor.close()
+        posts = {}
+        for path, headers, payload in self.server.posts:
+            posts.setdefault(path, []).append(payload)
+        self.assertEqual(len(posts['/slack']), 1)
+        self.assertIn("Test Tracker (TT)", posts['/slack'][0]['text'])
+        self.assertEqual(len(posts['/discord']), 2)
+        self.assertIn("listings have changed", posts['/discord'][1]['content'])
+        self.assertEqual(posts['/json'], [{'event': 'new', 'text': posts['/slack'][0]['text'], 'trackers': TRACKERS}])
+
+    def test_webhooks_are_separate_dispatcher_channels(self):
+        """A failing webhook is retried on its own without re-posting to the others."""
+        failing = HTTPStandIn(responses=[(503, {})])
+        self.addCleanup(failing.close)
+        monitor = TrackerMonitor(webhook_config={'enabled': True, 'endpoints': [
+            {'name': 'failing', 'url': f"{failing.url}/hook"},
+            {'name': 'working', 'url': f"{self.server.url}/hook"},
+        ]})
+        monitor.start_dispatcher({'backoff': 0.01})
+        monitor.send_notifications(TRACKERS)
+        stats = monitor.stop_dispatcher()
+        monitor.close()
+        self.assertEqual((stats['webhook:failing']['delivered'], stats['webhook:failing']['retries']), (1, 1))
+        self.assertEqual((len(failing.posts), len(self.server.posts)), (2, 1))
+
+    def test_dispatcher_owns_retries(self):
+        """Under the dispatcher a failing endpoint gets one request per attempt, not the notifier's retries on top."""
+        self.server.responses = [(503, {})] * 10
+        monitor = TrackerMonitor(webhook_config={'enabled': True, 'retries': 3, 'endpoints': [
+            {'name': 'down', 'url': f"{self.server.url}/hook"}]})
+        monitor.start_dispatcher({'retries': 2, 'backoff': 0.01})
+        monitor.send_notifications(TRACKERS)
+        stats = monitor.stop_dispatcher()
+        monitor.close()
+        self.assertEqual((stats['webhook:down']['failed'], stats['webhook:down']['retries']), (1, 2))
+        self.assertEqual(len(self.server.posts), 3)
+        self.assertEqual(monitor.http_notifier('webhook').stats()['requests'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+from unittest.mock import patch
+import glob
+import json
+import os
+import re
+from tracker_monitor import TrackerMonitor
+from tracker_parsers import PARSER_BACKENDS, PatternEngine, get_parser_backend, lxml
+from testing_support import generate_listing_page
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Highest page linked from each fixture's pagination
+EXPECTED_MAX_PAGE = {
+    'listing_page1.html': 48,
+    'listing_page2.html': 3,
+    'listing_no_pagination.html': 7,
+    'listing_wrapped_posts.html': 2,
+}
+
+
+def available_backends():
+    """Names of the parser backends usable in this environment"""
+    return [name for name in PARSER_BACKENDS if name != 'lxml' or lxml is not None]
+
+
+def backend_configs():
+    """Crawl configs covering every usable backend, with and without restricted parsing"""
+    return [{'parser': name, 'restricted_parse': restricted}
+            for name in available_backends() for restricted in (False, True)]
+
+
+class TestParserBackends(unittest.TestCase):
+    def test_backends_match_fixture_corpus(self):
+        """Every backend extracts exactly the recorded tracker dicts from every fixture."""
+        fixtures = sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html')))
+        self.assertTrue(fixtures)
+        for config in backend_configs():
+            monitor = TrackerMonitor(crawl_config=config)
+            for path in fixtures:
+                with self.subTest(fixture=os.path.basename(path), **config):
+                    with open(path, 'rb') as f:
+                        tree = monitor.parser.parse(f.read())
+                    with open(path[:-len('.html')] + '.json', 'r', encoding='utf-8') as f:
+                        expected = json.load(f)
+                    self.assertEqual(monitor.extract_trackers(tree), expected)
+                    self.assertEqual(monitor.find_max_page(tree), EXPECTED_MAX_PAGE[os.path.basename(path)])
+
+    def test_backends_agree_on_synthetic_pages(self):
+        """Backends agree on generated pages, which have many posts and a long pagination."""
+        content = generate_listing_page(50, page=2, max_page=9)
+        results = []
+        for config in backend_configs():
+            monitor = TrackerMonitor(crawl_config=config)
+            tree = monitor.parser.parse(content)
+            results.append((monitor.extract_trackers(tree), monitor.find_max_page(tree)))
+        self.assertEqual(len(results[0][0]), 40)
+        self.assertEqual(results[0][1], 9)
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_lxml_text_matches_get_text(self):
+        """The lxml text helper follows BeautifulSoup's get_text() rules."""
+        if lxml is None:
+            self.skipTest("lxml is not installed")
+        html = ('<div class="post"> a <template>T<b>tb</b></template>\n  <style>S</style><pre>  x  \n </pre>'
+                '<textarea>   </textarea><!-- c --> &nbsp; <script>s()</script><rp>(</rp><rt>rt</rt>\n\n</div>')
+        bs4_backend = get_parser_backend('bs4')
+        lxml_backend = get_parser_backend('lxml')
+        expected = bs4_backend.text(bs4_backend.find_posts(bs4_backend.parse(html))[0])
+        self.assertEqual(lxml_backend.text(lxml_backend.find_posts(lxml_backend.parse(html))[0]), expected)
+
+    def test_restricted_parse_skips_page_chrome(self):
+        """The restricted tree has the posts and pagination but not the sidebar or scripts."""
+        with open(os.path.join(FIXTURE_DIR, 'listing_page1.html'), 'rb') as f:
+            content = f.read()
+        full = get_parser_backend('bs4').parse(content)
+        restricted = get_parser_backend('bs4', restricted_parse=True).parse(content)
+        self.assertLess(len(list(restricted.descendants)), len(list(full.descendants)))
+        self.assertIsNone(restricted.find('aside'))
+        self.assertIsNone(restricted.find('script', src=True))
+        self.assertIsNotNone(restricted.select_one('.multinav'))
+
+    def test_nested_post_containers_read_once(self):
+        """Wrappers inside a post are skipped unread and wrappers around several posts are passed over."""
+        content = generate_listing_page(10, max_page=1)
+        for config in backend_configs():
+            with self.subTest(**config):
+                monitor = TrackerMonitor(crawl_config=config)
+                tree = monitor.parser.parse(content)
+                # Each synthetic post matches three times: the article, post-date and post-tags
+                self.assertEqual(len(monitor.parser.find_posts(tree)), 30)
+                with patch.object(monitor.parser, 'scan', wraps=monitor.parser.scan) as mock_scan:
+                    posts = list(monitor.source.iter_posts(tree))
+                self.assertEqual(len(posts), 10)
+                self.assertEqual(mock_scan.call_count, 10)
+        
+        html = ('<div class="posts"><div class="post"><div class="post-content">A (A) IS OPEN FOR LIMITED SIGNUP! '
+                'Jan 1 2026</div></div><div class="post">B (B) IS OPEN FOR LIMITED SIGNUP! Jan 2 2026</div>'
+                '<div class="post">A (A) IS OPEN FOR LIMITED SIGNUP! Jan 1 2026</div></div>')
+        for config in backend_configs():
+            with self.subTest(**config):
+                monitor = TrackerMonitor(crawl_config=config)
+                trackers = monitor.extract_trackers(monitor.parser.parse(html))
+                self.assertEqual([(t['abbreviation'], t['date']) for t in trackers], [('A', 'Jan 1 2026'), ('B', 'Jan 2 2026')])
+
+    def test_scan_matches_separate_lookups(self):
+        """One scan of a post finds the same text, date parts and tags as text() plus find_by_class/find_all_by_class."""
+        pages = []
+        for path in sorted(glob.glob(os.path.join(FIXTURE_DIR, '*.html'))):
+            with open(path, 'rb') as f:
+                pages.append(f.read())
+        pages.append(generate_listing_page(20, page=3, max_page=5))
+        pages.append('<article class="post"><span class="post-month"> Feb </span><p class="Post-Tags">HD <script>x</script>'
+                      '<b class="post-day">3</b></p><pre class="category">  a \n </pre><a class="tag"><!-- c -->TV</a>'
+                      '<style class="post-year">2026</style><div class="post-date"><span class="post-year">2027</span></div></article>')
+        date_classes = [['post-date', 'post-day', 'post-month', 'post-year'], ['post-day'], ['post-month'], ['post-year']]
+        tag_args = (['span', 'a', 'div', 'p'], ['tag', 'category', 'post-tags'])
+        for config in backend_configs():
+            parser = TrackerMonitor(crawl_config=config).parser
+            for number, content in enumerate(pages):
+                with self.subTest(page=number, **config):
+                    posts = parser.find_posts(parser.parse(content))
+                    self.assertTrue(posts)
+                    for post in posts:
+                        dates = []
+                        for classes in date_classes:
+                            found = parser.find_by_class(post, classes)
+                            dates.append(None if found is None else parser.text(found))
+                        tags = [parser.text(node) for node in parser.find_all_by_class(post, *tag_args)]
+                        self.assertEqual(parser.scan(post, date_classes, *tag_args), (parser.text(post), dates, tags))
+
+    def test_unknown_backend(self):
+        """Asking for a backend that does not exist is an error."""
+        with self.assertRaises(ValueError):
+            get_parser_backend('html5')
+
+
+class TestPatternEngine(unittest.TestCase):
+    def test_description_matches_per_tracker_regex(self):
+        """find_description agrees with the regex it replaces, which was compiled per tracker."""
+        cases = [
+            ("Foo Bar (FB) is a tracker for HD\nmore", "Foo Bar", "FB"),
+            ("foo bar  (fb)\n is A Tracker for TV. Rest", "Foo Bar", "FB"),
+            ("Foo (X) is a decoy\nFoo (F) is a real one", "Foo", "F"),
+            ("Other Foo (F) is a suffix match", "Foo", "F"),
+            ("Foo(F) is a missing space", "Foo", "F"),
+            ("Foo (F) is a (F) is a nested\n", "Foo", "F"),
+            ("Foo (F) is a no newline at the end", "Foo", "F"),
+            ("(F) is a short text", "Foo", "F"),
+            ("Über (Ü) is a unicode name\n", "über", "ü"),
+            ("Signup ( S ) is a padded abbreviation", "Signup", " S "),
+        ]
+        engine = PatternEngine()
+        for text, name, abbreviation in cases:
+            with self.subTest(text=text):
+                pattern = rf'{re.escape(name)}\s+\({re.escape(abbreviation)}\)\s+is a\s+([^.]*?)(?:\n|$)'
+                match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+                self.assertEqual(engine.find_description(text, name, abbreviation), match.group(1) if match else None)
+
+    def test_configurable_tags(self):
+        """Tags are matched as substrings of the lowercased text, in configured order."""
+        engine = PatternEngine(['uhd', 'hd', 'ebooks'])
+        self.assertEqual(engine.find_tags("uhd movies"), ['uhd', 'hd'])
+        monitor = TrackerMonitor(crawl_config={'common_tags': ['ebooks']})
+        self.assertEqual(monitor.patterns.common_tags, ['ebooks'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import tempfile
+from testing_support import FakeSession, make_listing_page
+from tracker_monitor import TokenBucket, main
+from tracker_profile import CycleProfiler
+
+
+class TestCycleProfiler(unittest.TestCase):
+    def test_stage_totals_and_pages(self):
+        """Each stage run is added to the stage totals and to its page."""
+        profiler = CycleProfiler()
+        for url in ('https://example.com/', 'https://example.com/page/2'):
+            with profiler.stage('parse', url):
+                sum(range(10000))
+        with profiler.stage('cycle'):
+            pass
+        
+        report = profiler.report()
+        self.assertEqual(report['cycles'], 1)
+        self.assertEqual(report['stages']['parse']['count'], 2)
+        self.assertGreater(report['stages']['parse']['cpu_seconds'], 0)
+        self.assertEqual(sorted(report['pages']), ['https://example.com/', 'https://example.com/page/2'])
+        self.assertNotIn('extractor', report)
+
+    def test_unknown_capture(self):
+        with self.assertRaises(ValueError):
+            CycleProfiler(capture=['perf'])
+
+
+class TestProfileFlag(unittest.TestCase):
+    def test_main_writes_report(self):
+        """--profile writes per-stage and per-page times along with the extractor captures."""
+        base = "https://opentrackers.org"
+        session = FakeSession({
+            base: make_listing_page([('Alpha', 'ALP', 1)], max_page=2),
+            f"{base}/page/2": make_listing_page([('Beta', 'BET', 2)], max_page=2),
+        })
+        with tempfile.TemporaryDirectory() as temp_dir:
+            original_cwd = os.getcwd()
+            os.chdir(temp_dir)
+            try:
+                with open('config.json', 'w') as f:
+                    json.dump({'email': {'enabled': False}}, f)
+                with patch('tracker_monitor.requests.Session', return_value=session), \
+                        patch.object(TokenBucket, 'acquire'):
+                    main(['--profile', 'cycle.json', '--profile-capture', 'cprofile',
+                          '--profile-capture', 'tracemalloc'])
+                with open('cycle.json', encoding='utf-8') as f:
+                    report = json.load(f)
+            finally:
+                os.chdir(original_cwd)
+        
+        self.assertEqual(report['cycles'], 1)
+        for stage in ('rate_limit', 'fetch', 'parse', 'pagination', 'extract', 'diff', 'cycle'):
+            self.assertIn(stage, report['stages'])
+        self.assertEqual(report['stages']['extract']['count'], 2)
+        self.assertLessEqual({'rate_limit', 'fetch', 'parse', 'extract', 'diff'}, set(report['pages'][f"{base}/page/2"]))
+        self.assertTrue(any('extract_trackers' in function['function']
+                            for function in report['extractor']['cprofile']))
+        self.assertGreater(report['extractor']['tracemalloc']['peak_bytes'], 0)
+        self.assertEqual(report['notifications'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
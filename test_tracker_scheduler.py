@@ -0,0 +1,182 @@
+import unittest
+from unittest.mock import patch
+import itertools
+import json
+import os
+import tempfile
+from datetime import datetime
+from testing_support import FakeSession, make_listing_page
+from tracker_monitor import TokenBucket, TrackerMonitor, check_for_new_trackers, load_config
+from tracker_scheduler import AdaptiveInterval, FixedInterval, learning_times, next_run_after, run_daemon, simulate_polling
+from tracker_state import SQLiteStateStore
+
+
+class FakeClock:
+    """Clock that only moves when slept on"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        """Run in a temporary directory with a config.json checking every 30 minutes."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.original_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        with open('config.json', 'w') as f:
+            json.dump({'email': {'enabled': False, 'recipient_email': 'team@example.com'},
+                       'schedule': {'interval_minutes': 30}}, f)
+
+    def tearDown(self):
+        os.chdir(self.original_cwd)
+        self.temp_dir.cleanup()
+
+    def test_load_config(self):
+        """config.json overrides the defaults section by section."""
+        config = load_config('config.json')
+        self.assertEqual(config['schedule']['interval_minutes'], 30)
+        self.assertEqual(config['email']['recipient_email'], 'team@example.com')
+        self.assertFalse(config['email']['enabled'])
+        self.assertEqual(config['email']['smtp_port'], 587)
+        self.assertEqual(load_config('missing.json')['schedule']['interval_minutes'], 60)
+
+    def test_next_run_after(self):
+        """Runs stay on the fixed schedule and skip slots missed by a long cycle."""
+        self.assertEqual(next_run_after(0, 60, 5), 60)
+        self.assertEqual(next_run_after(0, 60, 60), 120)
+        self.assertEqual(next_run_after(0, 60, 150), 180)
+
+    def test_daemon_reuses_one_monitor(self):
+        """Every cycle runs on the same monitor and session, sleeping until the next slot."""
+        session = FakeSession({"https://opentrackers.org": make_listing_page([('Alpha', 'ALP', 1)])})
+        clock = FakeClock()
+        monitors = []
+        original_init = TrackerMonitor.__init__
+
+        def record_init(monitor, *args, **kwargs):
+            original_init(monitor, *args, **kwargs)
+            monitors.append(monitor)
+
+        with patch('tracker_monitor.requests.Session', return_value=session) as session_class, \
+                patch.object(TrackerMonitor, '__init__', record_init), \
+                patch.object(TokenBucket, 'acquire'):
+            run_daemon(load_config('config.json'), cycles=3, clock=clock, sleep=clock.sleep)
+
+        self.assertEqual(len(monitors), 1)
+        self.assertEqual(session_class.call_count, 1)
+        self.assertEqual(clock.sleeps, [1800.0, 1800.0])
+        self.assertEqual(len(session.requested), 3)
+
+
+    def test_adaptive_daemon_tightens_after_new_tracker(self):
+        """A cycle that finds a new tracker is followed by a check at the minimum interval."""
+        session = FakeSession({"https://opentrackers.org": make_listing_page([('Alpha', 'ALP', 1)])})
+        clock = FakeClock()
+        policy = AdaptiveInterval(3600, min_interval=600, max_interval=7200, jitter=0, boost=3600)
+        with patch('tracker_monitor.requests.Session', return_value=session), \
+                patch.object(TokenBucket, 'acquire'):
+            run_daemon(load_config('config.json'), cycles=2, clock=clock, sleep=clock.sleep, policy=policy)
+        self.assertEqual(clock.sleeps, [600])
+
+
+# Monday 5 January 2026, local time
+MONDAY = datetime(2026, 1, 5).timestamp()
+HOUR = 3600
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+    def setUp(self):
+        """Four weeks of posts every Monday evening, and one on Wednesday afternoon."""
+        self.posts = []
+        for week in range(4):
+            for minute in (5, 25, 45):
+                self.posts.append(MONDAY + week * 168 * HOUR + 20 * HOUR + minute * 60)
+        self.posts.append(MONDAY + 2 * 24 * HOUR + 15 * HOUR)
+        self.policy = AdaptiveInterval(1800, min_interval=600, max_interval=7200, jitter=0)
+        self.policy.learn(self.posts)
+
+    def test_busy_hours_are_checked_more_often(self):
+        """The interval is short in the busy hour and long in quiet ones, within the bounds."""
+        busy = self.policy.next_interval(MONDAY + 20 * HOUR + 1800)
+        quiet = self.policy.next_interval(MONDAY + 24 * HOUR + 3 * HOUR)
+        self.assertEqual(busy, 600)
+        self.assertGreater(quiet, 1800)
+        self.assertLessEqual(quiet, 7200)
+        self.assertLess(self.policy.next_interval(MONDAY + 2 * 24 * HOUR + 15 * HOUR), quiet)
+
+    def test_same_checks_per_week_as_fixed(self):
+        """Checks are moved to busy hours, not added: a week takes no more than the fixed interval would."""
+        result = simulate_polling([], self.policy, MONDAY + 28 * 24 * HOUR, MONDAY + 35 * 24 * HOUR)
+        self.assertLessEqual(result['checks'], 7 * 24 * 2)
+        self.assertGreater(result['checks'], 7 * 24 * 2 / 2)
+
+    def test_boost_after_new_post(self):
+        """For the boost period after a new post the minimum interval is used."""
+        quiet = MONDAY + 24 * HOUR + 3 * HOUR
+        self.policy.boost = 3600
+        self.policy.observe_new(quiet)
+        self.assertEqual(self.policy.next_interval(quiet + 600), 600)
+        self.assertGreater(self.policy.next_interval(quiet + 2 * HOUR), 600)
+
+    def test_jitter_stays_in_bounds(self):
+        """Jitter spreads intervals without leaving the configured bounds."""
+        policy = AdaptiveInterval(1800, min_interval=600, max_interval=7200, jitter=0.5)
+        policy.learn(self.posts)
+        intervals = {policy.next_interval(MONDAY + hour * HOUR) for hour in range(168)}
+        self.assertGreater(len(intervals), 10)
+        self.assertTrue(all(600 <= interval <= 7200 for interval in intervals))
+
+    def test_no_history(self):
+        """Without any history the base interval is used."""
+        policy = AdaptiveInterval(1800, max_interval=7200, jitter=0)
+        policy.learn([])
+        self.assertEqual(policy.next_interval(MONDAY), 1800)
+
+    def test_simulate_polling(self):
+        """The simulation counts checks and how long each post waited to be seen."""
+        result = simulate_polling([MONDAY + 100, MONDAY + 1000], FixedInterval(600), MONDAY, MONDAY + 3600)
+        self.assertEqual(result['checks'], 6)
+        self.assertEqual(result['detected'], 2)
+        self.assertEqual(result['latency_avg'], (500 + 200) / 2)
+        self.assertEqual(result['latency_max'], 500)
+
+    def test_learning_times_skip_initial_scan(self):
+        """Trackers found by the very first scan do not count as posted at that time."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SQLiteStateStore(os.path.join(temp_dir, 'trackers.db')) as state:
+                first = [{'name': f"T{n}", 'abbreviation': f"T{n}", 'date': 'Jan 1 2026'} for n in range(5)]
+                state.update(first, seen_at=MONDAY)
+                state.update([{'name': 'New', 'abbreviation': 'NEW', 'date': 'Jan 2 2026'}], seen_at=MONDAY + HOUR)
+                self.assertEqual(learning_times(state, MONDAY + 2 * HOUR), [MONDAY + HOUR])
+
+    def test_learning_times_skip_multi_page_initial_scan(self):
+        """Every page of the first check shares one first_seen, so none of it is learned from."""
+        base = "https://opentrackers.org"
+        pages = {}
+        for page in range(1, 4):
+            trackers = [(f"Tracker {page}-{n}", f"T{page}{n}", n + 1) for n in range(5)]
+            pages[base if page == 1 else f"{base}/page/{page}"] = make_listing_page(trackers, max_page=3)
+        monitor = TrackerMonitor(crawl_config={'requests_per_second': 1000})
+        monitor.session = FakeSession(pages)
+        monitor.send_notifications = lambda trackers, event='new': None
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with SQLiteStateStore(os.path.join(temp_dir, 'trackers.db')) as state:
+                # Pages recorded ten seconds apart still get the cycle's time
+                clock = itertools.count(MONDAY, 10)
+                with patch('time.time', lambda: next(clock)):
+                    self.assertEqual(len(check_for_new_trackers(monitor, state=state)), 15)
+                self.assertEqual(len(set(state.first_seen_times())), 1)
+                self.assertEqual(learning_times(state, MONDAY + HOUR), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
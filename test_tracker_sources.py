@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import patch
+from testing_support import ListingSiteStandIn, make_listing_page
+from tracker_monitor import TrackerMonitor, check_for_new_trackers
+from tracker_parsers import PatternEngine, get_parser_backend
+from tracker_sources import OpenTrackersSource, TrackerSource, create_source
+from tracker_state import SQLiteStateStore
+
+
+class PartialSource(TrackerSource):
+    """A plugin missing find_max_page and extract_trackers"""
+
+    def page_url(self, page):
+        return f"{self.base_url}/{page}"
+
+
+class TestSources(unittest.TestCase):
+    def test_default_source(self):
+        """Without 'sources' the monitor watches opentrackers.org, or the configured base_url."""
+        monitor = TrackerMonitor()
+        self.assertIsInstance(monitor.source, OpenTrackersSource)
+        self.assertEqual(monitor.page_url(1), "https://opentrackers.org/")
+        self.assertEqual(monitor.page_url(3), "https://opentrackers.org/page/3")
+        mirror = TrackerMonitor(crawl_config={'base_url': "http://mirror.example/"})
+        self.assertEqual(mirror.page_url(2), "http://mirror.example/page/2")
+
+    def test_create_source(self):
+        """Sources are created by registered type or 'module:Class' plugin name."""
+        parser, patterns = get_parser_backend(), PatternEngine()
+        plugin = create_source({'type': 'tracker_sources:OpenTrackersSource', 'name': 'mirror',
+                                'base_url': "http://mirror.example", 'max_pages': 2}, parser, patterns)
+        self.assertEqual((plugin.name, plugin.max_pages), ('mirror', 2))
+        with self.assertRaises(ValueError):
+            create_source({'type': 'unknown'}, parser, patterns)
+        with self.assertRaises(ValueError):
+            create_source({'type': 'tracker_parsers:PatternEngine'}, parser, patterns)
+        with self.assertRaises(TypeError):
+            TrackerSource({'base_url': "http://example.com"}, parser, patterns)
+
+    def test_source_names_are_unique(self):
+        """Two sources with the same name, such as two unnamed ones of one type, are a configuration error."""
+        with self.assertRaises(ValueError):
+            TrackerMonitor(crawl_config={'sources': [{'base_url': "http://one.example"},
+                                                     {'base_url': "http://two.example"}]})
+        monitor = TrackerMonitor(crawl_config={'sources': [{'base_url': "http://one.example"},
+                                                           {'name': 'two', 'base_url': "http://two.example"}]})
+        self.assertEqual([source.name for source in monitor.sources], ['opentrackers', 'two'])
+
+    def test_incomplete_plugin_is_rejected(self):
+        """A plugin not implementing the whole interface fails when it is created, not mid-crawl."""
+        with self.assertRaises(TypeError):
+            create_source({'type': 'test_tracker_sources:PartialSource', 'base_url': "http://example.com"},
+                          get_parser_backend(), PatternEngine())
+
+
+class TestMultipleSources(unittest.TestCase):
+    def setUp(self):
+        """Two slow stand-in sites, sharing one tracker."""
+        self.first = ListingSiteStandIn({
+            '/': make_listing_page([('Alpha', 'ALP', 1), ('Shared', 'SHR', 5)], max_page=2),
+            '/page/2': make_listing_page([('Beta', 'BET', 2)], max_page=2),
+        }, delay=0.2)
+        self.second = ListingSiteStandIn({
+            '/': make_listing_page([('Gamma', 'GAM', 3), ('Shared', 'SHR', 5)], max_page=2),
+            '/page/2': make_listing_page([('Delta', 'DEL', 4)], max_page=2),
+        }, delay=0.2)
+        self.monitor = TrackerMonitor(crawl_config={
+            'requests_per_second': 1000,
+            'sources': [
+                {'name': 'first', 'base_url': self.first.url},
+                {'name': 'second', 'base_url': self.second.url, 'requests_per_second': 500, 'burst': 3},
+            ]})
+
+    def tearDown(self):
+        self.first.close()
+        self.second.close()
+
+    def test_sources_feed_one_pipeline(self):
+        """Both sites are crawled concurrently and their trackers diffed and notified together."""
+        notified = []
+        with patch.object(TrackerMonitor, 'send_notifications',
+                          lambda monitor, trackers, event='new': notified.extend(t['abbreviation'] for t in trackers)), \
+                SQLiteStateStore(':memory:') as state:
+            new_trackers = check_for_new_trackers(self.monitor, state=state)
+            self.assertEqual(len(state), 5)
+        
+        self.assertEqual(sorted(t['abbreviation'] for t in new_trackers), ['ALP', 'BET', 'DEL', 'GAM', 'SHR'])
+        self.assertEqual(sorted(notified), ['ALP', 'BET', 'DEL', 'GAM', 'SHR'])
+        self.assertEqual(sorted(self.first.requested), ['/', '/page/2'])
+        self.assertEqual(sorted(self.second.requested), ['/', '/page/2'])
+        # The sites were being fetched at the same time
+        first_start, first_end = self.first.intervals[0][0], self.first.intervals[-1][1]
+        self.assertTrue(any(start < first_end and end > first_start for start, end in self.second.intervals))
+
+    def test_pages_are_tagged_with_their_source(self):
+        """Each page comes with its source, in page order per source."""
+        pages = [(source.name, page) for source, page, _ in self.monitor.iter_source_pages()]
+        self.assertEqual([page for name, page in pages if name == 'first'], [1, 2])
+        self.assertEqual([page for name, page in pages if name == 'second'], [1, 2])
+
+    def test_separate_rate_limits(self):
+        """Each site gets its own token bucket, with per-source settings applied."""
+        first = self.monitor.get_rate_limiter(self.first.url + '/')
+        second = self.monitor.get_rate_limiter(self.second.url + '/page/2')
+        self.assertIsNot(first, second)
+        self.assertEqual((first.rate, first.capacity), (1000, 1))
+        self.assertEqual((second.rate, second.capacity), (500, 3))
+
+    def test_notification_names_every_source(self):
+        _, body = self.monitor.format_notification([{'name': 'Alpha', 'abbreviation': 'ALP', 'date': 'Jan 1 2026',
+                                                     'description': '', 'tags': []}])
+        self.assertIn(f"Check {self.first.url}, {self.second.url} for more details.", body)
+
+
+if __name__ == '__main__':
+    unittest.main()
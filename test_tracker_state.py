@@ -0,0 +1,194 @@
+import unittest
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from tracker_monitor import Tracker, save_trackers_to_file
+from tracker_state import SQLiteStateStore, StateLock, TrackerStateStore, tracker_fingerprint
+
+
+def make_tracker(name, abbreviation, date='Jan 1 2026', **fields):
+    tracker = {'name': name, 'abbreviation': abbreviation, 'date': date,
+               'description': f"tracker for {name}", 'tags': ['general'], 'full_text': f"{name} ({abbreviation})"}
+    tracker.update(fields)
+    return tracker
+
+
+class TestSQLiteStateStore(unittest.TestCase):
+    def setUp(self):
+        """Open a store in a fresh temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, 'trackers.db')
+        self.state = SQLiteStateStore(self.filename)
+
+    def tearDown(self):
+        self.state.close()
+        self.temp_dir.cleanup()
+
+    def test_update_returns_only_new_trackers(self):
+        """A second scan only reports trackers the store has not seen."""
+        first = [make_tracker('Alpha', 'ALP'), make_tracker('Beta', 'BET')]
+        self.assertEqual(self.state.update(first), first)
+        second = [make_tracker('Gamma', 'GAM'), make_tracker('Alpha', 'ALP')]
+        self.assertEqual(self.state.update(second), [second[0]])
+        self.assertEqual([t['abbreviation'] for t in self.state.known_trackers()], ['ALP', 'BET', 'GAM'])
+
+    def test_contains(self):
+        """contains() is true only when every tracker of the batch is stored."""
+        self.state.update([make_tracker('Alpha', 'ALP'), make_tracker('Beta', 'BET')])
+        self.assertTrue(self.state.contains([make_tracker('Beta', 'BET'), Tracker.from_dict(make_tracker('Alpha', 'ALP'))]))
+        self.assertFalse(self.state.contains([make_tracker('Alpha', 'ALP'), make_tracker('Alpha', 'ALP', date='Feb 1 2026')]))
+        self.assertTrue(self.state.contains([]))
+
+    def test_interface_is_abstract(self):
+        """A store not implementing the whole interface cannot be created."""
+        with self.assertRaises(TypeError):
+            TrackerStateStore()
+
+    def test_identity_is_name_date_abbreviation(self):
+        """The same tracker reopening on a new date is new again."""
+        self.state.update([make_tracker('Alpha', 'ALP')])
+        reopened = make_tracker('Alpha', 'ALP', date='Feb 1 2026')
+        self.assertEqual(self.state.update([reopened]), [reopened])
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.state.connection.execute(
+                "INSERT INTO trackers (name, date, abbreviation, first_seen, last_seen) "
+                "VALUES ('Alpha', 'Jan 1 2026', 'ALP', 0, 0)")
+
+    def test_first_and_last_seen(self):
+        """first_seen stays put while last_seen and the details follow the latest scan."""
+        self.state.update([make_tracker('Alpha', 'ALP')], seen_at=100.0)
+        self.state.update([make_tracker('Alpha', 'ALP', tags=['hd'])], seen_at=200.0)
+        stored = self.state.known_trackers(include_seen=True)
+        self.assertEqual(len(stored), 1)
+        self.assertEqual((stored[0]['first_seen'], stored[0]['last_seen']), (100.0, 200.0))
+        self.assertEqual(stored[0]['tags'], ['hd'])
+
+    def test_tracker_listed_twice_in_a_batch(self):
+        """A tracker scanned twice in one batch is stored once, with the details of its last scan."""
+        first, second = make_tracker('Alpha', 'ALP', tags=['hd']), make_tracker('Alpha', 'ALP', tags=['tv'])
+        batch = [first, make_tracker('Beta', 'BET'), second]
+        self.assertEqual(self.state.update(batch), batch)
+        self.assertEqual([(t['abbreviation'], t['tags']) for t in self.state.known_trackers()],
+                         [('ALP', ['tv']), ('BET', ['general'])])
+        self.assertEqual(self.state.queue_events([first, second]), 1)
+
+    def test_records_and_missing_fields_round_trip(self):
+        """Tracker records and dicts without optional fields are stored losslessly."""
+        record = Tracker.from_dict(make_tracker('Alpha', 'ALP'))
+        bare = {'name': 'Beta', 'abbreviation': 'BET', 'date': 'Jan 2 2026'}
+        self.assertEqual(self.state.update([record, bare]), [record, bare])
+        self.assertEqual(self.state.known_trackers(), [record.to_dict(), bare])
+
+    def test_failed_update_is_rolled_back(self):
+        """A batch that fails halfway leaves the store untouched."""
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.state.update([make_tracker('Alpha', 'ALP'), make_tracker(None, 'BRK')])
+        self.assertEqual(len(self.state), 0)
+
+    def test_state_survives_reopening(self):
+        """Trackers are still known after the store is closed and opened again."""
+        self.state.update([make_tracker('Alpha', 'ALP')])
+        self.state.close()
+        self.state = SQLiteStateStore(self.filename)
+        self.assertEqual(self.state.update([make_tracker('Alpha', 'ALP')]), [])
+
+    def test_diff_sorts_new_changed_unchanged(self):
+        """Known trackers with a new description or tags are reported as changed."""
+        self.state.update([make_tracker('Alpha', 'ALP'), make_tracker('Beta', 'BET')])
+        extended = make_tracker('Beta', 'BET', description='tracker for Beta, signup extended')
+        scan = [make_tracker('Alpha', 'ALP', full_text='reworded'), extended, make_tracker('Gamma', 'GAM')]
+        diff = self.state.diff(scan)
+        self.assertEqual(diff, {'new': [scan[2]], 'changed': [extended], 'unchanged': [scan[0]]})
+        self.assertEqual(self.state.diff(scan), {'new': [], 'changed': [], 'unchanged': scan})
+
+    def test_fingerprint_ignores_representation(self):
+        """Dicts and records, list and tuple tags, hash the same."""
+        tracker = make_tracker('Alpha', 'ALP')
+        self.assertEqual(tracker_fingerprint(tracker), tracker_fingerprint(Tracker.from_dict(tracker)))
+        self.assertNotEqual(tracker_fingerprint(tracker), tracker_fingerprint(dict(tracker, tags=['hd'])))
+
+    def test_upgrades_database_without_fingerprints(self):
+        """Rows stored before fingerprints existed are unchanged until their content changes."""
+        self.state.close()
+        os.remove(self.filename)
+        connection = sqlite3.connect(self.filename)
+        connection.execute(
+            "CREATE TABLE trackers (id INTEGER PRIMARY KEY, name TEXT NOT NULL, date TEXT NOT NULL, "
+            "abbreviation TEXT NOT NULL, description TEXT, tags TEXT, full_text TEXT, "
+            "first_seen REAL NOT NULL, last_seen REAL NOT NULL)")
+        connection.execute("INSERT INTO trackers VALUES (1, 'Alpha', 'Jan 1 2026', 'ALP', NULL, NULL, NULL, 0, 0)")
+        connection.commit()
+        connection.close()
+        self.state = SQLiteStateStore(self.filename)
+        self.assertEqual(len(self.state.diff([make_tracker('Alpha', 'ALP')])['unchanged']), 1)
+        changed = make_tracker('Alpha', 'ALP', tags=['hd'])
+        self.assertEqual(self.state.diff([changed])['changed'], [changed])
+
+    def test_pending_events_are_deduplicated(self):
+        """Queuing a tracker that is already pending keeps one event with the latest details."""
+        self.assertEqual(self.state.queue_events([make_tracker('Alpha', 'ALP')], queued_at=100.0), 1)
+        updated = make_tracker('Alpha', 'ALP', tags=['hd'])
+        self.assertEqual(self.state.queue_events([updated, make_tracker('Beta', 'BET')], queued_at=200.0), 1)
+        self.assertEqual(self.state.queue_events([Tracker.from_dict(updated)], event='changed'), 1)
+        pending = self.state.pending_events()
+        self.assertEqual([(event, tracker['abbreviation']) for _, event, tracker, _ in pending],
+                         [('new', 'ALP'), ('new', 'BET'), ('changed', 'ALP')])
+        self.assertEqual((pending[0][2], pending[0][3]), (updated, 100.0))
+        self.state.clear_events([pending[0][0], pending[1][0]])
+        self.assertEqual([event_id for event_id, _, _, _ in self.state.pending_events()], [pending[2][0]])
+
+    def test_import_json(self):
+        """Trackers saved to the legacy JSON file are imported as known."""
+        trackers = [make_tracker('Alpha', 'ALP'), make_tracker('Beta', 'BET')]
+        legacy = os.path.join(self.temp_dir.name, 'trackers.json')
+        save_trackers_to_file(trackers, legacy)
+        self.assertEqual(self.state.import_json(legacy), 2)
+        self.assertEqual(self.state.import_json(legacy), 0)
+        self.assertEqual(self.state.known_trackers(), trackers)
+        self.assertEqual(self.state.import_json(os.path.join(self.temp_dir.name, 'missing.json')), 0)
+
+
+
+class TestStateLock(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.temp_dir.name, 'trackers.db.lock')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_only_one_holder(self):
+        """A second lock on the same file is refused until the first is released."""
+        first, second = StateLock(self.filename), StateLock(self.filename)
+        self.assertTrue(first.acquire())
+        self.assertFalse(second.acquire())
+        self.assertEqual(second.holder()[0], os.getpid())
+        first.release()
+        self.assertTrue(second.acquire())
+        second.release()
+        self.assertIsNone(second.holder())
+
+    def test_store_lock_next_to_database(self):
+        """File-backed stores are locked through <filename>.lock; in-memory ones are not shared."""
+        with SQLiteStateStore(os.path.join(self.temp_dir.name, 'trackers.db')) as state:
+            self.assertEqual(state.lock().filename, self.filename)
+        with SQLiteStateStore(':memory:') as state:
+            self.assertIsNone(state.lock())
+
+    def test_lock_reclaimed_after_crash(self):
+        """A lock held by a process that died without releasing it can be taken straight away."""
+        crash = ("import os, sys; from tracker_state import StateLock; "
+                 "assert StateLock(sys.argv[1]).acquire(); os._exit(1)")
+        subprocess.run([sys.executable, '-c', crash, self.filename],
+                       cwd=os.path.dirname(os.path.abspath(__file__)), check=False, timeout=30)
+        lock = StateLock(self.filename)
+        self.assertIsNotNone(lock.holder())  # The crashed holder's PID is still in the file
+        self.assertTrue(lock.acquire())
+        self.assertEqual(lock.holder()[0], os.getpid())
+        lock.release()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,298 @@
+"""
+Test doubles shared by the unit tests and benchmarks.py: canned listing pages, a stand-in
+requests.Session, and local listing and SMTP servers.
+"""
+
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import requests
+
+from tracker_monitor import TrackerMonitor
+
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+CATEGORIES = ['HD', 'MOVIES', 'TV', 'MUSIC', 'GAMES', 'ANIME', 'SPORTS', 'GENERAL', '0DAY', 'XXX']
+
+
+def generate_listing_page(num_posts, page=1, max_page=1, seed=0):
+    """Generate an opentrackers.org-style listing page with the given number of posts"""
+    rng = random.Random(seed * 100003 + page)
+    posts = []
+    for i in range(num_posts):
+        number = (page - 1) * num_posts + i
+        name = f"Tracker {number:05d}"
+        abbreviation = f"T{number:05d}"
+        categories = ' / '.join(rng.sample(CATEGORIES, 2))
+        month = rng.choice(MONTHS)
+        day = rng.randint(1, 28)
+        if i % 5 == 4:
+            # Regular news posts that are not signups
+            title = f"Site news #{number}"
+            content = f"<p>Maintenance notes for {name}.</p>"
+        else:
+            title = f"{name} ({abbreviation}) IS OPEN FOR LIMITED SIGNUP!"
+            content = f"<p>{name} ({abbreviation}) is a Private Torrent Tracker for {categories}\n        </p>"
+        posts.append(f'''
+    <article id="post-{number}" class="post-{number} post type-post status-publish hentry">
+      <div class="post-date">
+        <span class="post-month">{month}</span>
+        <span class="post-day">{day}</span>
+        <span class="post-year">2026</span>
+      </div>
+      <h2 class="entry-title"><a href="https://opentrackers.org/post-{number}/" rel="bookmark">{title}</a></h2>
+      <div class="entry-content">
+        {content}
+      </div>
+      <div class="post-tags">Tags: <a href="https://opentrackers.org/tag/{categories.split()[0].lower()}/" rel="tag">{categories.split()[0]}</a></div>
+    </article>''')
+    links = ''.join(f'\n    <a class="page-numbers" href="https://opentrackers.org/page/{n}/">{n}</a>'
+                    for n in range(1, max_page + 1) if n != page)
+    sidebar = ''.join(f'\n        <li><a href="https://opentrackers.org/post-{n}/">Recent post {n}</a></li>' for n in range(20))
+    return f'''<!DOCTYPE html>
+<html lang="en-US">
+<head>
+<meta charset="UTF-8">
+<title>OpenTrackers &#8211; Page {page}</title>
+<script type="text/javascript">var ot_settings = {{"page": {page}}};</script>
+</head>
+<body class="home blog">
+<div id="wrapper">
+  <div id="content">{''.join(posts)}
+  </div>
+  <div class="multinav">{links}
+  </div>
+  <aside id="sidebar">
+    <div class="widget widget_recent_entries">
+      <ul>{sidebar}
+      </ul>
+    </div>
+  </aside>
+  <footer id="footer"><p>&copy; 2026 OpenTrackers</p></footer>
+</div>
+<script>jQuery(function () {{ console.log("loaded"); }});</script>
+</body>
+</html>
+'''.encode('utf-8')
+
+
+def make_listing_page(trackers, max_page=1):
+    """Build an opentrackers.org-style listing page for the given (name, abbreviation, day) tuples"""
+    posts = ""
+    for name, abbreviation, day in trackers:
+        posts += f'''
+        <article class="post type-post hentry">
+          <h2 class="entry-title">{name} ({abbreviation}) IS OPEN FOR LIMITED SIGNUP!</h2>
+          <div class="post-date"><span class="post-month">Jan</span> <span class="post-day">{day}</span> <span class="post-year">2026</span></div>
+          <div class="entry-content">{name} ({abbreviation}) is a HD movies tracker
+          </div>
+          <div class="post-tags"><a class="tag">General</a></div>
+        </article>'''
+    links = "".join(f'<a href="https://opentrackers.org/page/{n}/">{n}</a>' for n in range(2, max_page + 1))
+    return f'<html><body>{posts}<div class="multinav">{links}</div></body></html>'.encode('utf-8')
+
+
+def three_page_listing(base="https://opentrackers.org"):
+    """Three listing pages holding Alpha and Beta, Gamma, and Delta, keyed by URL
+
+    With base '' the pages are keyed by path, for ListingSiteStandIn.
+    """
+    return {
+        base or '/': make_listing_page([('Alpha', 'ALP', 1), ('Beta', 'BET', 2)], max_page=3),
+        f"{base}/page/2": make_listing_page([('Gamma', 'GAM', 3)], max_page=3),
+        f"{base}/page/3": make_listing_page([('Delta', 'DEL', 4)], max_page=3),
+    }
+
+class FakeSession:
+    """Stand-in for requests.Session serving canned pages by URL and counting requests"""
+
+    def __init__(self, pages, etags=False, failing=()):
+        self.pages = pages
+        self.etags = etags
+        self.failing = set(failing)  # URLs whose requests raise a connection error
+        self.headers = {}
+        self.requested = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requested.append(url)
+        if url.rstrip('/') in self.failing:
+            raise requests.ConnectionError(f"connection to {url} reset")
+        content = self.pages[url.rstrip('/')]
+        etag = f'"{hash(content)}"'
+        response = MagicMock()
+        response.headers = {'ETag': etag} if self.etags else {}
+        if self.etags and (headers or {}).get('If-None-Match') == etag:
+            response.status_code = 304
+            response.content = b''
+        else:
+            response.status_code = 200
+            response.content = content
+        return response
+
+
+class ListingSiteStandIn(ThreadingHTTPServer):
+    """Local HTTP server serving canned listing pages by path and recording the requests
+
+    delay makes every response that many seconds late, trickle sends bodies in 100 byte pieces
+    that many seconds apart, and intervals records when each request was served.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, pages, delay=0.0, trickle=0.0):
+        super().__init__(('127.0.0.1', 0), ListingHandler)
+        self.url = f"http://127.0.0.1:{self.server_address[1]}"
+        self.pages = pages
+        self.delay = delay
+        self.trickle = trickle
+        self.requested = []
+        self.intervals = []  # (start, end) of each request, time.monotonic()
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ListingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        started = time.monotonic()
+        with server.lock:
+            server.requested.append(self.path)
+        time.sleep(server.delay)
+        with server.lock:
+            server.intervals.append((started, time.monotonic()))
+        content = server.pages.get(self.path.rstrip('/') or '/')
+        self.send_response(200 if content is not None else 404)
+        self.send_header('Content-Length', str(len(content or b'')))
+        self.end_headers()
+        content = content or b''
+        if not server.trickle:
+            self.wfile.write(content)
+            return
+        try:
+            for start in range(0, len(content), 100):
+                self.wfile.write(content[start:start + 100])
+                self.wfile.flush()
+                time.sleep(server.trickle)
+        except OSError:
+            # The client gave up on the response
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server recording the messages it accepts
+
+    fail_next makes that many MAIL commands answer with a temporary 451 failure,
+    hang_up_after_message drops each connection after accepting a message,
+    fail_noop answers health checks with 421 and hangs up, and stall_noop never answers them.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fail_next=0):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.port = self.server_address[1]
+        self.fail_next = fail_next
+        self.hang_up_after_message = False
+        self.fail_noop = False
+        self.stall_noop = False
+        self.messages = []
+        self.logins = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost stand-in ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN\r\n250 OK\r\n')
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                with server.lock:
+                    failing = server.fail_next > 0
+                    server.fail_next -= failing
+                if failing:
+                    self.reply('451 Try again later')
+                else:
+                    recipients = []
+                    self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip(' <>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in self.rfile:
+                    if data_line.rstrip(b'\r\n') == b'.':
+                        break
+                    data.append(data_line.decode('utf-8'))
+                with server.lock:
+                    server.messages.append((recipients, ''.join(data)))
+                self.reply('250 OK')
+                if server.hang_up_after_message:
+                    return
+            elif verb == 'NOOP' and server.stall_noop:
+                # A half-open connection: nothing comes back until the client gives up
+                while self.rfile.readline():
+                    pass
+                return
+            elif verb == 'NOOP' and server.fail_noop:
+                self.reply('421 Closing connection')
+                return
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                # HELO, RSET and healthy NOOP
+                self.reply('250 OK')
+
+
+TRACKERS = [{'name': 'Test Tracker', 'abbreviation': 'TT', 'date': 'Jan 1 2026',
+             'description': 'A test tracker', 'tags': ['hd', 'movies']}]
+
+
+def make_monitor(port, **email_settings):
+    email_config = {
+        'enabled': True,
+        'smtp_server': '127.0.0.1',
+        'smtp_port': port,
+        'use_tls': False,
+        'sender_email': 'monitor@example.com',
+        'sender_password': 'password',
+        'recipient_email': 'recipient@example.com',
+    }
+    email_config.update(email_settings)
+    return TrackerMonitor(email_config=email_config)
@@ -0,0 +1,133 @@
+"""
+Raw page archive for offline replay.
+
+PageArchive keeps every page the monitor downloads, gzip-compressed and stored under the SHA-256
+of its body, so a page served unchanged by many cycles is stored once. index.jsonl records each
+fetch (URL, status, headers, time, size and the body's hash).
+
+ReplaySession stands in for requests.Session and answers from an archive, so a whole cycle can
+be re-run against what the site actually served: deterministically, without the network and
+without rate limiting.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# Response headers worth keeping with a snapshot
+ARCHIVED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Date', 'Cache-Control')
+
+
+class PageArchive:
+    """Content-addressed, compressed store of fetched pages with an index of fetches
+
+    With readonly the archive must already exist (FileNotFoundError otherwise) and is never
+    written to.
+    """
+
+    def __init__(self, directory, readonly=False):
+        self.directory = directory
+        self.index_file = os.path.join(directory, 'index.jsonl')
+        self.readonly = readonly
+        self._lock = threading.Lock()
+        self._bodies = {}  # Decompressed bodies already read, by hash
+        if readonly:
+            if not os.path.isfile(self.index_file):
+                raise FileNotFoundError(f"No page archive in {directory} ({self.index_file} is missing)")
+        else:
+            os.makedirs(os.path.join(directory, 'objects'), exist_ok=True)
+
+    def object_path(self, digest):
+        return os.path.join(self.directory, 'objects', digest[:2], f"{digest[2:]}.gz")
+
+    def store(self, url, response, elapsed=None, fetched_at=None):
+        """Archive a response's body and record the fetch; returns the body's hash"""
+        if self.readonly:
+            raise PermissionError(f"The page archive in {self.directory} is open read-only")
+        content = response.content or b''
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written under a temporary name so a crash never leaves a truncated object behind
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=6, mtime=0))
+            os.replace(temp_path, path)
+        entry = {
+            'url': url,
+            'status': response.status_code,
+            'headers': {name: response.headers[name] for name in ARCHIVED_HEADERS if name in response.headers},
+            'fetched_at': time.time() if fetched_at is None else fetched_at,
+            'elapsed': elapsed,
+            'size': len(content),
+            'sha256': digest,
+        }
+        with self._lock:
+            with open(self.index_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        return digest
+
+    def entries(self):
+        """Every recorded fetch, oldest first"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def latest(self, before=None):
+        """The last fetch of each URL, optionally only those fetched before a timestamp"""
+        snapshot = {}
+        for entry in self.entries():
+            if before is None or entry['fetched_at'] < before:
+                snapshot[entry['url']] = entry
+        return snapshot
+
+    def body(self, digest):
+        """The decompressed body with the given hash"""
+        body = self._bodies.get(digest)
+        if body is None:
+            with open(self.object_path(digest), 'rb') as f:
+                body = gzip.decompress(f.read())
+            if hashlib.sha256(body).hexdigest() != digest:
+                raise ValueError(f"archived object {digest} is corrupt")
+            self._bodies[digest] = body
+        return body
+
+
+class ReplaySession:
+    """requests.Session stand-in serving the latest archived copy of each URL
+
+    URLs never archived get a 404. before limits the replay to what had been fetched by then.
+    A directory is opened read-only, so it must hold an archive.
+    """
+
+    def __init__(self, archive, before=None):
+        self.archive = archive if isinstance(archive, PageArchive) else PageArchive(archive, readonly=True)
+        self.snapshot = self.archive.latest(before)
+        self.headers = {}
+        self.requested = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requested.append(url)
+        entry = self.snapshot.get(url)
+        response = requests.Response()
+        response.url = url
+        if entry is None:
+            response.status_code = 404
+            response._content = b''
+            return response
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = self.archive.body(entry['sha256'])
+        return response
+
+    def close(self):
+        pass
@@ -0,0 +1,253 @@
+"""
+Prometheus-compatible metrics for the tracker monitor.
+
+MonitorMetrics holds the counters and histograms the monitor records: HTTP latency and bytes per
+page, parse and extract time, trackers per page, new trackers per cycle, notification latency and
+failures, and cycle duration. They are rendered in the Prometheus text exposition format, served
+by MetricsServer on a local /metrics endpoint or written to a file for node_exporter's textfile
+collector.
+
+Nothing here runs unless metrics are enabled: the monitor keeps metrics = None otherwise and only
+checks for that on its hot paths.
+"""
+
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+CYCLE_BUCKETS = (1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _label_string(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """A named metric with optional labels, one value per combination of label values"""
+
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_label_string(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(Metric):
+    """Monotonically increasing total"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Value that can go up and down, e.g. the outcome of the last cycle"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their count and sum"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'count': 0, 'sum': 0.0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][index] += 1
+                    break
+            state['count'] += 1
+            state['sum'] += value
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state['count'] if state else 0
+
+    def _samples(self, key, state):
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, state['counts']):
+            cumulative += count
+            labels = _label_string(self.labelnames, key, [('le', _format_value(float(bound)))])
+            samples.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _label_string(self.labelnames, key)
+        samples.append(f"{self.name}_count{labels} {state['count']}")
+        samples.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+        return samples
+
+
+class MetricsRegistry:
+    """The metrics of one process, rendered together in the text exposition format"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self.register(Histogram(name, help_text, buckets, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, filename):
+        """Write the metrics for the textfile collector, replacing the file atomically"""
+        temp_name = f"{filename}.{os.getpid()}.tmp"
+        with open(temp_name, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(temp_name, filename)
+
+
+class MonitorMetrics:
+    """Everything the monitor records about its crawls and notifications"""
+
+    def __init__(self, registry=None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.http_request_seconds = r.histogram(
+            'tracker_http_request_seconds', "Time to fetch a page", LATENCY_BUCKETS, ('host',))
+        self.http_response_bytes = r.histogram(
+            'tracker_http_response_bytes', "Body size of fetched pages", BYTES_BUCKETS, ('host',))
+        self.http_requests = r.counter(
+            'tracker_http_requests_total', "Page requests by response status", ('host', 'status'))
+        self.parse_seconds = r.histogram('tracker_parse_seconds', "Time to parse a page into a tree")
+        self.extract_seconds = r.histogram('tracker_extract_seconds', "Time to extract the trackers from a parsed page")
+        self.page_trackers = r.histogram('tracker_page_trackers', "Tracker listings found per page", COUNT_BUCKETS)
+        self.cycle_seconds = r.histogram('tracker_cycle_seconds', "Duration of a monitoring cycle", CYCLE_BUCKETS)
+        self.cycle_new_trackers = r.histogram(
+            'tracker_cycle_new_trackers', "New trackers found per monitoring cycle", COUNT_BUCKETS)
+        self.cycles = r.counter('tracker_cycles_total', "Monitoring cycles run")
+        self.cycles_skipped = r.counter('tracker_cycles_skipped_total', "Cycles skipped because another instance was checking")
+        self.trackers_found = r.counter('tracker_events_total', "New and changed trackers found", ('event',))
+        self.last_cycle = r.gauge('tracker_last_cycle_timestamp_seconds', "When the last monitoring cycle finished")
+        self.notification_seconds = r.histogram(
+            'tracker_notification_latency_seconds', "Time from queueing a notification to its delivery",
+            LATENCY_BUCKETS, ('channel',))
+        self.notification_failures = r.counter(
+            'tracker_notification_failures_total', "Notifications given up on after all retries", ('channel',))
+        self.notification_retries = r.counter(
+            'tracker_notification_retries_total', "Failed notification attempts that were retried", ('channel',))
+
+    def record_notification(self, channel, outcome, latency=None):
+        """NotificationDispatcher result hook: outcome is 'delivered', 'retry' or 'failed'"""
+        if outcome == 'delivered':
+            self.notification_seconds.observe(latency, channel=channel)
+        elif outcome == 'retry':
+            self.notification_retries.inc(channel=channel)
+        else:
+            self.notification_failures.inc(channel=channel)
+
+    def render(self):
+        return self.registry.render()
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Serves a registry on GET /metrics from a background thread"""
+
+    daemon_threads = True
+
+    def __init__(self, registry, address='127.0.0.1', port=9108):
+        super().__init__((address, port), MetricsHandler)
+        self.registry = registry
+        self.url = f"http://{address}:{self.server_address[1]}/metrics"
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.5},
+                                        name="metrics-server", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
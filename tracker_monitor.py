@@ -1,354 +1,1285 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 import json
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
-from datetime import datetime
-import re
 import urllib.parse
+import threading
+import queue
+import copy
+import functools
+import argparse
+import sys
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from tracker_parsers import PatternEngine, get_parser_backend
+from tracker_state import SQLiteStateStore, tracker_fingerprint
+from tracker_notifications import HTTPNotifier, NotificationDispatcher, SMTPConnectionPool, recipient_list
+from tracker_metrics import MetricsServer, MonitorMetrics
+from tracker_profile import CAPTURES, CycleProfiler
+from tracker_archive import PageArchive, ReplaySession
+from tracker_sources import create_source
+
+
+class TokenBucket:
+    """Thread-safe token bucket limiting how often requests may be sent to one host"""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self._sleep(wait)
+
+
+class PageDocument:
+    """A listing page fetched during a crawl cycle, with whatever has been derived from it so far"""
+
+    def __init__(self, url, tree=None, response=None, trackers=None, max_page=None):
+        self.url = url
+        self.tree = tree
+        self.response = response
+        self.trackers = trackers
+        self.max_page = max_page
+        self.parse_seconds = 0.0
+
+
+class HTTPValidatorCache:
+    """Persistent ETag/Last-Modified cache keyed by URL, remembering the trackers extracted from each page"""
+
+    def __init__(self, filename='http_cache.json'):
+        self.filename = filename
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.parse_seconds_saved = 0.0
+        self._lock = threading.Lock()
+        try:
+            with open(filename, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.entries = {}
+
+    def request_headers(self, url):
+        """Conditional request headers for a URL, or None if nothing is cached for it"""
+        entry = self.entries.get(url)
+        if not entry:
+            return None
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers or None
+
+    def hit(self, url):
+        """Record a 304 for a URL and return a copy of its cached trackers and page count"""
+        with self._lock:
+            entry = self.entries.get(url)
+            if entry is None:
+                return None
+            self.hits += 1
+            self.bytes_saved += entry.get('content_length', 0)
+            self.parse_seconds_saved += entry.get('parse_seconds', 0.0)
+            return {'trackers': copy.deepcopy(entry['trackers']), 'max_page': entry.get('max_page', 1)}
+
+    def store(self, url, response, trackers, max_page=1, parse_seconds=0.0):
+        """Record a full download of a URL along with its validators and extracted trackers"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        with self._lock:
+            self.misses += 1
+            if not etag and not last_modified:
+                self.entries.pop(url, None)
+                return
+            self.entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'content_length': len(response.content),
+                'parse_seconds': parse_seconds,
+                'max_page': max_page,
+                'trackers': copy.deepcopy(trackers)
+            }
+
+    def save(self):
+        """Write the cache to disk"""
+        with self._lock:
+            with open(self.filename, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+
+    def stats(self):
+        """Hit/miss counters and the bandwidth and parse time saved by cache hits"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'parse_seconds_saved': self.parse_seconds_saved
+        }
+
+
+class CycleDeadlineExceeded(TimeoutError):
+    """Raised instead of starting a fetch once the crawl cycle's deadline has passed"""
+
+
+def subscribes(channel_config, event):
+    """Whether a notification channel wants an event; channels get only 'new' unless configured otherwise"""
+    return event in channel_config.get('events', ['new'])
+
 
 class TrackerMonitor:
-    def __init__(self, email_config=None, whatsapp_config=None):
-        self.base_url = "https://opentrackers.org"
+    def __init__(self, email_config=None, whatsapp_config=None, crawl_config=None, webhook_config=None):
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
         self.email_config = email_config or {}
         self.whatsapp_config = whatsapp_config or {}
+        self.webhook_config = webhook_config or {}
+        
+        # Crawl settings: 'max_workers' > 1 fetches pages concurrently, and every host gets its
+        # own token bucket ('requests_per_second'/'burst', overridable per host under 'hosts').
+        # 'http_cache_file' enables conditional GETs backed by a persistent validator cache.
+        # 'parser' picks the HTML parser backend: 'auto' (lxml if installed), 'lxml' or 'bs4', and
+        # 'restricted_parse' limits the BeautifulSoup tree to post containers and pagination.
+        # 'common_tags' overrides the categories looked for in each post's text.
+        # 'cycle_timeout' (seconds) bounds a whole crawl: later fetches are cancelled once it passes.
+        # 'sources' lists the sites to watch (see tracker_sources), crawled concurrently; each may
+        # set its own 'requests_per_second'/'burst'. Without it only opentrackers.org is watched,
+        # and 'base_url' points the crawl at a mirror or a local copy of the site.
+        # 'archive_dir' keeps a compressed copy of every fetched page, and 'replay_dir' serves the
+        # pages from such an archive instead of the network, without rate limiting.
+        self.crawl_config = crawl_config or {}
+        self.max_workers = max(1, int(self.crawl_config.get('max_workers', 1)))
+        self._rate_limiters = {}
+        self._rate_limiters_lock = threading.Lock()
+        cache_file = self.crawl_config.get('http_cache_file')
+        self.http_cache = HTTPValidatorCache(cache_file) if cache_file else None
+        self.replaying = bool(self.crawl_config.get('replay_dir'))
+        self.archive = None
+        if self.replaying:
+            self.session = ReplaySession(self.crawl_config['replay_dir'])
+            # Validators from the live site would turn archived pages into 304s
+            self.http_cache = None
+        elif self.crawl_config.get('archive_dir'):
+            self.archive = PageArchive(self.crawl_config['archive_dir'])
+        self.parser = get_parser_backend(self.crawl_config.get('parser', 'auto'),
+                                         restricted_parse=self.crawl_config.get('restricted_parse', True))
+        self.patterns = PatternEngine(self.crawl_config.get('common_tags'))
+        source_configs = self.crawl_config.get('sources') or [{'base_url': self.crawl_config.get('base_url')}]
+        self.sources = [create_source(config, self.parser, self.patterns) for config in source_configs]
+        # Resume pages and notifications tell sources apart by name
+        names = [source.name for source in self.sources]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Several sources are named {', '.join(map(repr, duplicates))}; "
+                             f"give each source in crawl.sources its own 'name'")
+        self.source = self.sources[0]  # Used when a page is asked for without naming its source
+        self.base_url = self.source.base_url
+        self._source_rates = {}
+        for config, source in zip(source_configs, self.sources):
+            rates = {key: config[key] for key in ('requests_per_second', 'burst') if key in config}
+            if rates:
+                self._source_rates[urllib.parse.urlsplit(source.base_url).netloc.lower()] = rates
+        self._documents = None  # Per-cycle document cache, only set while get_all_trackers runs
+        self._deadline = None  # time.monotonic() by which the running crawl must finish
+        self.unfinished = {}  # Source name -> page the last crawl did not get through, see iter_source_pages()
+        self.dispatcher = None  # Background notification delivery, see start_dispatcher()
+        self.metrics = None  # MonitorMetrics once enable_metrics() has been called
+        self.metrics_server = None
+        self.metrics_textfile = None
+        self.profiler = None  # CycleProfiler while profiling, see enable_profiling()
+        self._smtp_pool = None
+        self._smtp_pool_lock = threading.Lock()
+        self._http_notifiers = {}
+        self._http_notifiers_lock = threading.Lock()
     
-    def send_email_notification(self, new_trackers):
-        """Send email notification about new trackers"""
-        if not self.email_config.get('enabled', False):
-            return
+    def get_rate_limiter(self, url):
+        """Return the token bucket for the host of the given URL"""
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        with self._rate_limiters_lock:
+            limiter = self._rate_limiters.get(host)
+            if limiter is None:
+                settings = dict(self.crawl_config)
+                settings.update(self._source_rates.get(host, {}))
+                settings.update(self.crawl_config.get('hosts', {}).get(host, {}))
+                limiter = TokenBucket(settings.get('requests_per_second', 1.0), settings.get('burst', 1))
+                self._rate_limiters[host] = limiter
+            return limiter
+    
+    def remaining_time(self):
+        """Seconds left before the running crawl's deadline, or None without one"""
+        if self._deadline is None:
+            return None
+        return self._deadline - time.monotonic()
+    
+    def fetch(self, url, headers=None):
+        """GET a URL through the shared session, respecting the per-host rate limit
+        
+        During a crawl with a cycle_timeout the request, body included, may only use the time
+        left, and no request is started once the deadline has passed.
+        """
+        if not self.replaying:
+            with self.profile_stage('rate_limit', url):
+                self.get_rate_limiter(url).acquire()
+        remaining = self.remaining_time()
+        if remaining is not None and remaining <= 0:
+            raise CycleDeadlineExceeded(f"cycle deadline passed before fetching {url}")
+        with self.profile_stage('fetch', url):
+            return self._get(url, headers, remaining)
+    
+    def _get(self, url, headers, timeout):
+        metrics = self.metrics
+        if metrics is None and self.archive is None:
+            return self._request(url, headers, timeout)
         
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        start = time.perf_counter()
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_config['sender_email']
-            msg['To'] = self.email_config['recipient_email']
-            msg['Subject'] = f"New Tracker Signup Opportunities Found! ({len(new_trackers)} new)"
-            
+            response = self._request(url, headers, timeout)
+        except Exception:
+            if metrics is not None:
+                metrics.http_requests.inc(host=host, status='error')
+            raise
+        elapsed = time.perf_counter() - start
+        if metrics is not None:
+            metrics.http_request_seconds.observe(elapsed, host=host)
+            metrics.http_response_bytes.observe(len(response.content), host=host)
+            metrics.http_requests.inc(host=host, status=response.status_code)
+        # A 304 has no body to archive; the copy from the last full download stays current
+        if self.archive is not None and response.status_code != 304:
+            self.archive.store(url, response, elapsed)
+        return response
+    
+    def _request(self, url, headers, timeout):
+        """GET a URL, reading the whole body before the crawl's deadline when there is one
+        
+        requests' timeout only bounds each socket read, so a server trickling its response
+        could run past the deadline; the connection is closed once the deadline passes.
+        """
+        if timeout is None:
+            return self.session.get(url, headers=headers, timeout=timeout)
+        response = self.session.get(url, headers=headers, timeout=timeout, stream=True)
+        expired = threading.Event()
+        
+        def cut_off():
+            expired.set()
+            response.close()
+        
+        timer = threading.Timer(max(0.0, self.remaining_time()), cut_off)
+        timer.daemon = True
+        timer.start()
+        try:
+            response.content
+        except Exception:
+            if not expired.is_set():
+                raise
+        finally:
+            timer.cancel()
+        if expired.is_set():
+            raise CycleDeadlineExceeded(f"cycle deadline passed while reading {url}")
+        return response
+    
+    def enable_metrics(self, metrics_config=None):
+        """Start recording metrics
+        
+        metrics_config may set 'port' (and 'address', 127.0.0.1 by default) to serve them on
+        /metrics, and 'textfile' to write them after every cycle for node_exporter's textfile
+        collector.
+        """
+        metrics_config = metrics_config or {}
+        self.metrics = MonitorMetrics()
+        if metrics_config.get('port') is not None:
+            self.metrics_server = MetricsServer(self.metrics.registry, metrics_config.get('address', '127.0.0.1'),
+                                                metrics_config['port'])
+            print(f"Serving metrics on {self.metrics_server.url}")
+        self.metrics_textfile = metrics_config.get('textfile')
+        return self.metrics
+    
+    def enable_profiling(self, capture=()):
+        """Record wall and CPU time per stage and page; capture may add 'cprofile' and 'tracemalloc' of the extractor"""
+        self.profiler = CycleProfiler(capture)
+        return self.profiler
+    
+    def profile_stage(self, stage, url=None, capture=False):
+        """Context manager timing a stage while profiling, doing nothing otherwise"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.stage(stage, url, capture)
+    
+    def export_metrics(self):
+        """Write the metrics textfile, if one is configured"""
+        if self.metrics is not None and self.metrics_textfile:
+            try:
+                self.metrics.registry.write_textfile(self.metrics_textfile)
+            except OSError as e:
+                print(f"Error writing metrics to {self.metrics_textfile}: {str(e)}")
+    
+    def format_notification(self, trackers, event='new'):
+        """Subject and body of the notification about new (or, for 'changed', updated) trackers
+        
+        Every channel sends this text: email as subject and body, chat channels as one message.
+        """
+        if event == 'changed':
+            subject = f"Tracker Signup Listings Updated ({len(trackers)} changed)"
+            body = "These tracker signup listings have changed:\n\n"
+        else:
+            subject = f"New Tracker Signup Opportunities Found! ({len(trackers)} new)"
             body = "New tracker signup opportunities have been detected:\n\n"
-            for tracker in new_trackers:
-                body += f"• {tracker['name']} ({tracker['abbreviation']}) - Closing: {tracker['date']}\n"
-                if tracker['description']:
-                    body += f"  Description: {tracker['description']}\n"
-                if tracker['tags']:
-                    body += f"  Tags: {', '.join(tracker['tags'])}\n"
-                body += "\n"
-            
-            body += f"\nCheck {self.base_url} for more details."
-            
-            msg.attach(MIMEText(body, 'plain'))
-            
-            server = smtplib.SMTP(self.email_config['smtp_server'], self.email_config['smtp_port'])
-            server.starttls()
-            server.login(self.email_config['sender_email'], self.email_config['sender_password'])
-            
-            text = msg.as_string()
-            server.sendmail(self.email_config['sender_email'], self.email_config['recipient_email'], text)
-            server.quit()
-            
+        for tracker in trackers:
+            body += f"• {tracker['name']} ({tracker['abbreviation']}) - Closing: {tracker['date']}\n"
+            if tracker['description']:
+                body += f"  Description: {tracker['description']}\n"
+            if tracker['tags']:
+                body += f"  Tags: {', '.join(tracker['tags'])}\n"
+            body += "\n"
+        
+        body += f"\nCheck {', '.join(source.base_url for source in self.sources)} for more details."
+        return subject, body
+    
+    def chat_message(self, trackers, event='new'):
+        """The notification as a single message for WhatsApp and chat webhooks"""
+        subject, body = self.format_notification(trackers, event)
+        return f"{subject}\n\n{body}"
+    
+    def deliver_email(self, trackers, event='new', retry=True):
+        """Send the email for new (or, for the 'changed' event, updated) trackers; raises on failure
+        
+        With retry False a dropped pooled session is not retried here but left to the caller.
+        """
+        recipients = recipient_list(self.email_config['recipient_email'])
+        subject, body = self.format_notification(trackers, event)
+        msg = MIMEMultipart()
+        msg['From'] = self.email_config['sender_email']
+        msg['To'] = ', '.join(recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+        
+        text = msg.as_string()
+        # One transaction delivers to every recipient over a pooled, already authenticated session
+        self.smtp_pool().sendmail(self.email_config['sender_email'], recipients, text, retry=retry)
+    
+    def smtp_pool(self):
+        """The SMTP connection pool for the email configuration, created on first use
+        
+        'smtp_keepalive' is how long an idle session is kept open (seconds, 0 to log out
+        after every email), 'smtp_pool_size' how many idle sessions are kept and 'timeout'
+        how long any SMTP operation may take (seconds).
+        """
+        with self._smtp_pool_lock:
+            if self._smtp_pool is None:
+                keepalive = self.email_config.get('smtp_keepalive', 300)
+                self._smtp_pool = SMTPConnectionPool(
+                    self.email_config['smtp_server'], self.email_config['smtp_port'],
+                    username=self.email_config['sender_email'],
+                    password=self.email_config['sender_password'],
+                    use_tls=self.email_config.get('use_tls', True),
+                    max_idle=self.email_config.get('smtp_pool_size', 1) if keepalive else 0,
+                    idle_timeout=keepalive,
+                    timeout=self.email_config.get('timeout', 30.0))
+            return self._smtp_pool
+    
+    def send_email_notification(self, new_trackers, event='new'):
+        """Send email notification about new (or, for the 'changed' event, updated) trackers"""
+        if not self.email_config.get('enabled', False) or not subscribes(self.email_config, event):
+            return
+        
+        try:
+            self.deliver_email(new_trackers, event)
             print("Email notification sent successfully!")
             
         except Exception as e:
             print(f"Error sending email notification: {str(e)}")
     
-    def send_whatsapp_notification(self, new_trackers):
+    def http_notifier(self, channel):
+        """The pooled HTTP notifier for the 'whatsapp' or 'webhook' channel, created on first use
+        
+        The channel's config may set 'requests_per_second' and 'burst' (per host), 'timeout',
+        and 'retries', 'backoff' and 'max_backoff' for notifications sent without the dispatcher
+        (which retries on its own).
+        """
+        config = self.whatsapp_config if channel == 'whatsapp' else self.webhook_config
+        with self._http_notifiers_lock:
+            notifier = self._http_notifiers.get(channel)
+            if notifier is None:
+                rate = config.get('requests_per_second', 10.0)
+                burst = config.get('burst', 1)
+                notifier = self._http_notifiers[channel] = HTTPNotifier(
+                    limiter_factory=lambda host: TokenBucket(rate, burst),
+                    retries=config.get('retries', 3),
+                    backoff=config.get('backoff', 1.0),
+                    max_backoff=config.get('max_backoff', 60.0),
+                    timeout=config.get('timeout', 10.0))
+            return notifier
+    
+    def deliver_whatsapp(self, trackers, event='new', retry=True):
+        """Send the WhatsApp message about new or updated trackers through the Cloud API; raises on failure
+        
+        With retry False a failed request is not retried here but left to the caller.
+        """
+        self.http_notifier('whatsapp').post(
+            f"{self.whatsapp_config['api_url']}/messages",
+            {
+                "messaging_product": "whatsapp",
+                "to": self.whatsapp_config['phone_number'],
+                "type": "text",
+                "text": {"body": self.chat_message(trackers, event)}
+            },
+            headers={"Authorization": f"Bearer {self.whatsapp_config['access_token']}"},
+            retries=None if retry else 0)
+    
+    def send_whatsapp_notification(self, new_trackers, event='new'):
         """Send WhatsApp notification about new trackers (using a WhatsApp Business API)"""
-        if not self.whatsapp_config.get('enabled', False):
+        if not self.whatsapp_config.get('enabled', False) or not subscribes(self.whatsapp_config, event):
             return
         
         try:
-            # This is a template for WhatsApp Business API - you would need to implement with a specific service
-            message_body = f"🚨 New Tracker Signup Alert! 🚨\n\n"
-            message_body += f"Found {len(new_trackers)} new opportunities:\n\n"
-            
-            for tracker in new_trackers:
-                message_body += f"• {tracker['name']} ({tracker['abbreviation']})\n"
-                message_body += f"  Closes: {tracker['date']}\n\n"
-            
-            message_body += f"Check {self.base_url} for details!"
-            
-            # Placeholder for WhatsApp API call - would need to be implemented with a specific service
-            print(f"WhatsApp notification prepared: {message_body}")
-            # Example implementation would be:
-            # requests.post(
-            #     f"{self.whatsapp_config['api_url']}/messages",
-            #     headers={"Authorization": f"Bearer {self.whatsapp_config['access_token']}"},
-            #     json={
-            #         "messaging_product": "whatsapp",
-            #         "to": self.whatsapp_config['phone_number'],
-            #         "text": {"body": message_body}
-            #     }
-            # )
-            
+            self.deliver_whatsapp(new_trackers, event)
             print("WhatsApp notification sent successfully!")
             
         except Exception as e:
             print(f"Error sending WhatsApp notification: {str(e)}")
     
-    def send_notifications(self, new_trackers):
-        """Send all configured notifications"""
-        if not new_trackers:
-            return
+    def webhook_request(self, endpoint, trackers, event='new'):
+        """(url, payload, headers) posting trackers to a webhook endpoint
         
-        self.send_email_notification(new_trackers)
-        self.send_whatsapp_notification(new_trackers)
+        'format' picks the payload: 'slack' ({"text": ...}), 'discord' ({"content": ...}) or
+        'json' (the default: event, message text and the tracker dicts).
+        """
+        message = self.chat_message(trackers, event)
+        payload_format = endpoint.get('format', 'json')
+        if payload_format == 'slack':
+            payload = {'text': message}
+        elif payload_format == 'discord':
+            payload = {'content': message}
+        else:
+            payload = {
+                'event': event,
+                'text': message,
+                'trackers': [tracker if isinstance(tracker, dict) else tracker.to_dict() for tracker in trackers]
+            }
+        return endpoint['url'], payload, endpoint.get('headers')
+    
+    def webhook_endpoints(self, event=None):
+        """Configured webhook endpoints, only those subscribed to the event if one is given"""
+        default_events = self.webhook_config.get('events', ['new'])
+        return [endpoint for endpoint in self.webhook_config.get('endpoints', [])
+                if event is None or event in endpoint.get('events', default_events)]
+    
+    def deliver_webhook(self, endpoint, trackers, event='new', retry=True):
+        """Post trackers to one webhook endpoint; raises on failure, retrying first unless retry is False"""
+        self.http_notifier('webhook').post(*self.webhook_request(endpoint, trackers, event),
+                                           retries=None if retry else 0)
+    
+    def deliver_webhooks(self, trackers, event='new'):
+        """Post trackers to every subscribed webhook endpoint concurrently; raises if any failed"""
+        endpoints = self.webhook_endpoints(event)
+        results = self.http_notifier('webhook').post_many(
+            self.webhook_request(endpoint, trackers, event) for endpoint in endpoints)
+        failures = [f"{endpoint['url']}: {result}" for endpoint, result in zip(endpoints, results)
+                    if isinstance(result, Exception)]
+        if failures:
+            raise RuntimeError(f"{len(failures)} of {len(endpoints)} webhooks failed: {'; '.join(failures)}")
+    
+    def send_webhook_notification(self, new_trackers, event='new'):
+        """Send webhook notifications about new (or updated) trackers"""
+        if not self.webhook_config.get('enabled', False):
+            return
         
-    def get_tracker_listings(self, page=1):
-        """Get tracker listings from a specific page"""
-        url = f"{self.base_url}/"
-        if page > 1:
-            url = f"{self.base_url}/page/{page}"
-            
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Find all tracker entries
-            tracker_entries = []
-            
-            # Based on the debug output, look for posts with class 'post' or 'hentry'
-            # The tracker info is contained in these elements
-            post_elements = soup.find_all(['div', 'article'], class_=lambda x: x and ('post' in x or 'hentry' in x))
-            
-            for element in post_elements:
-                text_content = element.get_text()
-                
-                # Check if this element contains a tracker listing
-                # Look for the pattern "NAME (ABBR) IS OPEN FOR LIMITED SIGNUP!"
-                signup_pattern = r'([^(]+)\s*\(([^)]+)\)\s+IS OPEN FOR LIMITED SIGNUP!'
-                title_match = re.search(signup_pattern, text_content, re.IGNORECASE)
-                
-                if title_match:
-                    name = title_match.group(1).strip()
-                    abbreviation = title_match.group(2).strip()
-                    
-                    # Look for date - dates appear in elements with class 'post-date', 'post-day', 'post-month', 'post-year'
-                    date_element = element.find(class_=lambda x: x and any(cls in x for cls in ['post-date', 'post-day', 'post-month', 'post-year']))
-                    date = "Unknown date"
-                    if date_element:
-                        # Try to extract date from structured elements
-                        day_elem = element.find(class_=lambda x: x and 'post-day' in x)
-                        month_elem = element.find(class_=lambda x: x and 'post-month' in x)
-                        year_elem = element.find(class_=lambda x: x and 'post-year' in x)
-                        
-                        if day_elem and month_elem and year_elem:
-                            date = f"{month_elem.get_text().strip()} {day_elem.get_text().strip()} {year_elem.get_text().strip()}"
-                        elif date_element:
-                            date = date_element.get_text().strip()
-                    else:
-                        # Fallback to regex in text
-                        date_patterns = [
-                            r'(\w{3}\s+\d{1,2}\s+\d{4})',  # Jan 15 2026
-                            r'(\d{1,2}\s+\w{3}\s+\d{4})',  # 15 Jan 2026
-                            r'(\w{3}\.\s+\d{1,2},?\s+\d{4})',  # Jan. 15, 2026
-                        ]
-                        
-                        for pattern in date_patterns:
-                            date_match = re.search(pattern, text_content, re.IGNORECASE)
-                            if date_match:
-                                date = date_match.group(1)
-                                break
-                    
-                    # Look for description - usually follows the pattern "Name (Abbr) is a ..."
-                    desc_pattern = rf'{re.escape(name)}\s+\({re.escape(abbreviation)}\)\s+is a\s+([^.]*?)(?:\n|$)'
-                    desc_match = re.search(desc_pattern, text_content, re.IGNORECASE | re.DOTALL)
-                    description = desc_match.group(1).strip() if desc_match else "No description"
-                    
-                    # Clean up the description to remove extra whitespace and formatting
-                    description = ' '.join(description.split())
-                    
-                    # Look for tags - these are often in elements with class containing 'tag' or 'category'
-                    tags = []
-                    # Look for elements with tag-related classes
-                    tag_elements = element.find_all(['span', 'a', 'div', 'p'], 
-                                                  class_=lambda x: x and any(tag in x.lower() for tag in ['tag', 'category', 'post-tags']))
-                    for tag_elem in tag_elements:
-                        tag_text = tag_elem.get_text().strip()
-                        if tag_text and len(tag_text) < 100 and tag_text not in ['Tags:', 'Categories:']:  # Avoid label text
-                            # Split by bullet character, middle dot, or other separators
-                            parts = [part.strip() for part in tag_text.replace('•', '|').replace('·', '|').replace('', '|').split('|')]
-                            tags.extend([part for part in parts if part and part.lower() not in ['tags:', 'categories:']])
-                    
-                    # Also look for tags in the text content by looking for common tracker categories
-                    # These are often mentioned in the text
-                    common_tags = ['general', 'hd', 'uhd', '4k', 'movies', 'tv', 'music', 'games', 'xxx', 'anime', 'porn', 'sports', '0day', 'gay', 'limited signup']
-                    text_lower = text_content.lower()
-                    for tag in common_tags:
-                        if tag in text_lower and tag not in [t.lower() for t in tags]:
-                            tags.append(tag)
-                    
-                    tracker_info = {
-                        'name': name,
-                        'abbreviation': abbreviation,
-                        'date': date,
-                        'description': description,
-                        'tags': tags,
-                        'full_text': text_content[:300]  # Store a snippet for comparison
-                    }
-                    
-                    tracker_entries.append(tracker_info)
+            self.deliver_webhooks(new_trackers, event)
+            print("Webhook notifications sent successfully!")
             
-            return tracker_entries
+        except Exception as e:
+            print(f"Error sending webhook notifications: {str(e)}")
+    
+    def notification_channels(self):
+        """Enabled notification channels as name -> (deliver function, channel config)
+        
+        The deliver functions do not retry on their own: the dispatcher running them does.
+        """
+        channels = {}
+        if self.email_config.get('enabled', False):
+            channels['email'] = (functools.partial(self.deliver_email, retry=False), self.email_config)
+        if self.whatsapp_config.get('enabled', False):
+            channels['whatsapp'] = (functools.partial(self.deliver_whatsapp, retry=False), self.whatsapp_config)
+        if self.webhook_config.get('enabled', False):
+            # One channel per endpoint, so endpoints are posted to concurrently and retried separately
+            default_events = self.webhook_config.get('events', ['new'])
+            for number, endpoint in enumerate(self.webhook_endpoints(), 1):
+                name = f"webhook:{endpoint.get('name', number)}"
+                config = {'events': endpoint.get('events', default_events)}
+                channels[name] = (functools.partial(self.deliver_webhook, endpoint, retry=False), config)
+        return channels
+    
+    def start_dispatcher(self, notify_config=None):
+        """Deliver notifications in the background from now on
+        
+        notify_config may set 'max_queue' (notifications waiting per channel before senders
+        block), 'retries', 'backoff' and 'max_backoff' (seconds, doubled after each failure).
+        """
+        notify_config = notify_config or {}
+        self.dispatcher = NotificationDispatcher(
+            max_queue=notify_config.get('max_queue', 100),
+            retries=notify_config.get('retries', 3),
+            backoff=notify_config.get('backoff', 1.0),
+            max_backoff=notify_config.get('max_backoff', 60.0),
+            on_result=self.metrics.record_notification if self.metrics is not None else None)
+        for name, (deliver, config) in self.notification_channels().items():
+            # Background deliveries are timed too when profiling is enabled later on
+            self.dispatcher.add_channel(name, functools.partial(self.deliver_profiled, name, deliver),
+                                        config.get('events', ['new']))
+        return self.dispatcher
+    
+    def stop_dispatcher(self):
+        """Wait for queued notifications to be delivered and return the dispatcher's stats"""
+        if self.dispatcher is None:
+            return {}
+        try:
+            self.dispatcher.close()
+            return self.dispatcher.stats()
+        finally:
+            self.dispatcher = None
+    
+    def close(self):
+        """Deliver queued notifications and close pooled SMTP and HTTP connections"""
+        self.stop_dispatcher()
+        if self._smtp_pool is not None:
+            self._smtp_pool.close()
+        for notifier in self._http_notifiers.values():
+            notifier.close()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+    
+    def send_notifications(self, new_trackers, event='new'):
+        """Send all configured notifications subscribed to the event ('new' or 'changed')
+        
+        With a dispatcher running they are only queued here and delivered in the background.
+        """
+        if not new_trackers:
+            return
+        
+        with self.profile_stage('notify'):
+            if self.dispatcher is not None:
+                self.dispatcher.submit(new_trackers, event)
+                return
             
+            self.send_email_notification(new_trackers, event)
+            self.send_whatsapp_notification(new_trackers, event)
+            self.send_webhook_notification(new_trackers, event)
+    
+    def deliver_profiled(self, channel, deliver, trackers, event='new'):
+        """Run a channel's delivery as the 'deliver:<channel>' stage while profiling"""
+        with self.profile_stage(f"deliver:{channel}"):
+            deliver(trackers, event)
+        
+    def page_url(self, page, source=None):
+        """URL of a listing page of a source, the first one by default"""
+        return (source or self.source).page_url(page)
+    
+    def get_document(self, url):
+        """Fetch and parse a URL, at most once per crawl cycle
+        
+        Pagination discovery and tracker extraction share these documents, so no page is
+        downloaded or parsed twice. A 304 from the validator cache yields a document with
+        the trackers and page count remembered from the last full download and no tree.
+        """
+        documents = self._documents
+        if documents is not None and url in documents:
+            return documents[url]
+        
+        headers = self.http_cache.request_headers(url) if self.http_cache else None
+        response = self.fetch(url, headers=headers)
+        
+        document = None
+        # Not modified since the last cycle: reuse what was extracted then, skipping the parse
+        if response.status_code == 304 and self.http_cache:
+            cached = self.http_cache.hit(url)
+            if cached is not None:
+                document = PageDocument(url, trackers=cached['trackers'], max_page=cached['max_page'])
+        
+        if document is None:
+            response.raise_for_status()
+            parse_start = time.perf_counter()
+            with self.profile_stage('parse', url):
+                tree = self.parser.parse(response.content)
+            document = PageDocument(url, tree=tree, response=response)
+            document.parse_seconds = time.perf_counter() - parse_start
+            if self.metrics is not None:
+                self.metrics.parse_seconds.observe(document.parse_seconds)
+        
+        if documents is not None:
+            documents[url] = document
+        return document
+    
+    def fetch_tracker_listings(self, page=1, source=None):
+        """Get tracker listings from a specific page of a source, the first one by default; raises on errors"""
+        source = source or self.source
+        url = source.page_url(page)
+        document = self.get_document(url)
+        if document.trackers is None:
+            extract_start = time.perf_counter()
+            with self.profile_stage('extract', url, capture=True):
+                document.trackers = self.extract_trackers(document.tree, source)
+            extract_seconds = time.perf_counter() - extract_start
+            document.parse_seconds += extract_seconds
+            if self.metrics is not None:
+                self.metrics.extract_seconds.observe(extract_seconds)
+            if self.http_cache:
+                if document.max_page is None:
+                    with self.profile_stage('pagination', url):
+                        document.max_page = self.find_max_page(document.tree, source)
+                self.http_cache.store(url, document.response, document.trackers,
+                                      document.max_page, document.parse_seconds)
+        return document.trackers
+    
+    def get_tracker_listings(self, page=1, source=None):
+        """Get tracker listings from a specific page of a source, the first one by default; [] on errors"""
+        try:
+            return self.fetch_tracker_listings(page, source)
         except Exception as e:
-            print(f"Error fetching page {page}: {str(e)}")
+            self.log(source or self.source, f"Error fetching page {page}: {str(e)}")
             return []
     
-    def get_all_trackers(self):
-        """Get all tracker listings from all pages"""
-        all_trackers = []
-        page = 1
+    def extract_trackers(self, tree, source=None):
+        """Extract tracker entries from a listing page parsed by self.parser, with the source's extractor"""
+        return (source or self.source).extract_trackers(tree)
+    
+    def find_max_page(self, tree, source=None):
+        """Find the highest page number linked from a listing page's pagination"""
+        return (source or self.source).find_max_page(tree)
+    
+    def log(self, source, message):
+        """Print a crawl message, naming the source when several are crawled"""
+        if len(self.sources) > 1:
+            message = f"[{source.name}] {message}"
+        print(message)
+    
+    def deadline_passed(self, page, source=None, resume=0):
+        """Whether the crawl has run out of time before the given page, which is then left unfinished"""
+        remaining = self.remaining_time()
+        if remaining is None or remaining > 0:
+            return False
+        source = source or self.source
+        self.log(source, f"Cycle deadline reached, skipping page {page} onwards")
+        self.mark_unfinished(source, page, resume)
+        return True
+    
+    def mark_unfinished(self, source, page, resume=0):
+        """Remember that a source's crawl did not get through page, for the next cycle to resume"""
+        self.unfinished[source.name] = max(self.unfinished.get(source.name, 0), page, resume)
+    
+    def crawl_source(self, source, known=None, stop=None, resume=0):
+        """Yield (page, trackers) for each of a source's listing pages, in page order
         
-        # First, try to get the total number of pages
+        Called by iter_source_pages, which sets up the cycle's document cache and deadline.
+        With known (a function telling whether every one of a list of trackers has been seen
+        before) paging stops at the first page holding trackers that are all known, but not
+        before page resume; a page that fails to load ends the incremental scan there.
+        Failed pages are left in self.unfinished. stop is an optional threading.Event checked
+        before each page.
+        """
         try:
-            response = self.session.get(self.base_url)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Look for pagination links - they might be in different structures
-            max_page = 1
-            
-            # Try different selectors for pagination
-            pagination_selectors = [
-                '.multinav',       # From debug output, this appears to be the pagination class
-                'nav.navigation',  # Common class for navigation
-                '.pagination',     # Common class name
-                '.pager',          # Another common class
-                'nav',             # Generic nav tag
-                '.wp-pagenavi'     # WordPress pagination
-            ]
-            
-            for selector in pagination_selectors:
-                pagination = soup.select_one(selector)
-                if pagination:
-                    # Look for links with page numbers
-                    links = pagination.find_all('a', href=True)
-                    for link in links:
-                        href = link['href']
-                        # Look for patterns like /page/2/, /page/3/, etc.
-                        page_matches = re.findall(r'/page/(\d+)', href)
-                        for page_num_str in page_matches:
-                            try:
-                                page_num = int(page_num_str)
-                                max_page = max(max_page, page_num)
-                            except ValueError:
-                                continue
-                    break  # Found pagination, no need to check other selectors
-            
-            # If we didn't find pagination via selectors, try looking for page number links anywhere in the page
-            if max_page == 1:
-                # Look for any links that contain page numbers
-                all_links = soup.find_all('a', href=True)
-                for link in all_links:
-                    href = link['href']
-                    page_matches = re.findall(r'/page/(\d+)', href)
-                    for page_num_str in page_matches:
-                        try:
-                            page_num = int(page_num_str)
-                            max_page = max(max_page, page_num)
-                        except ValueError:
-                            continue
+            # First, try to get the total number of pages. Page 1 is fetched once per cycle and
+            # the same document is reused when its trackers are extracted below.
+            document = self.get_document(source.page_url(1))
+            if document.max_page is None:
+                with self.profile_stage('pagination', document.url):
+                    document.max_page = self.find_max_page(document.tree, source)
+            max_page = document.max_page
             
             # If no pagination found, just check the first page
             if max_page == 1:
-                print("No pagination found, checking only the first page...")
+                self.log(source, "No pagination found, checking only the first page...")
                 max_pages_to_check = 1
             else:
-                # Limit to first 5 pages to avoid excessive requests initially
-                max_pages_to_check = min(max_page, 5)
+                # Limit to the first few pages to avoid excessive requests
+                max_pages_to_check = min(max_page, source.max_pages)
             
-            print(f"Checking {max_pages_to_check} pages...")
+            self.log(source, f"Checking {max_pages_to_check} pages...")
             
-            for page in range(1, max_pages_to_check + 1):
-                print(f"Scanning page {page}...")
-                trackers = self.get_tracker_listings(page)
-                all_trackers.extend(trackers)
-                
-                # Be respectful with requests
-                time.sleep(1)
+            # Requests are spaced out by the per-host rate limiter, so concurrent fetches
+            # stay polite while their latency overlaps. Results are yielded in page order.
+            pages = range(1, max_pages_to_check + 1)
+            if known is not None:
+                # Incremental pages are fetched one at a time so we never request past the watermark
+                for page in pages:
+                    if (stop is not None and stop.is_set()) or self.deadline_passed(page, source, resume):
+                        break
+                    self.log(source, f"Scanning page {page}...")
+                    try:
+                        trackers = self.fetch_tracker_listings(page, source)
+                    except Exception as e:
+                        # Later pages are left alone too, so the next cycle picks up from here
+                        self.log(source, f"Error fetching page {page}, stopping incremental scan: {str(e)}")
+                        self.mark_unfinished(source, page, resume)
+                        break
+                    # Checked before the page is handed over, since the consumer may record it
+                    all_known = page >= resume and bool(trackers) and known(trackers)
+                    yield page, trackers
+                    if all_known:
+                        self.log(source, f"Page {page} holds no new trackers, stopping incremental scan")
+                        break
+            elif self.max_workers > 1 and len(pages) > 1:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pages))) as executor:
+                    futures = [executor.submit(self.fetch_tracker_listings, page, source) for page in pages]
+                    try:
+                        for page, future in zip(pages, futures):
+                            if (stop is not None and stop.is_set()) or self.deadline_passed(page, source, resume):
+                                break
+                            self.log(source, f"Scanning page {page}...")
+                            yield page, self._listings_or_unfinished(source, page, future.result, resume)
+                    finally:
+                        # The consumer may stop early; don't fetch pages nobody will read
+                        for future in futures:
+                            future.cancel()
+            else:
+                for page in pages:
+                    if (stop is not None and stop.is_set()) or self.deadline_passed(page, source, resume):
+                        break
+                    self.log(source, f"Scanning page {page}...")
+                    yield page, self._listings_or_unfinished(
+                        source, page, functools.partial(self.fetch_tracker_listings, page, source), resume)
                 
         except Exception as e:
-            print(f"Error getting all trackers: {str(e)}")
+            self.log(source, f"Error getting all trackers: {str(e)}")
+            self.mark_unfinished(source, 1, resume)
+    
+    def _listings_or_unfinished(self, source, page, get_listings, resume):
+        """A page's listings from get_listings(), or [] with the page marked unfinished if it failed"""
+        try:
+            return get_listings()
+        except Exception as e:
+            self.log(source, f"Error fetching page {page}: {str(e)}")
+            self.mark_unfinished(source, page, resume)
+            return []
+    
+    def iter_source_pages(self, known_trackers=None, full_rescan=False, resume_pages=None, known=None):
+        """Yield (source, page, trackers) for each listing page as soon as it has been extracted
+        
+        When known_trackers is given the crawl is incremental: listings are newest-first, so
+        paging stops at the first page holding only known trackers. Instead of a list, known
+        can be a function telling whether all of a page's trackers are known, such as a state
+        store's contains(); it is called from the crawl threads. Pass full_rescan=True to scan
+        every page regardless. Each source's pages are yielded in page order; with
+        several sources they are crawled concurrently and their pages interleave.
+        
+        Pages that failed to load are left in self.unfinished (source name -> page) once the
+        crawl is done. Passing that back as resume_pages next cycle keeps the incremental scan
+        from stopping before it has read those pages again.
+        """
+        if full_rescan:
+            known = None
+        elif known is None and known_trackers is not None:
+            known_ids = {tracker_id(tracker) for tracker in known_trackers}
+            known = lambda trackers: all(tracker_id(tracker) in known_ids for tracker in trackers)
+        
+        resume_pages = resume_pages or {}
+        self.unfinished = {}
+        self._documents = {}
+        cycle_timeout = self.crawl_config.get('cycle_timeout')
+        if cycle_timeout:
+            self._deadline = time.monotonic() + cycle_timeout
+        try:
+            if len(self.sources) == 1:
+                source = self.sources[0]
+                for page, trackers in self.crawl_source(source, known, resume=resume_pages.get(source.name, 0)):
+                    yield source, page, trackers
+            else:
+                yield from self._crawl_sources(known, resume_pages)
+        finally:
+            self._documents = None
+            self._deadline = None
+            if self.http_cache:
+                self.http_cache.save()
+                stats = self.http_cache.stats()
+                print(f"HTTP cache: {stats['hits']} hits, {stats['misses']} misses, {stats['bytes_saved']} bytes saved")
+    
+    def _crawl_sources(self, known, resume_pages):
+        """Crawl every source on its own thread, yielding pages as they come in from any of them"""
+        results = queue.Queue()
+        stop = threading.Event()
         
-        return all_trackers
+        def crawl(source):
+            try:
+                for page, trackers in self.crawl_source(source, known, stop, resume_pages.get(source.name, 0)):
+                    results.put((source, page, trackers))
+            finally:
+                results.put(None)
+        
+        with ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix='source') as executor:
+            for source in self.sources:
+                executor.submit(crawl, source)
+            try:
+                running = len(self.sources)
+                while running:
+                    result = results.get()
+                    if result is None:
+                        running -= 1
+                    else:
+                        yield result
+            finally:
+                # The consumer may stop early; let every source finish its current page and stop
+                stop.set()
+    
+    def iter_tracker_pages(self, known_trackers=None, full_rescan=False):
+        """Yield (page, trackers) for each listing page as soon as it has been extracted (see iter_source_pages)"""
+        for source, page, trackers in self.iter_source_pages(known_trackers, full_rescan):
+            yield page, trackers
+    
+    def iter_trackers(self, known_trackers=None, full_rescan=False):
+        """Yield tracker listings one by one as pages are extracted, in page order"""
+        for page, trackers in self.iter_tracker_pages(known_trackers, full_rescan):
+            yield from trackers
+    
+    def get_all_trackers(self, known_trackers=None, full_rescan=False):
+        """Get all tracker listings from all pages (see iter_tracker_pages)"""
+        return list(self.iter_trackers(known_trackers, full_rescan))
+
+class Tracker:
+    """Compact, immutable tracker record for large backfills and long histories
+    
+    Tags (and the date) are interned so repeated values share one string, and the identity
+    key used by find_new_trackers is computed once. Fields can also be read dict-style, so a
+    record can be used wherever a tracker dict is read.
+    """
+    
+    __slots__ = ('name', 'abbreviation', 'date', 'description', 'tags', 'full_text', 'key')
+    FIELDS = ('name', 'abbreviation', 'date', 'description', 'tags', 'full_text')
+    
+    def __init__(self, name, abbreviation, date, description=None, tags=None, full_text=None):
+        init = object.__setattr__
+        init(self, 'name', name)
+        init(self, 'abbreviation', abbreviation)
+        init(self, 'date', sys.intern(date))
+        init(self, 'description', description)
+        init(self, 'tags', None if tags is None else tuple(sys.intern(tag) for tag in tags))
+        init(self, 'full_text', full_text)
+        init(self, 'key', f"{name}_{date}_{abbreviation}")
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("Tracker records are immutable")
+    
+    def __delattr__(self, name):
+        raise AttributeError("Tracker records are immutable")
+    
+    def __getitem__(self, field):
+        if field not in self.FIELDS:
+            raise KeyError(field)
+        value = getattr(self, field)
+        return list(value) if field == 'tags' and value is not None else value
+    
+    def __eq__(self, other):
+        if not isinstance(other, Tracker):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.FIELDS)
+    
+    def __hash__(self):
+        return hash(self.key)
+    
+    def __repr__(self):
+        return f"Tracker({self.name!r}, {self.abbreviation!r}, {self.date!r})"
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a record from a tracker dict; fields missing from the dict stay missing"""
+        return cls(data['name'], data['abbreviation'], data['date'], data.get('description'),
+                   data.get('tags'), data.get('full_text'))
+    
+    def to_dict(self):
+        """Tracker dict with the same fields the record was built from"""
+        data = {}
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                data[field] = list(value) if field == 'tags' else value
+        return data
+
+def tracker_id(tracker):
+    """Unique identifier for a tracker based on name, date and abbreviation"""
+    if isinstance(tracker, Tracker):
+        return tracker.key
+    return f"{tracker['name']}_{tracker['date']}_{tracker['abbreviation']}"
 
 def save_trackers_to_file(trackers, filename='trackers.json'):
-    """Save tracker data to a JSON file"""
+    """Save tracker data (dicts or Tracker records) to a JSON file"""
+    trackers = [tracker.to_dict() if isinstance(tracker, Tracker) else tracker for tracker in trackers]
     with open(filename, 'w', encoding='utf-8') as f:
         json.dump(trackers, f, indent=2, ensure_ascii=False)
 
-def load_previous_trackers(filename='trackers.json'):
-    """Load previously saved tracker data"""
+def load_previous_trackers(filename='trackers.json', as_records=False):
+    """Load previously saved tracker data, as dicts or as Tracker records"""
     try:
         with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            trackers = json.load(f)
     except FileNotFoundError:
         return []
+    if as_records:
+        return [Tracker.from_dict(tracker) for tracker in trackers]
+    return trackers
 
 def find_new_trackers(current_trackers, previous_trackers):
     """Find new trackers by comparing with previous data"""
+    return list(iter_new_trackers(current_trackers, previous_trackers))
+
+def iter_new_trackers(current_trackers, previous_trackers=(), previous_tracker_ids=None):
+    """Yield trackers not in the previous data as they arrive from any iterable, e.g. iter_trackers()
+    
+    previous_tracker_ids can be passed instead of previous_trackers to reuse an identifier set.
+    """
     # Create a unique identifier for each tracker based on name and date
-    previous_tracker_ids = {f"{tracker['name']}_{tracker['date']}_{tracker['abbreviation']}" for tracker in previous_trackers}
-    current_tracker_ids = {f"{tracker['name']}_{tracker['date']}_{tracker['abbreviation']}" for tracker in current_trackers}
+    if previous_tracker_ids is None:
+        previous_tracker_ids = {tracker_id(tracker) for tracker in previous_trackers}
+    for tracker in current_trackers:
+        if tracker_id(tracker) not in previous_tracker_ids:
+            yield tracker
+
+def diff_trackers(current_trackers, previous_trackers=(), previous_fingerprints=None):
+    """Sort a scan into new, changed and unchanged trackers in one pass
     
-    # Find completely new trackers
-    new_tracker_ids = current_tracker_ids - previous_tracker_ids
+    A known tracker is changed when its description or tags no longer match the stored
+    fingerprint. previous_fingerprints (tracker_id -> fingerprint) can be passed instead
+    of previous_trackers to reuse the mapping.
+    """
+    if previous_fingerprints is None:
+        previous_fingerprints = {tracker_id(tracker): tracker_fingerprint(tracker) for tracker in previous_trackers}
+    diff = {'new': [], 'changed': [], 'unchanged': []}
+    for tracker in current_trackers:
+        previous = previous_fingerprints.get(tracker_id(tracker))
+        if previous is None:
+            diff['new'].append(tracker)
+        elif previous == tracker_fingerprint(tracker):
+            diff['unchanged'].append(tracker)
+        else:
+            diff['changed'].append(tracker)
+    return diff
+
+def default_config():
+    """Settings used for everything config.json does not set"""
+    return {
+        # Email configuration - fill in your details
+        'email': {
+            'enabled': True,  # Set to True to enable email notifications
+            'smtp_server': 'smtp.gmail.com',  # Example for Gmail
+            'smtp_port': 587,
+            'sender_email': 'your_email@gmail.com',  # Replace with your email
+            'sender_password': 'your_app_password',  # Use app password for Gmail
+            'recipient_email': 'recipient@gmail.com',  # Email to send notifications to (a list or comma-separated for several)
+            'timeout': 30,  # Seconds an SMTP operation may take before the session is given up on
+            'events': ['new']  # Add 'changed' to also be told when a known listing is updated
+        },
+        
+        # WhatsApp configuration - fill in your details if using WhatsApp notifications
+        'whatsapp': {
+            'enabled': False,  # Set to True to enable WhatsApp notifications
+            'api_url': 'https://graph.facebook.com/v13.0/YOUR_PHONE_NUMBER_ID',
+            'access_token': 'YOUR_ACCESS_TOKEN',
+            'phone_number': 'RECIPIENT_PHONE_NUMBER',  # Recipient's phone number in international format
+            'events': ['new'],
+            'requests_per_second': 10.0  # Stay under the Cloud API's messaging rate limit
+        },
+        
+        # Webhook configuration - Slack, Discord or plain JSON endpoints, posted to concurrently
+        'webhooks': {
+            'enabled': False,
+            'endpoints': [
+                # {'name': 'team-slack', 'url': 'https://hooks.slack.com/services/...', 'format': 'slack'},
+                # {'name': 'discord', 'url': 'https://discord.com/api/webhooks/...', 'format': 'discord', 'events': ['new', 'changed']},
+            ],
+            'events': ['new']
+        },
+        
+        # Crawl configuration - rate limiting, concurrency and caching
+        'crawl': {
+            'max_workers': 1,  # Pages fetched concurrently
+            'requests_per_second': 1.0,  # Per-host request rate
+            'burst': 1,
+            'http_cache_file': 'http_cache.json',  # Conditional GET cache, None to disable
+            'cycle_timeout': 300,  # Seconds a whole check may take before remaining fetches are cancelled
+            'archive_dir': None,  # Keep a compressed copy of every fetched page here, for --replay
+            # Sites to watch, crawled concurrently; opentrackers.org alone when left empty
+            'sources': [
+                # {'name': 'opentrackers', 'type': 'opentrackers', 'max_pages': 5},
+                # {'name': 'mirror', 'type': 'opentrackers', 'base_url': 'https://mirror.example', 'requests_per_second': 0.5},
+                # {'name': 'forum', 'type': 'my_plugins:ForumSource', 'base_url': 'https://forum.example'},
+            ]
+        },
+        
+        # Notification delivery - runs in the background so the crawl never waits on a mail server
+        'notifications': {
+            'max_queue': 100,  # Notifications waiting per channel
+            'retries': 3,  # Further attempts after a failed delivery
+            'backoff': 5.0  # Seconds before the first retry, doubled for each further one
+        },
+        
+        # Metrics - Prometheus text format on a local /metrics endpoint and/or a textfile collector file
+        'metrics': {
+            'enabled': False,
+            'address': '127.0.0.1',
+            'port': None,  # e.g. 9108 to serve http://127.0.0.1:9108/metrics
+            'textfile': None  # e.g. '/var/lib/node_exporter/textfile_collector/tracker_monitor.prom'
+        },
+        
+        # Digest mode - collect new trackers and send them together instead of once per check
+        'digest': {
+            'enabled': False,
+            'window': 4 * 3600,  # Send at the latest this many seconds after the first buffered tracker
+            'max_events': 10  # ...or as soon as this many are waiting
+        },
+        
+        # How often tracker_scheduler.py checks
+        'schedule': {
+            'interval_minutes': 60,
+            'adaptive': False,  # Learn from past posting times when to check more or less often
+            'min_interval_minutes': 10,  # Adaptive bounds
+            'max_interval_minutes': 120,
+            'boost_minutes': 0,  # Check at the minimum interval this long after a new tracker (extra checks)
+            'jitter': 0.1  # Randomly spread each interval by up to +/-10%
+        }
+    }
+
+def load_config(filename='config.json'):
+    """The default settings, overridden section by section by the file (if it exists)"""
+    config = default_config()
+    if filename and os.path.exists(filename):
+        with open(filename, 'r', encoding='utf-8') as f:
+            for section, settings in json.load(f).items():
+                if isinstance(settings, dict) and isinstance(config.get(section), dict):
+                    config[section].update(settings)
+                else:
+                    config[section] = settings
+    return config
+
+def create_monitor(config):
+    """A monitor for the loaded configuration, delivering notifications in the background"""
+    monitor = TrackerMonitor(email_config=config['email'], whatsapp_config=config['whatsapp'],
+                             crawl_config=config['crawl'], webhook_config=config['webhooks'])
+    if config['metrics'].get('enabled', False):
+        monitor.enable_metrics(config['metrics'])
+    monitor.start_dispatcher(config['notifications'])
+    return monitor
+
+def replay_config(config, directory):
+    """The configuration for re-running a check offline against the page archive in directory
     
-    # Return the full tracker objects for the new ones
-    new_trackers = [
-        tracker for tracker in current_trackers 
-        if f"{tracker['name']}_{tracker['date']}_{tracker['abbreviation']}" in new_tracker_ids
-    ]
+    Pages come from the archive, and nothing leaves the machine: notifications and metrics are
+    off and neither the validator cache nor the archive is written.
+    """
+    config = copy.deepcopy(config)
+    config['crawl'].update(replay_dir=directory, http_cache_file=None, archive_dir=None, cycle_timeout=None)
+    for section in ('email', 'whatsapp', 'webhooks', 'digest', 'metrics'):
+        config[section]['enabled'] = False
+    return config
+
+def shutdown_monitor(monitor):
+    """Wait for queued notifications, report how their delivery went and close the monitor
     
-    return new_trackers
+    Returns the dispatcher's delivery stats.
+    """
+    delivery_stats = monitor.stop_dispatcher()
+    for name, stats in delivery_stats.items():
+        print(f"{name} notifications: {stats['delivered']} delivered, {stats['failed']} failed, "
+              f"{stats['retries']} retries, {stats['latency_avg']:.1f}s average latency")
+    monitor.close()
+    return delivery_stats
 
-def main():
-    # Email configuration - fill in your details
-    email_config = {
-        'enabled': True,  # Set to True to enable email notifications
-        'smtp_server': 'smtp.gmail.com',  # Example for Gmail
-        'smtp_port': 587,
-        'sender_email': 'your_email@gmail.com',  # Replace with your email
-        'sender_password': 'your_app_password',  # Use app password for Gmail
-        'recipient_email': 'recipient@gmail.com'  # Email to send notifications to
-    }
+def add_profile_arguments(parser):
+    """The --profile options shared by tracker_monitor.py and tracker_scheduler.py"""
+    parser.add_argument('--profile', nargs='?', const='profile.json', metavar='FILE',
+                        help="record wall and CPU time per stage and page into a JSON report (default: profile.json)")
+    parser.add_argument('--profile-capture', action='append', choices=CAPTURES, default=[],
+                        help="also capture the extractor with cProfile or tracemalloc (repeatable)")
+
+def write_profile(monitor, filename, notifications=None):
+    """Write the monitor's profile report and print the time spent per stage"""
+    monitor.profiler.write(filename, notifications)
+    print(f"Profile written to {filename}:")
+    for line in monitor.profiler.summary():
+        print(f"  {line}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monitor opentrackers.org for new tracker signups")
+    parser.add_argument('--full-rescan', action='store_true',
+                        help="scan every page instead of stopping at the first page with no new trackers")
+    parser.add_argument('--config', default='config.json',
+                        help="settings file written by the setup wizard (default: config.json)")
+    parser.add_argument('--replay', metavar='DIR',
+                        help="re-run the check offline on the pages archived in DIR, against an empty in-memory state")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
     
-    # WhatsApp configuration - fill in your details if using WhatsApp notifications
-    whatsapp_config = {
-        'enabled': False,  # Set to True to enable WhatsApp notifications
-        'api_url': 'https://graph.facebook.com/v13.0/YOUR_PHONE_NUMBER_ID',
-        'access_token': 'YOUR_ACCESS_TOKEN',
-        'phone_number': 'RECIPIENT_PHONE_NUMBER'  # Recipient's phone number in international format
-    }
+    config = load_config(args.config)
+    state_file = 'trackers.db'
+    if args.replay:
+        config = replay_config(config, args.replay)
+        # Every archived tracker counts as new, and the real state is left alone
+        state_file = ':memory:'
+    try:
+        monitor = create_monitor(config)
+    except FileNotFoundError as e:
+        # A mistyped --replay directory
+        parser.error(str(e))
+    if args.profile:
+        monitor.enable_profiling(args.profile_capture)
     
-    monitor = TrackerMonitor(email_config=email_config, whatsapp_config=whatsapp_config)
-    print("Fetching current tracker listings...")
+    try:
+        new_trackers = check_for_new_trackers(monitor, full_rescan=args.full_rescan, state_file=state_file,
+                                              digest_config=config['digest'])
+    finally:
+        # Waits until every queued notification has been delivered or given up on
+        delivery_stats = shutdown_monitor(monitor)
+        if args.profile:
+            write_profile(monitor, args.profile, delivery_stats)
+    
+    if not new_trackers:
+        print("\nNo new tracker opportunities found.")
+
+def flush_digest(monitor, state, digest_config, now=None, force=False):
+    """Send buffered events as one notification per event type once the digest is due
+    
+    The digest is due when its oldest event has waited 'window' seconds or 'max_events'
+    events are pending. Returns the number of events sent.
+    """
+    pending = state.pending_events()
+    if not pending:
+        return 0
+    now = time.time() if now is None else now
+    oldest = min(queued_at for _, _, _, queued_at in pending)
+    due = (now - oldest >= digest_config.get('window', 3600)
+           or len(pending) >= digest_config.get('max_events', 10))
+    if not (due or force):
+        return 0
     
-    current_trackers = monitor.get_all_trackers()
-    print(f"Found {len(current_trackers)} tracker listings")
+    by_event = {}
+    for _, event, tracker, _ in pending:
+        by_event.setdefault(event, []).append(tracker)
+    for event, trackers in by_event.items():
+        print(f"Sending digest of {len(trackers)} {event} tracker events")
+        monitor.send_notifications(trackers, event=event)
+    state.clear_events([event_id for event_id, _, _, _ in pending])
+    return len(pending)
+
+def check_for_new_trackers(monitor, full_rescan=False, state_file='trackers.db', digest_config=None, state=None):
+    """Run one monitoring cycle: scan, record the results and notify; returns the new trackers
     
-    # Save current trackers
-    save_trackers_to_file(current_trackers)
+    With an enabled digest_config ('window' seconds, 'max_events') events are buffered in the
+    state store and sent together by flush_digest() instead of once per page. A long-running
+    caller can pass an open state store to use instead of opening state_file.
     
-    # Load previous trackers and find new ones
-    previous_trackers = load_previous_trackers()
-    new_trackers = find_new_trackers(current_trackers, previous_trackers)
+    The cycle holds the state store's lock, so when another instance (the service, or a manual
+    run) is already checking against the same state this one is skipped and returns [].
+    """
+    if state is None:
+        with SQLiteStateStore(state_file) as state:
+            return check_for_new_trackers(monitor, full_rescan, digest_config=digest_config, state=state)
     
-    if new_trackers:
-        print(f"\n🎉 Found {len(new_trackers)} NEW tracker opportunities!")
-        for tracker in new_trackers:
-            print(f"- {tracker['name']} ({tracker['abbreviation']}) - Closing: {tracker['date']}")
-        
-        # Send notifications
-        monitor.send_notifications(new_trackers)
-    else:
-        print("\nNo new tracker opportunities found.")
+    lock = state.lock()
+    if lock is not None and not lock.acquire():
+        holder = lock.holder()
+        running = f" (pid {holder[0]}, running for {time.time() - holder[1]:.0f}s)" if holder else ""
+        print(f"Another instance is already checking for trackers{running}, skipping this cycle")
+        if monitor.metrics is not None:
+            monitor.metrics.cycles_skipped.inc()
+            monitor.export_metrics()
+        return []
+    try:
+        with monitor.profile_stage('cycle'):
+            return run_cycle(monitor, state, full_rescan, digest_config)
+    finally:
+        if lock is not None:
+            lock.release()
+        monitor.export_metrics()
+
+def run_cycle(monitor, state, full_rescan=False, digest_config=None):
+    """The body of check_for_new_trackers, run while holding the state lock"""
+    digest = digest_config is not None and digest_config.get('enabled', False)
+    metrics = monitor.metrics
+    cycle_start = time.perf_counter()
+    # Everything found by this cycle was first seen now, whichever page it was on
+    seen_at = time.time()
+    
+    # Carry over state saved by older versions; a replay starts from nothing
+    if not monitor.replaying and not len(state) and os.path.exists('trackers.json'):
+        print(f"Imported {state.import_json('trackers.json', seen_at)} trackers from trackers.json")
+    
+    # Pages the last cycle failed to read are read this time before the scan may stop
+    resume_pages = state.resume_pages()
+    
+    print("Fetching current tracker listings...")
+    found = 0
+    new_trackers = []
+    seen_ids = set()
+    # Record each page as it arrives so the first alert goes out while later pages are still loading
+    # The stored trackers are the watermark for the incremental scan, looked up a page at a time
+    for source, page, trackers in monitor.iter_source_pages(known=state.contains, full_rescan=full_rescan,
+                                                            resume_pages=resume_pages):
+        found += len(trackers)
+        # A tracker announced by several sources (or pages) is diffed and notified once per cycle
+        page_ids = {tracker_id(tracker) for tracker in trackers}
+        trackers = [tracker for tracker in trackers if tracker_id(tracker) not in seen_ids]
+        seen_ids |= page_ids
+        where = f"page {page}" if len(monitor.sources) == 1 else f"{source.name} page {page}"
+        with monitor.profile_stage('diff', source.page_url(page)):
+            diff = state.diff(trackers, seen_at)
+        new_on_page = diff['new']
+        if metrics is not None:
+            metrics.page_trackers.observe(len(trackers))
+            metrics.trackers_found.inc(len(new_on_page), event='new')
+            metrics.trackers_found.inc(len(diff['changed']), event='changed')
+        if diff['changed']:
+            print(f"{len(diff['changed'])} known listings changed on {where}")
+            if digest:
+                state.queue_events(diff['changed'], event='changed')
+            else:
+                monitor.send_notifications(diff['changed'], event='changed')
+        if new_on_page:
+            print(f"\n🎉 Found {len(new_on_page)} NEW tracker opportunities on {where}!")
+            for tracker in new_on_page:
+                print(f"- {tracker['name']} ({tracker['abbreviation']}) - Closing: {tracker['date']}")
+            
+            # Send notifications
+            if digest:
+                state.queue_events(new_on_page)
+            else:
+                monitor.send_notifications(new_on_page)
+            new_trackers.extend(new_on_page)
+    print(f"Found {found} tracker listings")
+    state.set_resume_pages(monitor.unfinished)
+    if monitor.unfinished:
+        print(f"Unfinished pages will be read next cycle: "
+              f"{', '.join(f'{name} page {page}' for name, page in monitor.unfinished.items())}")
+    
+    if digest:
+        flush_digest(monitor, state, digest_config)
+    if metrics is not None:
+        metrics.cycles.inc()
+        metrics.cycle_seconds.observe(time.perf_counter() - cycle_start)
+        metrics.cycle_new_trackers.observe(len(new_trackers))
+        metrics.last_cycle.set(time.time())
+    return new_trackers
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
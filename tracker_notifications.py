@@ -0,0 +1,451 @@
+"""
+Background delivery of tracker notifications.
+
+NotificationDispatcher gives every channel (email, WhatsApp, ...) a bounded queue and a worker
+thread, so a slow or unreachable server never holds up the crawl. Failed deliveries are retried
+with exponential backoff when the error is transient, and close() returns only once every
+queued notification has been delivered or given up on.
+
+SMTPConnectionPool keeps authenticated SMTP sessions open between notifications, so only the
+first email pays for the TCP, STARTTLS and login handshake. HTTPNotifier posts JSON to the
+WhatsApp Cloud API and to chat webhooks over a pooled session, rate limited per host and
+retrying throttled or failed requests.
+"""
+
+import queue
+import smtplib
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Queued after the last notification to stop a channel's worker
+_STOP = object()
+
+
+def is_transient(error):
+    """Whether a failed delivery may succeed if retried
+    
+    Connection problems and timeouts are, as are HTTP 429 and 5xx responses and SMTP 4xx
+    replies. Other HTTP 4xx responses (a wrong webhook URL, a revoked token), permanent SMTP
+    replies and anything unexpected are not.
+    """
+    # requests and smtplib errors are OSErrors too, so they are told apart first
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        return response is None or response.status_code == 429 or response.status_code >= 500
+    if isinstance(error, requests.RequestException):
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return isinstance(error, smtplib.SMTPServerDisconnected)
+    return isinstance(error, OSError)
+
+
+def requested_delay(error):
+    """Seconds the Retry-After of a failed HTTP request asks to wait, or None"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return retry_after_seconds(error.response)
+    return None
+
+
+class NotificationDispatcher:
+    """Delivers notifications on background threads, one bounded queue and worker per channel
+    
+    Deliveries failing with a transient error (see is_transient) are retried, after the
+    server's Retry-After when it sent one; any other failure, or a server asking to wait longer
+    than max_backoff, gives the notification up straight away. The dispatcher owns retrying:
+    channels should not retry on their own as well.
+
+    on_result(channel, outcome, latency), if given, is called after every attempt with the
+    outcome 'delivered' (with the enqueue-to-delivery latency), 'retry' or 'failed'.
+    """
+
+    def __init__(self, max_queue=100, retries=3, backoff=1.0, max_backoff=60.0, clock=time.monotonic, sleep=time.sleep,
+                 on_result=None):
+        self.max_queue = max_queue
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.on_result = on_result
+        self.channels = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def add_channel(self, name, deliver, events=('new',)):
+        """Register deliver(trackers, event), which raises on failure, for the given events"""
+        channel = {
+            'deliver': deliver,
+            'events': frozenset(events),
+            'queue': queue.Queue(self.max_queue),
+            'delivered': 0,
+            'failed': 0,
+            'retries': 0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+        }
+        channel['thread'] = threading.Thread(target=self._run, args=(name, channel),
+                                             name=f"notify-{name}", daemon=True)
+        self.channels[name] = channel
+        channel['thread'].start()
+
+    def submit(self, trackers, event='new'):
+        """Queue trackers for every channel subscribed to the event; blocks only while a queue is full"""
+        if self._closed:
+            raise RuntimeError("NotificationDispatcher is closed")
+        trackers = list(trackers)
+        if not trackers:
+            return
+        enqueued = self.clock()
+        for channel in self.channels.values():
+            if event in channel['events']:
+                channel['queue'].put((trackers, event, enqueued))
+
+    def _run(self, name, channel):
+        while True:
+            job = channel['queue'].get()
+            try:
+                if job is _STOP:
+                    return
+                self._deliver(name, channel, *job)
+            finally:
+                channel['queue'].task_done()
+
+    def _deliver(self, name, channel, trackers, event, enqueued):
+        for attempt in range(self.retries + 1):
+            try:
+                channel['deliver'](trackers, event)
+            except Exception as e:
+                delay = requested_delay(e)
+                if delay is None:
+                    delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+                if attempt == self.retries or not is_transient(e) or delay > self.max_backoff:
+                    print(f"Error sending {name} notification, giving up after {attempt + 1} attempts: {str(e)}")
+                    with self._lock:
+                        channel['failed'] += 1
+                    if self.on_result is not None:
+                        self.on_result(name, 'failed', None)
+                    return
+                print(f"Error sending {name} notification: {str(e)} (retrying in {delay:g}s)")
+                with self._lock:
+                    channel['retries'] += 1
+                if self.on_result is not None:
+                    self.on_result(name, 'retry', None)
+                self.sleep(delay)
+            else:
+                latency = self.clock() - enqueued
+                with self._lock:
+                    channel['delivered'] += 1
+                    channel['latency_total'] += latency
+                    channel['latency_max'] = max(channel['latency_max'], latency)
+                if self.on_result is not None:
+                    self.on_result(name, 'delivered', latency)
+                return
+
+    def stats(self):
+        """Queue depth, delivery counts and enqueue-to-delivery latency per channel"""
+        stats = {}
+        with self._lock:
+            for name, channel in self.channels.items():
+                stats[name] = {
+                    'queue_depth': channel['queue'].qsize(),
+                    'delivered': channel['delivered'],
+                    'failed': channel['failed'],
+                    'retries': channel['retries'],
+                    'latency_avg': channel['latency_total'] / channel['delivered'] if channel['delivered'] else 0.0,
+                    'latency_max': channel['latency_max'],
+                }
+        return stats
+
+    def close(self):
+        """Stop accepting notifications and wait until everything queued has been handled"""
+        if self._closed:
+            return
+        self._closed = True
+        for channel in self.channels.values():
+            channel['queue'].put(_STOP)
+        for channel in self.channels.values():
+            channel['thread'].join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def recipient_list(recipients):
+    """Addresses from a list or a comma-separated string"""
+    if isinstance(recipients, str):
+        recipients = recipients.split(',')
+    return [address.strip() for address in recipients if address and address.strip()]
+
+
+class SMTPConnectionPool:
+    """Authenticated SMTP sessions reused across sends
+    
+    An idle session is checked with NOOP before reuse when it has not been used for
+    health_check_interval seconds, and dropped after idle_timeout seconds. A session that
+    fails during a send is discarded, and unless the caller retries on its own (retry=False) the
+    send is retried once on a fresh connection.
+    
+    Every socket operation gives up after timeout seconds, so a half-open pooled session
+    cannot hang the health check, a send or the logout.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, max_idle=2,
+                 idle_timeout=300.0, health_check_interval=10.0, timeout=30.0, clock=time.monotonic):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.clock = clock
+        self._idle = []  # (server, last used) pairs, most recently used last
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.reused = 0
+        self.sends = 0
+        self.retried = 0
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            self._discard(server)
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _checkout(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            idle = self.clock() - last_used
+            if idle > self.idle_timeout:
+                self._discard(server)
+                continue
+            if idle > self.health_check_interval:
+                try:
+                    healthy = server.noop()[0] == 250
+                except (smtplib.SMTPException, OSError):
+                    healthy = False
+                if not healthy:
+                    server.close()
+                    continue
+            with self._lock:
+                self.reused += 1
+            return server
+        return self._connect()
+
+    def _checkin(self, server):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append((server, self.clock()))
+                return
+        self._discard(server)
+
+    @contextmanager
+    def connection(self):
+        """An authenticated session, returned to the pool unless the block fails"""
+        server = self._checkout()
+        try:
+            yield server
+        except Exception:
+            server.close()
+            raise
+        self._checkin(server)
+
+    def sendmail(self, from_addr, to_addrs, message, retry=True):
+        """Send one message to all recipients in a single SMTP transaction
+        
+        With retry False a dropped session fails the send instead of it being retried here.
+        """
+        try:
+            return self._send(from_addr, to_addrs, message)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            if not retry:
+                raise
+            # The server dropped a pooled session; try once more on a fresh one
+            with self._lock:
+                self.retried += 1
+            return self._send(from_addr, to_addrs, message)
+
+    def _send(self, from_addr, to_addrs, message):
+        with self.connection() as server:
+            with self._lock:
+                self.sends += 1
+            return server.sendmail(from_addr, to_addrs, message)
+
+    def stats(self):
+        """Transactions attempted and retried, sessions opened and reused"""
+        with self._lock:
+            return {
+                'sends': self.sends,
+                'retries': self.retried,
+                'connections_opened': self.connections_opened,
+                'reused': self.reused,
+            }
+
+    def close(self):
+        """Log out of every idle session"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            self._discard(server)
+
+
+def retry_after_seconds(response, now=None):
+    """Seconds asked for by a Retry-After header (delta or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+class HTTPNotifier:
+    """JSON POSTs over a pooled session, rate limited per host and retrying 429 and 5xx responses
+    
+    limiter_factory(host) creates the rate limiter for a host, e.g. a TokenBucket; without it
+    requests are not limited. Throttled and failed requests are retried after the server's
+    Retry-After, or else with exponential backoff; a server asking to wait longer than
+    max_backoff ends the retries.
+    """
+
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, limiter_factory=None, retries=3, backoff=1.0, max_backoff=60.0, timeout=10.0,
+                 pool_size=10, sleep=time.sleep, clock=time.monotonic):
+        self.limiter_factory = limiter_factory
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.sleep = sleep
+        self.clock = clock
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _limiter(self, url):
+        if self.limiter_factory is None:
+            return None
+        host = urllib.parse.urlsplit(url).netloc.lower()
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = self._limiters[host] = self.limiter_factory(host)
+            return limiter
+
+    def post(self, url, payload, headers=None, retries=None):
+        """POST payload as JSON and return the response; raises once retries are exhausted
+        
+        retries overrides the notifier's own for this post; 0 leaves retrying to the caller.
+        """
+        if retries is None:
+            retries = self.retries
+        limiter = self._limiter(url)
+        attempt = 0
+        while True:
+            if limiter is not None:
+                limiter.acquire()
+            start = self.clock()
+            try:
+                response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                response = None
+                if attempt >= retries:
+                    raise
+            finally:
+                self._record(self.clock() - start)
+            if response is not None and response.status_code not in self.RETRY_STATUSES:
+                response.raise_for_status()
+                return response
+            
+            delay = retry_after_seconds(response) if response is not None else None
+            if delay is None:
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+            if attempt >= retries or delay > self.max_backoff:
+                response.raise_for_status()
+            attempt += 1
+            with self._lock:
+                self.retried += 1
+            self.sleep(delay)
+
+    def post_many(self, posts):
+        """Send (url, payload, headers) posts concurrently; returns a response or exception per post"""
+        posts = list(posts)
+        if len(posts) <= 1:
+            workers = 1
+        else:
+            workers = min(len(posts), self.pool_size)
+        
+        def send(post):
+            try:
+                return self.post(*post)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(send, posts))
+
+    def _record(self, latency):
+        with self._lock:
+            self.requests += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def stats(self):
+        """Request and retry counts and per-request latency"""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retried,
+                'latency_avg': self.latency_total / self.requests if self.requests else 0.0,
+                'latency_max': self.latency_max,
+            }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,421 @@
+"""
+HTML parser backends for the tracker listing extractor.
+
+The extractor in tracker_monitor.py only needs a handful of tree operations: find the post
+containers, get the text of a node, and find descendants by class substring. scan() does the
+last two in one traversal of a post. Each backend implements those on top of a different
+parsing library, and all backends must produce the same tracker dicts as the original
+BeautifulSoup/html.parser code.
+"""
+
+import re
+from bs4 import BeautifulSoup, SoupStrainer, Tag, UnicodeDammit
+
+try:
+    from bs4.filter import ElementFilter
+except ImportError:
+    # BeautifulSoup < 4.13 filters through SoupStrainer name functions instead
+    ElementFilter = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    # lxml is optional, the BeautifulSoup backend is used without it
+    lxml = None
+    etree = None
+
+# Selectors tried in order when looking for the pagination block
+PAGINATION_SELECTORS = [
+    '.multinav',       # From debug output, this appears to be the pagination class
+    'nav.navigation',  # Common class for navigation
+    '.pagination',     # Common class name
+    '.pager',          # Another common class
+    'nav',             # Generic nav tag
+    '.wp-pagenavi'     # WordPress pagination
+]
+
+# Categories looked for in the post text when building a tracker's tags
+DEFAULT_COMMON_TAGS = ['general', 'hd', 'uhd', '4k', 'movies', 'tv', 'music', 'games', 'xxx', 'anime', 'porn', 'sports', '0day', 'gay', 'limited signup']
+
+# "NAME (ABBR) IS OPEN FOR LIMITED SIGNUP!"
+SIGNUP_RE = re.compile(r'([^(]+)\s*\(([^)]+)\)\s+IS OPEN FOR LIMITED SIGNUP!', re.IGNORECASE)
+# Fallback date formats, tried in order
+DATE_RES = [
+    re.compile(r'(\w{3}\s+\d{1,2}\s+\d{4})', re.IGNORECASE),  # Jan 15 2026
+    re.compile(r'(\d{1,2}\s+\w{3}\s+\d{4})', re.IGNORECASE),  # 15 Jan 2026
+    re.compile(r'(\w{3}\.\s+\d{1,2},?\s+\d{4})', re.IGNORECASE),  # Jan. 15, 2026
+]
+# "(ABBR) is a ..." - the name in front of it is checked without compiling a pattern per tracker
+DESCRIPTION_RE = re.compile(r'\(([^)]*)\)\s+is a\s+([^.]*?)(?:\n|$)', re.IGNORECASE | re.DOTALL)
+
+POST_TAGS = ['div', 'article']
+POST_CLASSES = ['post', 'hentry']
+_POST_CLASS_SET = frozenset(POST_CLASSES)
+PAGINATION_CLASSES = frozenset(['multinav', 'navigation', 'pagination', 'pager', 'wp-pagenavi'])
+
+
+def keep_subtree(name, attrs):
+    """Whether a restricted parse keeps the element (and everything inside it)
+    
+    Everything the extractor looks at lives in a post container, a pagination block or a
+    numbered page link, so those are the only subtrees built.
+    """
+    if name == 'nav':
+        return True
+    if name == 'a':
+        return '/page/' in (attrs.get('href') or '')
+    classes = attrs.get('class') or ''
+    if not isinstance(classes, str):
+        classes = ' '.join(classes)
+    if name in POST_TAGS and any(cls in classes for cls in POST_CLASSES):
+        return True
+    return not PAGINATION_CLASSES.isdisjoint(classes.split())
+
+
+if ElementFilter is not None:
+    class _RestrictedParseFilter(ElementFilter):
+        """Parse filter building only the subtrees accepted by keep_subtree()"""
+
+        def allow_tag_creation(self, nsprefix, name, attrs):
+            return keep_subtree(name, attrs or {})
+
+        def allow_string_creation(self, string):
+            return False
+
+    def restricted_parse_filter():
+        return _RestrictedParseFilter()
+else:
+    def restricted_parse_filter():
+        return SoupStrainer(lambda name, attrs=None: keep_subtree(name, attrs or {}))
+
+
+class PatternEngine:
+    """Precompiled text patterns used to pull tracker fields out of a post's text"""
+
+    def __init__(self, common_tags=None):
+        self.common_tags = list(DEFAULT_COMMON_TAGS if common_tags is None else common_tags)
+
+    def match_title(self, text):
+        """(name, abbreviation) of a signup announcement, or None"""
+        match = SIGNUP_RE.search(text)
+        if match is None:
+            return None
+        return match.group(1).strip(), match.group(2).strip()
+
+    def count_titles(self, text, limit=2):
+        """Number of signup announcements in the text, counting no further than limit"""
+        count = 0
+        for _ in SIGNUP_RE.finditer(text):
+            count += 1
+            if count >= limit:
+                break
+        return count
+
+    def find_date(self, text):
+        """First date found by the fallback formats, or None"""
+        for pattern in DATE_RES:
+            match = pattern.search(text)
+            if match:
+                return match.group(1)
+        return None
+
+    def find_description(self, text, name, abbreviation):
+        """Raw text following "Name (Abbr) is a", up to the end of the line, or None"""
+        if not name or not (name + abbreviation).isascii():
+            # Case-insensitive comparison below matches the regex only for ASCII names
+            pattern = rf'{re.escape(name)}\s+\({re.escape(abbreviation)}\)\s+is a\s+([^.]*?)(?:\n|$)'
+            match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+            return match.group(1) if match else None
+        
+        name_lower = name.lower()
+        abbreviation_lower = abbreviation.lower()
+        position = 0
+        while True:
+            match = DESCRIPTION_RE.search(text, position)
+            if match is None:
+                return None
+            start = match.start()
+            if match.group(1).lower() == abbreviation_lower:
+                # The name must end right before the whitespace run in front of "("
+                name_end = start
+                while name_end > 0 and text[name_end - 1].isspace():
+                    name_end -= 1
+                name_start = name_end - len(name)
+                if name_end < start and name_start >= 0 and text[name_start:name_end].lower() == name_lower:
+                    return match.group(2)
+            position = start + 1
+
+    def find_tags(self, text_lower):
+        """Common tags mentioned in the (lowercased) text, in configured order"""
+        return [tag for tag in self.common_tags if tag in text_lower]
+
+
+class Bs4Backend:
+    """BeautifulSoup backend, matching the original extractor exactly
+    
+    With restricted_parse only the post containers and pagination are built into the tree;
+    sidebars, scripts and footers are skipped while parsing.
+    """
+
+    name = 'bs4'
+
+    def __init__(self, restricted_parse=False, features='html.parser'):
+        self.restricted_parse = restricted_parse
+        self.features = features
+
+    def parse(self, content):
+        if self.restricted_parse:
+            return BeautifulSoup(content, self.features, parse_only=restricted_parse_filter())
+        return BeautifulSoup(content, self.features)
+
+    def find_posts(self, document):
+        return document.find_all(POST_TAGS, class_=lambda x: x and any(cls in x for cls in POST_CLASSES))
+
+    def text(self, node):
+        return node.get_text()
+
+    def ancestors(self, node):
+        return node.parents
+
+    def is_post(self, node):
+        """Whether a post container is a post itself rather than a part of or a wrapper around posts"""
+        return not _POST_CLASS_SET.isdisjoint(node.get('class') or ())
+
+    def scan(self, node, first_classes=(), all_tags=(), all_classes=()):
+        """Text of a node and of descendants picked by class, in one traversal
+        
+        Returns (text, firsts, matches): firsts holds, for each list of substrings in
+        first_classes, the text of the node find_by_class would return (None without one), and
+        matches the texts of the nodes find_all_by_class(node, all_tags, all_classes) returns.
+        """
+        types = node.interesting_string_types
+        if isinstance(types, type):
+            types = (types,)
+        all_tags = frozenset(all_tags)
+        parts = []
+        firsts = [None] * len(first_classes)
+        matches = []
+        
+        def visit(element):
+            for child in element.contents:
+                if not isinstance(child, Tag):
+                    if types is None or type(child) in types:
+                        parts.append(child)
+                    continue
+                span = None
+                classes = child.get('class')
+                if classes:
+                    if not isinstance(classes, str):
+                        classes = ' '.join(classes)
+                    for index, substrings in enumerate(first_classes):
+                        if firsts[index] is None and any(cls in classes for cls in substrings):
+                            span = span or [child, len(parts), None]
+                            firsts[index] = span
+                    if child.name in all_tags and any(cls in classes.lower() for cls in all_classes):
+                        span = span or [child, len(parts), None]
+                        matches.append(span)
+                visit(child)
+                if span is not None:
+                    span[2] = len(parts)
+        
+        visit(node)
+        
+        def span_text(span):
+            element, start, end = span
+            if element.interesting_string_types != node.interesting_string_types:
+                # A script or style picks different strings than the post it is in
+                return element.get_text()
+            return ''.join(parts[start:end])
+        
+        return (''.join(parts), [None if span is None else span_text(span) for span in firsts],
+                [span_text(span) for span in matches])
+
+    def find_by_class(self, node, substrings):
+        """First descendant whose class contains any of the substrings"""
+        return node.find(class_=lambda x: x and any(cls in x for cls in substrings))
+
+    def find_all_by_class(self, node, tag_names, substrings):
+        """Descendants with one of the tag names whose lowercased class contains any of the substrings"""
+        return node.find_all(tag_names, class_=lambda x: x and any(cls in x.lower() for cls in substrings))
+
+    def pagination_hrefs(self, document):
+        """Link targets inside the first pagination block found, or None without one"""
+        for selector in PAGINATION_SELECTORS:
+            pagination = document.select_one(selector)
+            if pagination:
+                return [link['href'] for link in pagination.find_all('a', href=True)]
+        return None
+
+    def link_hrefs(self, document):
+        return [link['href'] for link in document.find_all('a', href=True)]
+
+
+# Text inside these tags is not part of get_text() in BeautifulSoup
+_NON_TEXT_TAGS = frozenset(['script', 'style', 'template', 'rp', 'rt'])
+# Whitespace-only strings are collapsed by BeautifulSoup except inside these tags
+_PRESERVE_WHITESPACE_TAGS = frozenset(['pre', 'textarea'])
+_ASCII_SPACES = re.compile(r'[\x20\x0a\x09\x0c\x0d]+\Z')
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def _css_to_xpath(selector):
+    """Compile a simple 'tag', '.class' or 'tag.class' selector to XPath"""
+    tag, _, cls = selector.partition('.')
+    xpath = f"//{tag or '*'}"
+    if cls:
+        xpath += f"[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
+    return etree.XPath(xpath)
+
+
+def _class_contains(substrings, lower=False):
+    attr = '@class'
+    if lower:
+        attr = "translate(@class, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')"
+    return ' or '.join(f"contains({attr}, '{cls}')" for cls in substrings)
+
+
+class LxmlBackend:
+    """lxml backend using precompiled XPath selectors
+    
+    lxml always builds the whole document; its tree lives in C and is cheap enough that
+    restricted_parse is accepted only for interface compatibility.
+    """
+
+    name = 'lxml'
+
+    def __init__(self, restricted_parse=False):
+        if lxml is None:
+            raise ImportError("The lxml parser backend requires the lxml package")
+        tags = ' or '.join(f'self::{tag}' for tag in POST_TAGS)
+        self._posts = etree.XPath(f"//*[{tags}][{_class_contains(POST_CLASSES)}]")
+        self._pagination = [_css_to_xpath(selector) for selector in PAGINATION_SELECTORS]
+        self._links = etree.XPath('.//a[@href]/@href')
+        self._by_class = {}
+
+    def parse(self, content):
+        # Decode the way BeautifulSoup does so both backends see the same text
+        if isinstance(content, bytes):
+            content = UnicodeDammit(content, is_html=True).unicode_markup
+        return lxml.html.document_fromstring(content)
+
+    def find_posts(self, document):
+        return self._posts(document)
+
+    def ancestors(self, node):
+        return node.iterancestors()
+
+    def is_post(self, node):
+        """Whether a post container is a post itself rather than a part of or a wrapper around posts"""
+        return not _POST_CLASS_SET.isdisjoint(node.get('class', '').split())
+
+    @staticmethod
+    def _text_flags(node):
+        """Whether the node's text is skipped and its whitespace kept, going by its ancestors"""
+        skip = False
+        preserve = False
+        for ancestor in node.iterancestors():
+            skip = skip or ancestor.tag in _NON_TEXT_TAGS
+            preserve = preserve or ancestor.tag in _PRESERVE_WHITESPACE_TAGS
+        return skip, preserve
+
+    def text(self, node):
+        """Equivalent of BeautifulSoup's get_text() for an lxml element"""
+        skip, preserve = self._text_flags(node)
+        parts = []
+        self._collect_text(node, parts, skip, preserve)
+        return ''.join(parts)
+
+    def scan(self, node, first_classes=(), all_tags=(), all_classes=()):
+        """Text of a node and of descendants picked by class, in one traversal; see Bs4Backend.scan"""
+        all_tags = frozenset(all_tags)
+        parts = []
+        firsts = [None] * len(first_classes)
+        matches = []
+        
+        def visit(element, skip, preserve, descendant):
+            skip = skip or element.tag in _NON_TEXT_TAGS
+            preserve = preserve or element.tag in _PRESERVE_WHITESPACE_TAGS
+            span = None
+            classes = element.get('class') if descendant else None
+            if classes:
+                for index, substrings in enumerate(first_classes):
+                    if firsts[index] is None and any(cls in classes for cls in substrings):
+                        span = span or [len(parts), None]
+                        firsts[index] = span
+                # XPath's translate() only lowercases ASCII
+                if element.tag in all_tags and any(cls in classes.translate(_ASCII_LOWER) for cls in all_classes):
+                    span = span or [len(parts), None]
+                    matches.append(span)
+            if element.text and not skip:
+                parts.append(self._string(element.text, preserve))
+            for child in element:
+                if isinstance(child.tag, str):
+                    visit(child, skip, preserve, True)
+                if child.tail and not skip:
+                    parts.append(self._string(child.tail, preserve))
+            if span is not None:
+                span[1] = len(parts)
+        
+        visit(node, *self._text_flags(node), False)
+        return (''.join(parts), [None if span is None else ''.join(parts[span[0]:span[1]]) for span in firsts],
+                [''.join(parts[start:end]) for start, end in matches])
+
+    def _collect_text(self, node, parts, skip, preserve):
+        skip = skip or node.tag in _NON_TEXT_TAGS
+        preserve = preserve or node.tag in _PRESERVE_WHITESPACE_TAGS
+        if node.text and not skip:
+            parts.append(self._string(node.text, preserve))
+        for child in node:
+            # Comments and processing instructions have no text of their own, only tails
+            if isinstance(child.tag, str):
+                self._collect_text(child, parts, skip, preserve)
+            if child.tail and not skip:
+                parts.append(self._string(child.tail, preserve))
+
+    @staticmethod
+    def _string(value, preserve):
+        if not preserve and _ASCII_SPACES.match(value):
+            return '\n' if '\n' in value else ' '
+        return value
+
+    def _selector(self, key, xpath):
+        selector = self._by_class.get(key)
+        if selector is None:
+            selector = self._by_class[key] = etree.XPath(xpath)
+        return selector
+
+    def find_by_class(self, node, substrings):
+        selector = self._selector(('first', tuple(substrings)), f"(.//*[{_class_contains(substrings)}])[1]")
+        matches = selector(node)
+        return matches[0] if matches else None
+
+    def find_all_by_class(self, node, tag_names, substrings):
+        tags = ' or '.join(f'self::{tag}' for tag in tag_names)
+        key = ('all', tuple(tag_names), tuple(substrings))
+        return self._selector(key, f".//*[{tags}][{_class_contains(substrings, lower=True)}]")(node)
+
+    def pagination_hrefs(self, document):
+        for selector in self._pagination:
+            matches = selector(document)
+            if matches:
+                return self._links(matches[0])
+        return None
+
+    def link_hrefs(self, document):
+        return self._links(document)
+
+
+PARSER_BACKENDS = {
+    'bs4': Bs4Backend,
+    'lxml': LxmlBackend,
+}
+
+
+def get_parser_backend(name='auto', restricted_parse=False):
+    """Create a parser backend by name; 'auto' prefers lxml and falls back to BeautifulSoup"""
+    if name == 'auto':
+        name = 'lxml' if lxml is not None else 'bs4'
+    if name not in PARSER_BACKENDS:
+        raise ValueError(f"Unknown parser backend: {name}")
+    return PARSER_BACKENDS[name](restricted_parse=restricted_parse)
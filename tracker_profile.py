@@ -0,0 +1,154 @@
+"""
+Per-stage profiling of monitoring cycles.
+
+CycleProfiler records wall and CPU time for each stage of a cycle (fetch, parse, pagination,
+extract, diff, notify) in total and per page, and can capture the extractor with cProfile and
+tracemalloc. report() returns everything as a JSON-serialisable dict, so runs can be compared
+by diffing the files written by `--profile`.
+
+CPU time is the thread's own (time.thread_time), so concurrent fetches are not charged for
+each other's work.
+"""
+
+import cProfile
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+CAPTURES = ('cprofile', 'tracemalloc')
+
+
+class CycleProfiler:
+    """Wall and CPU time per stage and per page, with optional capture of the extractor
+
+    capture lists any of 'cprofile' and 'tracemalloc'. Captured extractions run one at a time,
+    since both tools are process-wide; top limits the cProfile functions reported.
+    """
+
+    def __init__(self, capture=(), top=30):
+        unknown = set(capture) - set(CAPTURES)
+        if unknown:
+            raise ValueError(f"unknown profile capture: {', '.join(sorted(unknown))}")
+        self.capture = frozenset(capture)
+        self.top = top
+        self.stages = {}
+        self.pages = {}
+        self.cycles = 0
+        self.extract_peaks = {}
+        self._lock = threading.Lock()
+        self._capture_lock = threading.Lock()
+        self._cprofile = cProfile.Profile() if 'cprofile' in self.capture else None
+        self._started = datetime.now()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def _record(self, stage, url, wall, cpu):
+        with self._lock:
+            totals = self.stages.setdefault(stage, {'count': 0, 'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+            totals['count'] += 1
+            totals['wall_seconds'] += wall
+            totals['cpu_seconds'] += cpu
+            if url is not None:
+                page = self.pages.setdefault(url, {}).setdefault(stage, {'wall_seconds': 0.0, 'cpu_seconds': 0.0})
+                page['wall_seconds'] += wall
+                page['cpu_seconds'] += cpu
+            if stage == 'cycle':
+                self.cycles += 1
+
+    @contextmanager
+    def stage(self, stage, url=None, capture=False):
+        """Time the enclosed block as one run of a stage, for a page when url is given"""
+        if capture and self.capture:
+            with self._capture_lock, self._captured(url):
+                with self._timed(stage, url):
+                    yield
+            return
+        with self._timed(stage, url):
+            yield
+
+    @contextmanager
+    def _timed(self, stage, url):
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield
+        finally:
+            self._record(stage, url, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+    @contextmanager
+    def _captured(self, url):
+        tracing = 'tracemalloc' in self.capture
+        if tracing:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        try:
+            yield
+        finally:
+            if self._cprofile is not None:
+                self._cprofile.disable()
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                if started_tracing:
+                    tracemalloc.stop()
+                with self._lock:
+                    self.extract_peaks[url] = max(self.extract_peaks.get(url, 0), peak)
+
+    def cprofile_functions(self):
+        """The top functions of the captured extractor runs by cumulative time"""
+        if self._cprofile is None:
+            return None
+        stats = pstats.Stats(self._cprofile)
+        functions = []
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            functions.append({'function': f"{filename}:{line}({name})", 'calls': calls,
+                              'tottime': tottime, 'cumtime': cumtime})
+        functions.sort(key=lambda function: function['cumtime'], reverse=True)
+        return functions[:self.top]
+
+    def report(self, notifications=None):
+        """Everything recorded so far, with the notification delivery stats if given"""
+        with self._lock:
+            report = {
+                'started': self._started.isoformat(timespec='seconds'),
+                'wall_seconds': time.perf_counter() - self._wall_start,
+                'cpu_seconds': time.process_time() - self._cpu_start,
+                'cycles': self.cycles,
+                'stages': {stage: dict(totals) for stage, totals in self.stages.items()},
+                'pages': {url: {stage: dict(times) for stage, times in stages.items()}
+                          for url, stages in self.pages.items()},
+            }
+            extract_peaks = dict(self.extract_peaks)
+        if self.capture:
+            report['extractor'] = {}
+            if self._cprofile is not None:
+                report['extractor']['cprofile'] = self.cprofile_functions()
+            if 'tracemalloc' in self.capture:
+                report['extractor']['tracemalloc'] = {
+                    'peak_bytes': max(extract_peaks.values(), default=0),
+                    'pages': extract_peaks,
+                }
+        if notifications is not None:
+            report['notifications'] = notifications
+        return report
+
+    def write(self, filename, notifications=None):
+        """Write the report as JSON"""
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(self.report(notifications), f, indent=2)
+
+    def summary(self):
+        """One line per stage, slowest first, for the console"""
+        lines = []
+        for stage, totals in sorted(self.stages.items(), key=lambda item: item[1]['wall_seconds'], reverse=True):
+            lines.append(f"{stage}: {totals['count']} runs, {totals['wall_seconds']:.3f}s wall, "
+                         f"{totals['cpu_seconds']:.3f}s CPU")
+        return lines
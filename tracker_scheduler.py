@@ -1,46 +1,255 @@
-import schedule
+import argparse
+import math
+import random
+import signal
+import sys
 import time
-from tracker_monitor import main
+from datetime import datetime
+from tracker_monitor import add_profile_arguments, check_for_new_trackers, create_monitor, load_config, shutdown_monitor, write_profile
+from tracker_state import SQLiteStateStore
 import logging
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler('tracker_monitor.log'),
-        logging.StreamHandler()
-    ]
-)
-
-def run_tracker_monitor():
-    """Run the tracker monitor and log the result"""
+def setup_logging():
+    """Log to tracker_monitor.log and the console"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s [%(levelname)s] %(message)s',
+        handlers=[
+            logging.FileHandler('tracker_monitor.log'),
+            logging.StreamHandler()
+        ]
+    )
+
+def run_tracker_monitor(monitor, state, config):
+    """Run one monitoring cycle on the long-lived monitor and log the result; returns the new trackers"""
     try:
         logging.info("Starting tracker monitoring cycle...")
-        main()
+        new_trackers = check_for_new_trackers(monitor, digest_config=config['digest'], state=state)
         logging.info("Tracker monitoring cycle completed")
+        return new_trackers
     except Exception as e:
         logging.error(f"Error during tracker monitoring: {str(e)}")
+        return []
 
-# Schedule the monitor to run every hour
-schedule.every().hour.do(run_tracker_monitor)
+def week_slot(timestamp):
+    """Hour of the week (0 = Monday 00:00-01:00, local time) of a timestamp"""
+    moment = datetime.fromtimestamp(timestamp)
+    return moment.weekday() * 24 + moment.hour
 
-# Alternative: Run every 30 minutes
-# schedule.every(30).minutes.do(run_tracker_monitor)
+class FixedInterval:
+    """Polling policy checking every interval seconds"""
+    
+    def __init__(self, interval):
+        self.interval = interval
+    
+    def learn(self, post_times):
+        pass
+    
+    def observe_new(self, now):
+        pass
+    
+    def next_interval(self, now):
+        return self.interval
 
-# Alternative: Run at specific times
-# schedule.every().day.at("09:00").do(run_tracker_monitor)
-# schedule.every().day.at("15:00").do(run_tracker_monitor)
-# schedule.every().day.at("21:00").do(run_tracker_monitor)
+class AdaptiveInterval:
+    """Polling policy following how often trackers are posted in each hour of the week
+    
+    learn() counts first_seen times per hour of the week. Checks are spread in proportion to
+    sqrt(rate), which spends a given number of checks where they cut detection latency the
+    most, and as many are made per week as every interval seconds would. Each interval is kept
+    between min_interval and max_interval (seconds) and spread by +/- jitter. For boost seconds
+    after a new post has been seen it polls at min_interval, since signups often come in
+    bursts; that costs extra checks and is off by default. Until there is any history to learn
+    from the base interval is used.
+    """
+    
+    def __init__(self, interval=3600, min_interval=600, max_interval=7200, jitter=0.1, boost=0,
+                 smoothing=0.1, pooling=0.75, rng=None):
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.boost = boost
+        self.smoothing = smoothing
+        self.pooling = pooling
+        self.rng = rng or random.Random()
+        self.rates = [0.0] * 168  # Posts per hour, by hour of the week
+        self.boosted_until = None
+    
+    def learn(self, post_times):
+        """Estimate posting rates from the times trackers were first seen"""
+        post_times = sorted(post_times)
+        if not post_times:
+            self.rates = [0.0] * 168
+            return
+        weeks = max(1.0, (post_times[-1] - post_times[0]) / (7 * 24 * 3600))
+        counts = [0] * 168
+        for timestamp in post_times:
+            counts[week_slot(timestamp)] += 1
+        # Few posts land in any one hour of the week, so each hour is blended with the same hour
+        # on the other days (pooling) and with the overall rate (smoothing)
+        daily = [sum(counts[day * 24 + hour] for day in range(7)) / 7 for hour in range(24)]
+        mean = len(post_times) / 168
+        own = 1 - self.pooling - self.smoothing
+        self.rates = [(own * count + self.pooling * daily[slot % 24] + self.smoothing * mean) / weeks
+                      for slot, count in enumerate(counts)]
+    
+    def observe_new(self, now):
+        self.boosted_until = now + self.boost
+    
+    def next_interval(self, now):
+        if self.boosted_until is not None and now < self.boosted_until:
+            interval = self.min_interval
+        elif not any(self.rates):
+            interval = self.interval
+        else:
+            interval = self._spread(now)
+        interval *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+        return min(self.max_interval, max(self.min_interval, interval))
 
-if __name__ == "__main__":
-    print("Tracker Monitor Scheduler Started")
-    print("Checks will run every hour. Press Ctrl+C to stop.")
+    def _spread(self, now):
+        """Time until the next check with checks spread in proportion to sqrt(rate)
+        
+        Each check is worth interval seconds of an average hour's sqrt(rate); the hours ahead
+        are walked until that is used up, so a check in a quiet hour before a busy one is not
+        put off past its start.
+        """
+        weights = [math.sqrt(rate) for rate in self.rates]
+        budget = self.interval * sum(weights) / len(weights)
+        elapsed = 0.0
+        while budget > 0 and elapsed < self.max_interval:
+            moment = datetime.fromtimestamp(now + elapsed)
+            left = 3600 - (moment.minute * 60 + moment.second + moment.microsecond / 1e6)
+            weight = weights[week_slot(now + elapsed)]
+            step = left if weight == 0 else min(left, budget / weight)
+            budget -= step * weight
+            elapsed += step
+        return elapsed
+
+def schedule_policy(schedule_config):
+    """The polling policy for config.json's schedule section"""
+    if not schedule_config.get('adaptive', False):
+        return FixedInterval(max(1, schedule_config.get('interval_minutes', 60)) * 60)
+    return AdaptiveInterval(
+        interval=max(1, schedule_config.get('interval_minutes', 60)) * 60,
+        min_interval=schedule_config.get('min_interval_minutes', 10) * 60,
+        max_interval=schedule_config.get('max_interval_minutes', 120) * 60,
+        jitter=schedule_config.get('jitter', 0.1),
+        boost=schedule_config.get('boost_minutes', 0) * 60)
+
+def learning_times(state, now, history_days=56):
+    """first_seen times to learn posting rates from, leaving out the bulk of the very first scan"""
+    times = state.first_seen_times()
+    if not times:
+        return []
+    # Everything found by the first scan (or imported by it) shares its first_seen, since a cycle
+    # stamps all its pages with one time, whenever the trackers were actually posted
+    initial = times[0]
+    since = now - history_days * 24 * 3600
+    return [timestamp for timestamp in times if timestamp >= since and timestamp != initial]
+
+def simulate_polling(post_times, policy, start, end):
+    """Replay post times against a polling policy between start and end
+    
+    Returns the number of checks and how long posts waited to be detected (seconds).
+    """
+    post_times = sorted(timestamp for timestamp in post_times if start <= timestamp < end)
+    latencies = []
+    checks = 0
+    pending = 0
+    now = start
+    while now < end:
+        checks += 1
+        found = 0
+        while pending < len(post_times) and post_times[pending] <= now:
+            latencies.append(now - post_times[pending])
+            pending += 1
+            found += 1
+        if found:
+            policy.observe_new(now)
+        now += policy.next_interval(now)
+    latencies.sort()
+    return {
+        'checks': checks,
+        'posts': len(post_times),
+        'detected': len(latencies),
+        'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+        'latency_p95': latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        'latency_max': latencies[-1] if latencies else 0.0,
+    }
+
+def next_run_after(last_run, interval, now):
+    """Next slot on the fixed schedule after now, skipping slots missed while a cycle overran"""
+    next_run = last_run + interval
+    if next_run <= now:
+        next_run += ((now - next_run) // interval + 1) * interval
+    return next_run
+
+def run_daemon(config, cycles=None, clock=time.time, sleep=time.sleep, policy=None, profile=None, profile_capture=()):
+    """Check on schedule with one monitor kept for the life of the process
+    
+    The monitor's HTTP session, validator cache, SMTP and webhook connections and the open state
+    store are reused by every cycle, and the process sleeps until the next run is due. A fixed
+    schedule.interval_minutes keeps runs on a fixed grid; with schedule.adaptive the interval is
+    relearned from first_seen times after every check. cycles limits the number of checks
+    (forever by default). With a profile filename the profile report, covering every cycle so
+    far, is rewritten after each check.
+    """
+    policy = policy or schedule_policy(config['schedule'])
+    monitor = create_monitor(config)
+    if profile:
+        monitor.enable_profiling(profile_capture)
+    try:
+        with SQLiteStateStore('trackers.db') as state:
+            run = clock()
+            completed = 0
+            while cycles is None or completed < cycles:
+                delay = run - clock()
+                if delay > 0:
+                    sleep(delay)
+                new_trackers = run_tracker_monitor(monitor, state, config)
+                completed += 1
+                if profile:
+                    write_profile(monitor, profile, monitor.dispatcher.stats() if monitor.dispatcher else None)
+                now = clock()
+                if isinstance(policy, FixedInterval):
+                    run = next_run_after(run, policy.interval, now)
+                    continue
+                if new_trackers:
+                    policy.observe_new(now)
+                policy.learn(learning_times(state, now))
+                interval = policy.next_interval(now)
+                logging.info(f"Next check in {interval / 60:.0f} minutes")
+                run = now + interval
+    finally:
+        delivery_stats = shutdown_monitor(monitor)
+        if profile:
+            write_profile(monitor, profile, delivery_stats)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check opentrackers.org for new tracker signups on a schedule")
+    parser.add_argument('--config', default='config.json',
+                        help="settings file written by the setup wizard (default: config.json)")
+    parser.add_argument('--once', action='store_true', help="run a single check and exit")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
     
-    # Run once immediately when starting
-    run_tracker_monitor()
+    setup_logging()
+    config = load_config(args.config)
+    # Let systemd's SIGTERM deliver queued notifications and close connections before exiting
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     
-    # Keep the script running
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check for scheduled tasks every minute
\ No newline at end of file
+    print("Tracker Monitor Scheduler Started")
+    if not args.once:
+        if config['schedule'].get('adaptive', False):
+            print("Checks will run on an adaptive schedule. Press Ctrl+C to stop.")
+        else:
+            print(f"Checks will run every {config['schedule'].get('interval_minutes', 60)} minutes. Press Ctrl+C to stop.")
+    try:
+        run_daemon(config, cycles=1 if args.once else None, profile=args.profile,
+                   profile_capture=args.profile_capture)
+    except KeyboardInterrupt:
+        print("Tracker Monitor Scheduler stopped")
+
+if __name__ == "__main__":
+    main()
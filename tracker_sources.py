@@ -0,0 +1,232 @@
+"""
+Sites the monitor watches for tracker signups.
+
+A source describes one site: the URL of each listing page, how to find out how many pages
+there are, and how to pull tracker dicts out of a parsed page. TrackerMonitor crawls every
+configured source concurrently, each host under its own rate limit, and feeds what they find
+into one diff and notification pipeline.
+
+OpenTrackersSource is the opentrackers.org listing. Other sites are added by subclassing
+TrackerSource and registering the class in SOURCE_TYPES, or by naming it as 'module:Class' in
+a source's 'type'.
+"""
+
+import importlib
+import re
+from abc import ABC, abstractmethod
+
+
+class TrackerSource(ABC):
+    """Interface of a tracker announcement site
+
+    Sources are configured with a dict holding 'name', 'base_url', 'max_pages' (listing pages
+    read per check) and anything else the source type needs, kept in self.config.
+    """
+
+    type = None
+    default_base_url = None
+
+    def __init__(self, config, parser, patterns):
+        self.config = config
+        self.name = config.get('name') or self.type
+        self.base_url = (config.get('base_url') or self.default_base_url).rstrip('/')
+        self.max_pages = max(1, int(config.get('max_pages', 5)))
+        self.parser = parser
+        self.patterns = patterns
+
+    @abstractmethod
+    def page_url(self, page):
+        """URL of a listing page, numbered from 1"""
+
+    @abstractmethod
+    def find_max_page(self, tree):
+        """Highest page number found in a parsed listing page, 1 without pagination"""
+
+    @abstractmethod
+    def extract_trackers(self, tree):
+        """Tracker dicts announced on a parsed listing page"""
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, {self.base_url!r})"
+
+
+class OpenTrackersSource(TrackerSource):
+    """The opentrackers.org listing: WordPress posts with /page/N pagination"""
+
+    type = 'opentrackers'
+    default_base_url = "https://opentrackers.org"
+
+    def page_url(self, page):
+        """URL of a listing page"""
+        if page > 1:
+            return f"{self.base_url}/page/{page}"
+        return f"{self.base_url}/"
+    
+    # Date parts looked up in a post: any date element, then the day, month and year
+    DATE_CLASSES = [['post-date', 'post-day', 'post-month', 'post-year'], ['post-day'], ['post-month'], ['post-year']]
+    # Elements holding a post's tags and categories
+    TAG_ELEMENTS = ['span', 'a', 'div', 'p']
+    TAG_CLASSES = ['tag', 'category', 'post-tags']
+    
+    def iter_posts(self, tree):
+        """(element, text, dates, tags) of each post container, with every announcement read once
+        
+        Based on the debug output, posts are div/article elements with class 'post' or 'hentry'.
+        That also matches wrappers nested in a post (post-date, post-content, post-tags) and
+        listing wrappers around posts (class "posts"). A match with a post among its descendants
+        (class 'post' or 'hentry' itself, not part of a longer name) is a listing wrapper and is
+        passed over, even around a single signup, as its date parts may belong to other posts.
+        Of the rest the outermost match holding at most one signup title is taken as the post and
+        everything inside it is skipped unread; one holding several titles is passed over too.
+        
+        Each container is read in a single traversal, which also picks up the text of its
+        DATE_CLASSES elements (None where missing) and of its tag elements.
+        """
+        parser = self.parser
+        # id()s below are of matches, kept alive by this list (lxml elements are proxies)
+        candidates = parser.find_posts(tree)
+        matched = {id(element) for element in candidates}
+        wrappers = set()
+        for element in candidates:
+            if parser.is_post(element):
+                for ancestor in parser.ancestors(element):
+                    if id(ancestor) in wrappers:
+                        break
+                    if id(ancestor) in matched:
+                        wrappers.add(id(ancestor))
+        posts = set()  # Containers taken as posts
+        for element in candidates:
+            if id(element) in wrappers or any(id(ancestor) in posts for ancestor in parser.ancestors(element)):
+                continue
+            text_content, dates, tags = parser.scan(element, self.DATE_CLASSES, self.TAG_ELEMENTS, self.TAG_CLASSES)
+            if self.patterns.count_titles(text_content) > 1:
+                continue
+            posts.add(id(element))
+            yield element, text_content, dates, tags
+    
+    def extract_trackers(self, tree):
+        """Extract tracker entries from a listing page parsed by self.parser"""
+        patterns = self.patterns
+        
+        # Find all tracker entries
+        tracker_entries = []
+        # The same listing is only reported once per page
+        seen_keys = set()
+        
+        for _, text_content, dates, tag_texts in self.iter_posts(tree):
+            # Check if this element contains a tracker listing
+            # Look for the pattern "NAME (ABBR) IS OPEN FOR LIMITED SIGNUP!"
+            title_match = patterns.match_title(text_content)
+            
+            if title_match:
+                name, abbreviation = title_match
+                
+                # Look for date - dates appear in elements with class 'post-date', 'post-day', 'post-month', 'post-year'
+                date_text, day_text, month_text, year_text = dates
+                date = "Unknown date"
+                if date_text is not None:
+                    # Try to extract date from structured elements
+                    if day_text is not None and month_text is not None and year_text is not None:
+                        date = f"{month_text.strip()} {day_text.strip()} {year_text.strip()}"
+                    else:
+                        date = date_text.strip()
+                else:
+                    # Fallback to regex in text
+                    date = patterns.find_date(text_content) or date
+                
+                key = (name, date, abbreviation)
+                if key in seen_keys:
+                    continue
+                seen_keys.add(key)
+                
+                # Look for description - usually follows the pattern "Name (Abbr) is a ..."
+                description = patterns.find_description(text_content, name, abbreviation)
+                description = description.strip() if description is not None else "No description"
+                
+                # Clean up the description to remove extra whitespace and formatting
+                description = ' '.join(description.split())
+                
+                # Look for tags - these are often in elements with class containing 'tag' or 'category'
+                tags = []
+                # Look for elements with tag-related classes
+                for tag_text in tag_texts:
+                    tag_text = tag_text.strip()
+                    if tag_text and len(tag_text) < 100 and tag_text not in ['Tags:', 'Categories:']:  # Avoid label text
+                        # Split by bullet character, middle dot, or other separators
+                        parts = [part.strip() for part in tag_text.replace('•', '|').replace('·', '|').replace('', '|').split('|')]
+                        tags.extend([part for part in parts if part and part.lower() not in ['tags:', 'categories:']])
+                
+                # Also look for tags in the text content by looking for common tracker categories
+                # These are often mentioned in the text
+                seen_tags = {tag.lower() for tag in tags}
+                for tag in patterns.find_tags(text_content.lower()):
+                    if tag not in seen_tags:
+                        tags.append(tag)
+                        seen_tags.add(tag)
+                
+                tracker_info = {
+                    'name': name,
+                    'abbreviation': abbreviation,
+                    'date': date,
+                    'description': description,
+                    'tags': tags,
+                    'full_text': text_content[:300]  # Store a snippet for comparison
+                }
+                
+                tracker_entries.append(tracker_info)
+        
+        return tracker_entries
+    
+    def find_max_page(self, tree):
+        """Find the highest page number linked from a listing page's pagination"""
+        # Look for pagination links - they might be in different structures
+        max_page = 1
+        
+        # Try the known pagination containers first, in order of preference
+        hrefs = self.parser.pagination_hrefs(tree) or []
+        for href in hrefs:
+            # Look for patterns like /page/2/, /page/3/, etc.
+            page_matches = re.findall(r'/page/(\d+)', href)
+            for page_num_str in page_matches:
+                try:
+                    page_num = int(page_num_str)
+                    max_page = max(max_page, page_num)
+                except ValueError:
+                    continue
+        
+        # If we didn't find pagination via selectors, try looking for page number links anywhere in the page
+        if max_page == 1:
+            # Look for any links that contain page numbers
+            for href in self.parser.link_hrefs(tree):
+                page_matches = re.findall(r'/page/(\d+)', href)
+                for page_num_str in page_matches:
+                    try:
+                        page_num = int(page_num_str)
+                        max_page = max(max_page, page_num)
+                    except ValueError:
+                        continue
+        
+        return max_page
+
+
+SOURCE_TYPES = {
+    'opentrackers': OpenTrackersSource,
+}
+
+
+def source_class(source_type):
+    """The class for a registered source type, or for a 'module:Class' plugin"""
+    if source_type in SOURCE_TYPES:
+        return SOURCE_TYPES[source_type]
+    module_name, _, class_name = source_type.partition(':')
+    if not class_name:
+        raise ValueError(f"Unknown tracker source type: {source_type}")
+    cls = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(cls, type) and issubclass(cls, TrackerSource)):
+        raise ValueError(f"{source_type} is not a TrackerSource")
+    return cls
+
+
+def create_source(config, parser, patterns):
+    """Create a source from its config dict; 'type' defaults to 'opentrackers'"""
+    return source_class(config.get('type', 'opentrackers'))(config, parser, patterns)
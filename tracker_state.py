@@ -0,0 +1,385 @@
+"""
+Persistent tracker state for the DAMIE Tracker Monitor.
+
+A state store remembers every tracker seen so far, so each cycle can tell which listings are
+genuinely new. SQLiteStateStore keeps them in an indexed SQLite table together with when each
+tracker was first and last seen and a fingerprint of its content, so updated listings can be
+told apart from unchanged ones. The old trackers.json file can be imported into it.
+
+In digest mode the store also buffers notification events between cycles, so several new
+trackers can be sent as one message.
+
+StateLock makes sure only one process at a time runs a cycle against a state store.
+"""
+
+import hashlib
+import json
+import sqlite3
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+TRACKER_FIELDS = ('name', 'abbreviation', 'date', 'description', 'tags', 'full_text')
+
+
+def tracker_fingerprint(tracker):
+    """Hash of the parts of a listing that change when it is updated: description and tags"""
+    get = tracker.get if isinstance(tracker, dict) else tracker.__getitem__
+    tags = get('tags')
+    content = json.dumps([get('description'), None if tags is None else list(tags)], ensure_ascii=False)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class StateLock:
+    """Exclusive lock on a file in the state directory, held while one instance crawls and notifies
+
+    The lock is an OS file lock (flock, or msvcrt.locking on Windows) rather than the file's
+    existence, so the OS releases it when the holder exits or crashes and the next instance
+    takes over without any cleanup. The holder writes its PID and start time into the file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = None
+
+    def acquire(self):
+        """Take the lock without waiting; returns False if another holder has it"""
+        if self._file is not None:
+            raise RuntimeError(f"{self.filename} is already locked by this StateLock")
+        f = open(self.filename, 'a+', encoding='utf-8')
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        # Whatever a crashed holder left behind is overwritten
+        f.seek(0)
+        f.truncate()
+        f.write(f"{os.getpid()} {time.time():.0f}\n")
+        f.flush()
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        f, self._file = self._file, None
+        try:
+            f.seek(0)
+            f.truncate()
+            f.flush()
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            f.close()
+
+    @property
+    def locked(self):
+        return self._file is not None
+
+    def holder(self):
+        """(pid, started) of the current holder as written into the lock file, or None"""
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                pid, started = f.read().split()
+            return int(pid), float(started)
+        except (OSError, ValueError):
+            return None
+
+
+class TrackerStateStore(ABC):
+    """Interface for the state kept between monitoring cycles"""
+
+    @abstractmethod
+    def known_trackers(self):
+        """All trackers seen so far, as tracker dicts"""
+
+    @abstractmethod
+    def diff(self, trackers, seen_at=None):
+        """Record a batch of scanned trackers and sort it into new, changed and unchanged ones
+
+        Returns a dict with a list for each of 'new', 'changed' and 'unchanged'.
+        """
+
+    def update(self, trackers, seen_at=None):
+        """Record a batch of scanned trackers and return the ones never seen before"""
+        return self.diff(trackers, seen_at)['new']
+
+    @abstractmethod
+    def contains(self, trackers):
+        """Whether every one of the trackers has been seen before"""
+
+    @abstractmethod
+    def first_seen_times(self):
+        """When each tracker was first seen, oldest first"""
+
+    @abstractmethod
+    def queue_events(self, trackers, event='new', queued_at=None):
+        """Buffer notification events; a tracker already pending for the event is not queued twice"""
+
+    @abstractmethod
+    def pending_events(self):
+        """Buffered events as (id, event, tracker dict, queued_at) tuples, oldest first"""
+
+    @abstractmethod
+    def clear_events(self, event_ids):
+        """Remove flushed events from the buffer"""
+
+    @abstractmethod
+    def resume_pages(self):
+        """Source name -> page the last crawl of each source did not get through"""
+
+    @abstractmethod
+    def set_resume_pages(self, pages):
+        """Replace the resume pages with those left unfinished by the latest crawl"""
+
+    def lock(self):
+        """A StateLock guarding this store across processes, or None when the state is not shared"""
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class SQLiteStateStore(TrackerStateStore):
+    """Tracker state in SQLite, with a unique index on (name, date, abbreviation)
+
+    contains() may be called from crawl threads while the cycle records pages; statements are
+    serialised on one connection, with each write transaction run as a whole.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS trackers (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            abbreviation TEXT NOT NULL,
+            description TEXT,
+            tags TEXT,
+            full_text TEXT,
+            fingerprint TEXT,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS trackers_identity ON trackers (name, date, abbreviation);
+        CREATE TABLE IF NOT EXISTS pending_events (
+            id INTEGER PRIMARY KEY,
+            event TEXT NOT NULL,
+            name TEXT NOT NULL,
+            date TEXT NOT NULL,
+            abbreviation TEXT NOT NULL,
+            tracker TEXT NOT NULL,
+            queued_at REAL NOT NULL
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS pending_events_identity ON pending_events (event, name, date, abbreviation);
+        CREATE TABLE IF NOT EXISTS resume_pages (
+            source TEXT PRIMARY KEY,
+            page INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, filename='trackers.db'):
+        self.filename = filename
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.RLock()
+        self.connection.executescript(self.SCHEMA)
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(trackers)")]
+        if 'fingerprint' not in columns:
+            # Databases created before fingerprints were stored
+            self.connection.execute("ALTER TABLE trackers ADD COLUMN fingerprint TEXT")
+
+    def close(self):
+        self.connection.close()
+
+    def lock(self):
+        """A StateLock on <filename>.lock next to the database; None for in-memory databases"""
+        if self.filename == ':memory:':
+            return None
+        return StateLock(self.filename + '.lock')
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM trackers").fetchone()[0]
+
+    @staticmethod
+    def _row(tracker, position, seen_at):
+        if not isinstance(tracker, dict):
+            tracker = tracker.to_dict()
+        tags = tracker.get('tags')
+        return (position, tracker['name'], tracker['date'], tracker['abbreviation'], tracker.get('description'),
+                None if tags is None else json.dumps(list(tags), ensure_ascii=False), tracker.get('full_text'),
+                tracker_fingerprint(tracker), seen_at)
+
+    @staticmethod
+    def _tracker(row):
+        name, date, abbreviation, description, tags, full_text = row[:6]
+        tracker = {'name': name, 'abbreviation': abbreviation, 'date': date}
+        if description is not None:
+            tracker['description'] = description
+        if tags is not None:
+            tracker['tags'] = json.loads(tags)
+        if full_text is not None:
+            tracker['full_text'] = full_text
+        return tracker
+
+    def known_trackers(self, include_seen=False):
+        """All trackers seen so far in the order they were first seen
+
+        With include_seen, each dict also carries its 'first_seen' and 'last_seen' timestamps.
+        """
+        rows = self.connection.execute(
+            "SELECT name, date, abbreviation, description, tags, full_text, first_seen, last_seen "
+            "FROM trackers ORDER BY id")
+        trackers = []
+        for row in rows:
+            tracker = self._tracker(row)
+            if include_seen:
+                tracker['first_seen'], tracker['last_seen'] = row[6], row[7]
+            trackers.append(tracker)
+        return trackers
+
+    def diff(self, trackers, seen_at=None):
+        """Upsert a batch of scanned trackers in one transaction and sort it into new, changed and unchanged
+
+        Each scanned tracker is looked up once through the identity index and its fingerprint
+        compared with the stored one; trackers stored without a fingerprint count as unchanged.
+        The lists keep scan order and hold the objects that were passed in. Stored trackers get
+        their details, fingerprint and last_seen refreshed.
+        """
+        trackers = list(trackers)
+        diff = {'new': [], 'changed': [], 'unchanged': []}
+        if not trackers:
+            return diff
+        seen_at = time.time() if seen_at is None else seen_at
+        rows = [self._row(tracker, position, seen_at) for position, tracker in enumerate(trackers)]
+
+        with self._lock, self.connection:
+            self.connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS scan (position INTEGER, name TEXT, date TEXT, abbreviation TEXT, "
+                "description TEXT, tags TEXT, full_text TEXT, fingerprint TEXT, seen_at REAL)")
+            self.connection.execute("DELETE FROM scan")
+            self.connection.executemany("INSERT INTO scan VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            matches = self.connection.execute(
+                "SELECT scan.position, t.id IS NULL, scan.fingerprint != t.fingerprint FROM scan "
+                "LEFT JOIN trackers t ON t.name = scan.name AND t.date = scan.date "
+                "AND t.abbreviation = scan.abbreviation ORDER BY scan.position").fetchall()
+            self.connection.execute("DELETE FROM scan")
+            # The last scan of a tracker listed twice wins; an upsert (ON CONFLICT) would need SQLite 3.24
+            latest = {}
+            for row in rows:
+                latest[row[1:4]] = row
+            new_keys = {rows[position][1:4] for position, new, _ in matches if new}
+            self.connection.executemany(
+                "INSERT INTO trackers (name, date, abbreviation, description, tags, full_text, fingerprint, "
+                "first_seen, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row[1:] + row[-1:] for key, row in latest.items() if key in new_keys])
+            self.connection.executemany(
+                "UPDATE trackers SET description = ?, tags = ?, full_text = ?, fingerprint = ?, last_seen = ? "
+                "WHERE name = ? AND date = ? AND abbreviation = ?",
+                [row[4:] + row[1:4] for key, row in latest.items() if key not in new_keys])
+
+        for position, new, changed in matches:
+            if new:
+                diff['new'].append(trackers[position])
+            elif changed:
+                diff['changed'].append(trackers[position])
+            else:
+                diff['unchanged'].append(trackers[position])
+        return diff
+
+    def contains(self, trackers):
+        """Whether every one of the trackers has been seen before
+
+        The batch is looked up through the identity index with one anti-join, without reading
+        the stored trackers themselves.
+        """
+        rows = []
+        for tracker in trackers:
+            get = tracker.get if isinstance(tracker, dict) else tracker.__getitem__
+            rows.append((get('name'), get('date'), get('abbreviation')))
+        with self._lock, self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS probe (name TEXT, date TEXT, abbreviation TEXT)")
+            self.connection.execute("DELETE FROM probe")
+            self.connection.executemany("INSERT INTO probe VALUES (?, ?, ?)", rows)
+            missing = self.connection.execute(
+                "SELECT EXISTS (SELECT 1 FROM probe LEFT JOIN trackers t ON t.name = probe.name "
+                "AND t.date = probe.date AND t.abbreviation = probe.abbreviation WHERE t.id IS NULL)").fetchone()[0]
+            self.connection.execute("DELETE FROM probe")
+        return not missing
+
+    def import_json(self, filename='trackers.json', seen_at=None):
+        """Import trackers saved by save_trackers_to_file; returns how many were not known yet"""
+        if not os.path.exists(filename):
+            return 0
+        with open(filename, 'r', encoding='utf-8') as f:
+            return len(self.update(json.load(f), seen_at))
+
+    def resume_pages(self):
+        """Source name -> page the last crawl of each source did not get through"""
+        return dict(self.connection.execute("SELECT source, page FROM resume_pages"))
+
+    def set_resume_pages(self, pages):
+        """Replace the resume pages with those left unfinished by the latest crawl"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM resume_pages")
+            self.connection.executemany("INSERT INTO resume_pages (source, page) VALUES (?, ?)", pages.items())
+
+    def first_seen_times(self):
+        """When each tracker was first seen, oldest first"""
+        return [row[0] for row in self.connection.execute("SELECT first_seen FROM trackers ORDER BY first_seen")]
+
+    def queue_events(self, trackers, event='new', queued_at=None):
+        """Buffer notification events until the next digest flush
+
+        A tracker already pending for the event keeps its place in the queue, with its details
+        updated to the latest scan. Returns how many events were not pending before.
+        """
+        queued_at = time.time() if queued_at is None else queued_at
+        rows = []
+        for tracker in trackers:
+            # Every field is kept, so flushed trackers format like freshly scanned ones
+            get = tracker.get if isinstance(tracker, dict) else tracker.__getitem__
+            tracker = {field: get(field) for field in TRACKER_FIELDS}
+            rows.append((event, tracker['name'], tracker['date'], tracker['abbreviation'],
+                         json.dumps(tracker, ensure_ascii=False), queued_at))
+        with self._lock, self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT INTO pending_events (event, name, date, abbreviation, tracker, queued_at) "
+                "SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM pending_events "
+                "WHERE event = ? AND name = ? AND date = ? AND abbreviation = ?)",
+                [row + row[:4] for row in rows])
+            queued = self.connection.total_changes - before
+            self.connection.executemany(
+                "UPDATE pending_events SET tracker = ? WHERE event = ? AND name = ? AND date = ? AND abbreviation = ?",
+                [(row[4], row[0], row[1], row[2], row[3]) for row in rows])
+        return queued
+
+    def pending_events(self):
+        """Buffered events as (id, event, tracker dict, queued_at) tuples, oldest first"""
+        rows = self.connection.execute("SELECT id, event, tracker, queued_at FROM pending_events ORDER BY id")
+        return [(event_id, event, json.loads(tracker), queued_at) for event_id, event, tracker, queued_at in rows]
+
+    def clear_events(self, event_ids):
+        """Remove flushed events from the buffer"""
+        with self._lock, self.connection:
+            self.connection.executemany("DELETE FROM pending_events WHERE id = ?", [(event_id,) for event_id in event_ids])